@@ -1,18 +1,9 @@
 import { NextResponse } from "next/server";
-import { createClient } from "@supabase/supabase-js";
+import { dailyResponse, type DailyResponse } from "@/lib/dailyTexts";
 
-// ---------- Safe Supabase init ----------
-const SUPABASE_URL = process.env.SUPABASE_URL || "";
-const SUPABASE_KEY =
-  process.env.SUPABASE_SERVICE_ROLE_KEY ||
-  process.env.SUPABASE_ANON_KEY ||
-  "";
-
-let supabase: any = null;
-
-if (SUPABASE_URL && SUPABASE_KEY) {
-  supabase = createClient(SUPABASE_URL, SUPABASE_KEY);
-}
+// daily_texts is cached in process (lib/dailyTexts.ts): the morning widget spike never reaches the DB.
+// Browsers/CDN may keep an answer until it changes (next day), capped at one hour.
+const MAX_AGE_SECONDS = 3600;
 
 // ---------- CORS ----------
 const CORS_HEADERS = {
@@ -122,6 +113,13 @@ function dayOfYearUTC(d: Date): number {
   return Math.floor((cur - start) / 86400000) + 1;
 }
 
+// Seconds until today's answer changes: the daily number follows local midnight, the pick UTC midnight
+function secondsUntilNextDay(now: Date): number {
+  const localMidnight = new Date(now.getFullYear(), now.getMonth(), now.getDate() + 1).getTime();
+  const utcMidnight = Date.UTC(now.getUTCFullYear(), now.getUTCMonth(), now.getUTCDate() + 1);
+  return Math.max(1, Math.floor((Math.min(localMidnight, utcMidnight) - now.getTime()) / 1000));
+}
+
 // ---------- GET ----------
 export async function GET(req: Request) {
   try {
@@ -142,14 +140,12 @@ export async function GET(req: Request) {
     const today = new Date();
     const num = dailyNumber(dob, today);
 
-    const { data, error } = await supabase
-      .from("daily_texts")
-      .select("number, lang, variant, title, content")
-      .eq("lang", "lv")
-      .eq("number", num)
-      .order("variant", { ascending: true });
+    const doy = dayOfYearUTC(today);
 
-    if (error) {
+    let ready: DailyResponse | null;
+    try {
+      ready = await dailyResponse(num, doy);
+    } catch (error: any) {
       return new NextResponse(
         JSON.stringify({ error: "DB error", details: error.message }),
         {
@@ -162,7 +158,7 @@ export async function GET(req: Request) {
       );
     }
 
-    if (!data || data.length === 0) {
+    if (!ready) {
       return new NextResponse(
         JSON.stringify({ error: "No forecast found", details: `number=${num}` }),
         {
@@ -175,25 +171,28 @@ export async function GET(req: Request) {
       );
     }
 
-    const doy = dayOfYearUTC(today);
-    const pick = data[doy % data.length];
+    const etag = ready.etag;
+    const cacheHeaders = {
+      ETag: etag,
+      "Cache-Control": `public, max-age=${Math.min(secondsUntilNextDay(today), MAX_AGE_SECONDS)}`,
+    };
+
+    const inm = req.headers.get("if-none-match");
+    if (inm && inm.split(",").some((t) => t.trim().replace(/^W\//, "") === etag)) {
+      return new NextResponse(null, {
+        status: 304,
+        headers: { ...CORS_HEADERS, ...cacheHeaders },
+      });
+    }
 
-    return new NextResponse(
-      JSON.stringify({
-        dailyNumber: num,
-        forecast: {
-          title: `Cipars ${num}`,
-          content: pick.content,
-        },
-      }),
-      {
-        status: 200,
-        headers: {
-          ...CORS_HEADERS,
-          "Content-Type": "application/json",
-        },
-      }
-    );
+    return new NextResponse(ready.body, {
+      status: 200,
+      headers: {
+        ...CORS_HEADERS,
+        "Content-Type": "application/json",
+        ...cacheHeaders,
+      },
+    });
   } catch (e: any) {
     return new NextResponse(
       JSON.stringify({ error: "Server error", details: e.message }),
@@ -1,7 +1,6 @@
 import { NextResponse } from "next/server";
-import { spawn } from "child_process";
-import path from "path";
-import fs from "fs";
+import { runReport, pdfResponse } from "@/lib/reportWorker";
+import { withAdmission, busyResponse, AdmissionBusy } from "@/lib/admission";
 
 export async function GET(req: Request) {
   try {
@@ -19,52 +18,34 @@ export async function GET(req: Request) {
       );
     }
 
-    const scriptPath = path.join(process.cwd(), "make_forecast_pdf_full.py");
-
     console.log(
       "DEBUG Railway SENDGRID KEY:",
       process.env.SENDGRID_API_KEY?.slice(0, 10)
     );
 
-    // === RUN PYTHON SCRIPT ===
-    // python make_forecast_pdf_full.py <date> <year> <email>
-    const py = spawn("python3", [scriptPath, date, year, email]);
-
-    let output = "";
-    let errorOutput = "";
-
-    py.stdout.on("data", (data) => (output += data.toString()));
-    py.stderr.on("data", (data) => (errorOutput += data.toString()));
-
-    const result = await new Promise((resolve) => {
-      py.on("close", () => resolve(output || errorOutput));
-    });
+    // python gada report: pre-warmed worker, or a cold python3 spawn as fallback;
+    // at most REPORT_MAX_INFLIGHT at once, the rest wait or get 503 (lib/admission.ts)
+    const download = searchParams.get("download") === "1";
+    const result = await withAdmission(() => runReport("gada", [date, year, email], { pdf: download }));
 
     // === DOWNLOAD MODE ===
-    if (searchParams.get("download") === "1") {
-      try {
+    // PDF streamed from memory; if python failed there is no body → JSON below, as before
+    if (download) {
+      if (result.body) {
         const birth = date.replace(/\./g, "");
-        const pdfPath = `/tmp/GADA_PROGNOZE_${birth}_${year}.pdf`;
-        const fileBuffer = fs.readFileSync(pdfPath);
-
-        return new NextResponse(fileBuffer, {
-          headers: {
-            "Content-Type": "application/pdf",
-            "Content-Disposition": `attachment; filename="GADA_PROGNOZE_${birth}_${year}.pdf"`,
-          },
-        });
-      } catch (err) {
-        console.error("Download error:", err);
+        return pdfResponse(result, `GADA_PROGNOZE_${birth}_${year}.pdf`);
       }
+      console.error("Download error: no PDF from python", result.error);
     }
 
     // === NORMAL JSON RESPONSE ===
     return NextResponse.json({
       status: "ok",
       message: "PDF generated and email sent (if python succeeded)",
-      python_output: result,
+      python_output: result.output,
     });
   } catch (e: any) {
+    if (e instanceof AdmissionBusy) return busyResponse(e);
     return NextResponse.json(
       { error: e?.message || e?.toString() },
       { status: 500 }
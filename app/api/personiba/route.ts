@@ -1,7 +1,6 @@
 import { NextResponse } from "next/server";
-import { spawn } from "child_process";
-import path from "path";
-import fs from "fs";
+import { runReport, pdfResponse } from "@/lib/reportWorker";
+import { withAdmission, busyResponse, AdmissionBusy } from "@/lib/admission";
 
 
 export async function GET(req: Request) {
@@ -18,49 +17,32 @@ export async function GET(req: Request) {
       );
     }
 
-    const scriptPath = path.join(process.cwd(), "make_personiba_pdf.py");
-
     console.log("DEBUG Railway SENDGRID KEY:", process.env.SENDGRID_API_KEY?.slice(0,10));
 
 
-    // запускаем python3 make_personiba_pdf.py date email
-    const py = spawn("python3", [scriptPath, date, email]);
-
-    let output = "";
-    let errorOutput = "";
-
-    py.stdout.on("data", (data) => (output += data.toString()));
-    py.stderr.on("data", (data) => (errorOutput += data.toString()));
-
-    const result = await new Promise((resolve) => {
-      py.on("close", () => resolve(output || errorOutput));
-    });
+    // python personiba report: pre-warmed worker, or a cold python3 spawn as fallback;
+    // at most REPORT_MAX_INFLIGHT at once, the rest wait or get 503 (lib/admission.ts)
+    const download = searchParams.get("download") === "1";
+    const result = await withAdmission(() => runReport("personiba", [date, email], { pdf: download }));
 
 
     // === DOWNLOAD MODE (optional) ===
-    if (searchParams.get("download") === "1") {
-        try {
-            const birth = searchParams.get("date")!.replace(/\./g, "");
-            const filePath = `/tmp/PERSONIBAS_ANALIZE_${birth}.pdf`;
-            const fileBuffer = fs.readFileSync(filePath);
-
-            return new NextResponse(fileBuffer, {
-              headers: {
-                "Content-Type": "application/pdf",
-                "Content-Disposition": `attachment; filename="PERSONIBAS_ANALIZE_${birth}.pdf"`
-               }
-            });
-        } catch (err) {
-            console.error("Download error:", err);
+    // PDF streamed from memory; if python failed there is no body → JSON below, as before
+    if (download) {
+        if (result.body) {
+            const birth = date.replace(/\./g, "");
+            return pdfResponse(result, `PERSONIBAS_ANALIZE_${birth}.pdf`);
         }
+        console.error("Download error: no PDF from python", result.error);
     }
 
     return NextResponse.json({
       status: "ok",
       message: "PDF generated and email sent (if python succeeded)",
-      python_output: result,
+      python_output: result.output,
     });
   } catch (e: any) {
+    if (e instanceof AdmissionBusy) return busyResponse(e);
     return NextResponse.json(
       { error: e?.message || e?.toString() },
       { status: 500 }
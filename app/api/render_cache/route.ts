@@ -0,0 +1,15 @@
+// app/api/render_cache/route.ts
+// Hit rate / size of the star & triangle render cache (this Node process), and the
+// triangles' static layers / pooled canvases (lib/triangles/layers.ts)
+import { NextResponse } from "next/server";
+import { renderCacheStats } from "@/lib/renderCache";
+import { layerStats } from "@/lib/triangles/layers";
+
+export const runtime = "nodejs";
+export const dynamic = "force-dynamic";
+
+export async function GET() {
+  return NextResponse.json({ ...renderCacheStats(), triangleLayers: layerStats() }, {
+    headers: { "Cache-Control": "no-store" },
+  });
+}
@@ -0,0 +1,19 @@
+// app/api/report_admission/route.ts
+// Reports rendering / waiting in this Node process (lib/admission.ts). 503 while the wait
+// queue is full, so a load balancer health check can take the instance out until it drains.
+import { NextResponse } from "next/server";
+import { admissionStats } from "@/lib/admission";
+
+export const runtime = "nodejs";
+export const dynamic = "force-dynamic";
+
+export async function GET() {
+  const stats = admissionStats();
+  return NextResponse.json(stats, {
+    status: stats.saturated ? 503 : 200,
+    headers: {
+      "Cache-Control": "no-store",
+      ...(stats.saturated ? { "Retry-After": String(stats.retryAfterS) } : {}),
+    },
+  });
+}
@@ -0,0 +1,21 @@
+// app/api/report_queue/route.ts
+// Paid-report queue: depth, failures, enqueue→done latency, peak memory per report, and the
+// email delivery queue (from report_worker.py)
+import { NextResponse } from "next/server";
+import { reportQueueStats } from "@/lib/reportWorker";
+
+export const runtime = "nodejs";
+export const dynamic = "force-dynamic";
+
+export async function GET() {
+  try {
+    const stats = await reportQueueStats();
+    if (!stats) {
+      return NextResponse.json({ error: "Report worker is not running" }, { status: 503 });
+    }
+    return NextResponse.json(stats, { headers: { "Cache-Control": "no-store" } });
+  } catch (err: any) {
+    console.error("Report queue stats error:", err);
+    return NextResponse.json({ error: err.message }, { status: 500 });
+  }
+}
@@ -0,0 +1,21 @@
+// app/api/report_stats/route.ts
+// Per-stage latency histograms of report generation (startup, numerology, fetch by cache
+// state, wait, draw, save, email, total) — shows whether storage, rendering or email dominates.
+import { NextResponse } from "next/server";
+import { reportEventStats } from "@/lib/reportEvents";
+import { pullWorkerEvents } from "@/lib/reportWorker";
+
+export const runtime = "nodejs";
+export const dynamic = "force-dynamic";
+
+export async function GET() {
+  try {
+    await pullWorkerEvents(); // queued jobs ran inside the worker
+    return NextResponse.json(reportEventStats(), {
+      headers: { "Cache-Control": "no-store" },
+    });
+  } catch (err: any) {
+    console.error("Report stats error:", err);
+    return NextResponse.json({ error: err.message }, { status: 500 });
+  }
+}
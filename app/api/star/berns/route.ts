@@ -2,8 +2,9 @@
 import "@/lib/registerFont";
 import { NextRequest } from "next/server";
 import { renderStarSvgBerns } from "@/lib/starRenderBerns"; // 🔹 твой новый файл
-import { calcStarNumbers } from "@/lib/starMath";
+import { starNumbers } from "@/lib/numerologyTable";   // calcStarNumbers, precomputed
 import { PDFDocument } from "pdf-lib";
+import { cachedRender } from "@/lib/renderCache";
 
 export const runtime = "nodejs";
 export const dynamic = "force-dynamic";
@@ -23,45 +24,30 @@ export async function GET(req: NextRequest) {
     try { numbers = JSON.parse(raw); }
     catch { numbers = JSON.parse(decodeURIComponent(raw)); }
   } else {
-    numbers = calcStarNumbers(date);
+    numbers = starNumbers(date);
   }
 
-  // ✅ используем новый SVG без фона
-  const svg = renderStarSvgBerns(numbers, { width: 900, height: 900 });
+  const isPdf = format === "pdf";
 
-  // SVG -> PNG через sharp
-  const sharp = (await import("sharp")).default;
-  const pngBuffer = await sharp(Buffer.from(svg)).png().toBuffer();
-  const pngU8 = new Uint8Array(pngBuffer);
+  // SVG → PNG (→ PDF). Same numbers → same bytes, so repeats come from the render cache
+  const render = async () => {
+    const svg = renderStarSvgBerns(numbers, { width: 900, height: 900 });
+    const sharp = (await import("sharp")).default;
+    const pngBuffer = await sharp(Buffer.from(svg)).png().toBuffer();
+    if (!isPdf) return pngBuffer;
 
-  const streamFrom = (u8: Uint8Array) =>
-    new ReadableStream<Uint8Array>({
-      start(controller) {
-        controller.enqueue(u8);
-        controller.close();
-      },
-    });
-
-  if (format === "pdf") {
     const pdf = await PDFDocument.create();
     const page = pdf.addPage([900, 900]);
-    const img = await pdf.embedPng(pngU8);
+    const img = await pdf.embedPng(new Uint8Array(pngBuffer));
     page.drawImage(img, { x: 0, y: 0, width: 900, height: 900 });
-    const bytes = await pdf.save();
-
-    return new Response(streamFrom(bytes), {
-      headers: {
-        "Content-Type": "application/pdf",
-        "Content-Disposition": `inline; filename="star-berns-${date}.pdf"`,
-      },
-    });
-  }
-
-  // PNG по умолчанию
-  return new Response(streamFrom(pngU8), {
-    headers: {
-      "Content-Type": "image/png",
-      "Content-Disposition": `inline; filename="star-berns-${date}.png"`,
-    },
-  });
+    return pdf.save();
+  };
+
+  return cachedRender(
+    req,
+    { route: "star/berns", mode: isPdf ? "pdf" : "png", numbers },
+    isPdf ? "application/pdf" : "image/png",
+    render,
+    { "Content-Disposition": `inline; filename="star-berns-${date}.${isPdf ? "pdf" : "png"}"` }
+  );
 }
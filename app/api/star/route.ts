@@ -2,8 +2,9 @@
 import "@/lib/registerFont";
 import { NextRequest } from "next/server";
 import { renderStarSvg } from "@/lib/starRender";   // если алиасы не работают — замени на "../../../lib/starRender"
-import { calcStarNumbers } from "@/lib/starMath";   // или "../../../lib/starMath"
+import { starNumbers } from "@/lib/numerologyTable";   // calcStarNumbers, precomputed
 import { PDFDocument } from "pdf-lib";
+import { cachedRender } from "@/lib/renderCache";
 
 
 
@@ -26,47 +27,37 @@ export async function GET(req: NextRequest) {
     try { numbers = JSON.parse(raw); }
     catch { numbers = JSON.parse(decodeURIComponent(raw)); }
   } else {
-    numbers = calcStarNumbers(date);
+    numbers = starNumbers(date);
   }
 
-  // строим SVG
-  const svg = renderStarSvg(numbers, { width: 1200, height: 1000 });
-
+  // 📦 JSON режим — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return new Response(JSON.stringify(numbers), {
+      headers: { "Content-Type": "application/json", "Cache-Control": "no-store" },
+    });
+  }
 
-  // SVG -> PNG через sharp
-  const sharp = (await import("sharp")).default;
-  const pngBuffer = await sharp(Buffer.from(svg)).png().toBuffer(); // Buffer
-  const pngU8 = new Uint8Array(pngBuffer); // Uint8Array
+  const isPdf = format === "pdf";
 
-  // helper: делаем ReadableStream из Uint8Array (совместимо с Response BodyInit)
-  const streamFrom = (u8: Uint8Array) =>
-    new ReadableStream<Uint8Array>({
-      start(controller) {
-        controller.enqueue(u8);
-        controller.close();
-      },
-    });
+  // SVG → PNG (→ PDF). Same numbers → same bytes, so repeats come from the render cache
+  const render = async () => {
+    const svg = renderStarSvg(numbers, { width: 1200, height: 1000 });
+    const sharp = (await import("sharp")).default;
+    const pngBuffer = await sharp(Buffer.from(svg)).png().toBuffer();
+    if (!isPdf) return pngBuffer;
 
-  if (format === "pdf") {
     const pdf = await PDFDocument.create();
     const page = pdf.addPage([1200, 1000]);
-    const img = await pdf.embedPng(pngU8);
+    const img = await pdf.embedPng(new Uint8Array(pngBuffer));
     page.drawImage(img, { x: 0, y: 0, width: 1200, height: 1000 });
-    const bytes = await pdf.save();
-
-    return new Response(streamFrom(bytes), {
-      headers: {
-        "Content-Type": "application/pdf",
-        "Content-Disposition": `inline; filename="star-${date}.pdf"`,
-      },
-    });
-  }
-
-  // PNG по умолчанию
-  return new Response(streamFrom(pngU8), {
-    headers: {
-      "Content-Type": "image/png",
-      "Content-Disposition": `inline; filename="star-${date}.png"`,
-    },
-  });
+    return pdf.save();
+  };
+
+  return cachedRender(
+    req,
+    { route: "star", mode: isPdf ? "pdf" : "png", numbers },
+    isPdf ? "application/pdf" : "image/png",
+    render,
+    { "Content-Disposition": `inline; filename="star-${date}.${isPdf ? "pdf" : "png"}"` }
+  );
 }
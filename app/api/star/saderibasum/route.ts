@@ -2,8 +2,9 @@
 import "@/lib/registerFont";
 import { NextRequest } from "next/server";
 import { renderStarSvgSaderibaSum } from "@/lib/starRenderSaderibaSum";
-import { calcStarNumbers } from "@/lib/starMath";
+import { starNumbers } from "@/lib/numerologyTable";   // calcStarNumbers, precomputed
 import { PDFDocument } from "pdf-lib";
+import { cachedRender } from "@/lib/renderCache";
 
 export const runtime = "nodejs";
 export const dynamic = "force-dynamic";
@@ -15,8 +16,8 @@ export async function GET(req: NextRequest) {
   const dateA = searchParams.get("dateA") || "01.01.1990";
   const dateB = searchParams.get("dateB") || "01.01.1990";
 
-  const you = calcStarNumbers(dateA);
-  const partner = calcStarNumbers(dateB);
+  const you = starNumbers(dateA);
+  const partner = starNumbers(dateB);
 
   // 📦 JSON режим (для Python)
   if (format === "json" || format === "numbers") {
@@ -32,40 +33,27 @@ export async function GET(req: NextRequest) {
     });
   }
 
-  // 📦 Обычный рендер SVG → PNG
-  const svg = renderStarSvgSaderibaSum(you, partner, { width: 360, height: 360 });
+  const isPdf = format === "pdf";
 
-  const sharp = (await import("sharp")).default;
-  const pngBuffer = await sharp(Buffer.from(svg)).png().toBuffer();
-  const pngU8 = new Uint8Array(pngBuffer);
+  // SVG → PNG (→ PDF). Same numbers → same bytes, so repeats come from the render cache
+  const render = async () => {
+    const svg = renderStarSvgSaderibaSum(you, partner, { width: 360, height: 360 });
+    const sharp = (await import("sharp")).default;
+    const pngBuffer = await sharp(Buffer.from(svg)).png().toBuffer();
+    if (!isPdf) return pngBuffer;
 
-  const streamFrom = (u8: Uint8Array) =>
-    new ReadableStream<Uint8Array>({
-      start(controller) {
-        controller.enqueue(u8);
-        controller.close();
-      },
-    });
-
-  if (format === "pdf") {
     const pdf = await PDFDocument.create();
     const page = pdf.addPage([360, 360]);
-    const img = await pdf.embedPng(pngU8);
+    const img = await pdf.embedPng(new Uint8Array(pngBuffer));
     page.drawImage(img, { x: 0, y: 0, width: 360, height: 360 });
-    const bytes = await pdf.save();
-
-    return new Response(streamFrom(bytes), {
-      headers: {
-        "Content-Type": "application/pdf",
-        "Content-Disposition": `inline; filename="star-saderiba-sum-${dateA}-${dateB}.pdf"`,
-      },
-    });
-  }
-
-  return new Response(streamFrom(pngU8), {
-    headers: {
-      "Content-Type": "image/png",
-      "Content-Disposition": `inline; filename="star-saderiba-sum-${dateA}-${dateB}.png"`,
-    },
-  });
+    return pdf.save();
+  };
+
+  return cachedRender(
+    req,
+    { route: "star/saderibasum", mode: isPdf ? "pdf" : "png", numbers: { you, partner } },
+    isPdf ? "application/pdf" : "image/png",
+    render,
+    { "Content-Disposition": `inline; filename="star-saderiba-sum-${dateA}-${dateB}.${isPdf ? "pdf" : "png"}"` }
+  );
 }
@@ -1,7 +1,6 @@
 import { NextResponse } from "next/server";
 import Stripe from "stripe";
-import { spawn } from "child_process";
-import path from "path";
+import { REPORT_SCRIPTS, reportArgs, enqueueReport } from "@/lib/reportWorker";
 
 // Needed for raw body handling in Next.js App Router
 export const runtime = "nodejs";
@@ -79,55 +78,33 @@ export async function POST(req: Request) {
       }
 
       // Map report → python file
-      const scriptMap: Record<string, string> = {
-        personiba: "make_personiba_pdf.py",
-        finanses: "make_finanses_pdf.py",
-        berns: "make_berns_pdf.py",
-        saderiba: "make_saderiba_pdf.py",
-        gada: "make_forecast_pdf_full.py",
-      };
-
-      const scriptName = scriptMap[report];
+      const scriptName = REPORT_SCRIPTS[report];
       if (!scriptName) {
         console.error("❌ Unknown report type:", report);
         return NextResponse.json({ received: true });
       }
 
-      const scriptPath = path.join(process.cwd(), scriptName);
-
       console.log("▶️ Selected script:", scriptName);
-      console.log("▶️ Full path:", scriptPath);
 
       // Build Python arguments correctly
-      let args: string[] = [];
-
-      switch (report) {
-        case "gada":
-          // make_forecast_pdf_full.py DD.MM.YYYY YEAR EMAIL
-          args = [date, year, email];
-          break;
-
-        case "saderiba":
-          // make_saderiba_pdf.py DATE1 DATE2 EMAIL
-          args = [date, partner, email];
-          break;
-
-        default:
-          // personiba / finanses / berns
-          // python script DATE EMAIL
-          args = [date, email];
-      }
+      const args = reportArgs(report, { date, partner, year, email });
 
       console.log("▶️ Python args:", args);
 
-      // Spawn Python
-      const py = spawn("python3", [scriptPath, ...args]);
-
-      py.stdout.on("data", (d) => console.log("🐍 PYTHON:", d.toString()));
-      py.stderr.on("data", (d) => console.error("🐍 PY ERR:", d.toString()));
-      py.on("close", (code) =>
-        console.log("🐍 Python finished with exit code:", code)
-      );
+      // Durable queue in the report worker (retries, bounded concurrency); don't hold Stripe's request open
+      const queued = await enqueueReport(report, args, event.id);
+      if (queued.duplicate) {
+        console.log("♻️ Stripe retry of", event.id, "- already queued as job", queued.job);
+      } else if (queued.queued) {
+        console.log("📝 Report queued, job", queued.job);
+      } else {
+        queued.result!
+          .then((r) => {
+            console.log("🐍 PYTHON:", r.output);
+            console.log("🐍 Python finished:", r.ok ? "ok" : r.error, `${r.ms ?? "?"} ms`);
+          })
+          .catch((err) => console.error("🐍 PY ERR:", err));
+      }
     }
 
     // ACK to Stripe
@@ -1,24 +1,26 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
-import { drawTrianglePersonibaBerns } from "@/lib/triangles/trianglePersonibaBerns";
+import { lookupTriangle } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
+import { drawTrianglePersonibaBerns, calcPersonibaNumbers } from "@/lib/triangles/trianglePersonibaBerns";
 
 export const runtime = "nodejs";
 
 export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
+  const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupTriangle("berns", date) ?? calcPersonibaNumbers(date);
 
-  // 🟢 Рисуем прозрачный треугольник
-  const canvas = drawTrianglePersonibaBerns(date);
+  // 🔹 JSON — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return NextResponse.json(nums, {
+      headers: { "Cache-Control": "no-store" },
+    });
+  }
 
-  // Конвертируем в PNG
-  const buffer = canvas.toBuffer("image/png");
-  const uint8 = new Uint8Array(buffer);
-
-  return new NextResponse(uint8, {
-    headers: {
-      "Content-Type": "image/png",
-      "Cache-Control": "no-store",
-    },
-  });
+  // 🖼️ PNG: same numbers → same image, served from the render cache
+  return cachedRender(req, { route: "triangle/berns", numbers: nums }, "image/png", () =>
+    drawTrianglePersonibaBerns(date, nums)
+  );
 }
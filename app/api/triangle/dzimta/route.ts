@@ -1,18 +1,26 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
-import { drawTriangleDzimta } from "@/lib/triangles/triangleDzimta";
+import { lookupTriangle } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
+import { drawTriangleDzimta, calcDzimtaNumbers } from "@/lib/triangles/triangleDzimta";
 
 export const runtime = "nodejs";
 
 export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
+  const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupTriangle("dzimta", date) ?? calcDzimtaNumbers(date);
 
-  const canvas = drawTriangleDzimta(date);
-  const buf = canvas.toBuffer("image/png");
-  const arr = new Uint8Array(buf);
+  // 🔹 JSON — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return NextResponse.json(nums, {
+      headers: { "Cache-Control": "no-store" },
+    });
+  }
 
-  return new NextResponse(arr, {
-    headers: { "Content-Type": "image/png" },
-  });
+  // 🖼️ PNG: same numbers → same image, served from the render cache
+  return cachedRender(req, { route: "triangle/dzimta", numbers: nums }, "image/png", () =>
+    drawTriangleDzimta(date, nums)
+  );
 }
@@ -1,18 +1,26 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
-import { drawTriangleFinanses } from "@/lib/triangles/triangleFinanses";
+import { lookupTriangle } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
+import { drawTriangleFinanses, calcFinansesNumbers } from "@/lib/triangles/triangleFinanses";
 
 export const runtime = "nodejs";
 
 export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
+  const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupTriangle("finanses", date) ?? calcFinansesNumbers(date);
 
-  const canvas = drawTriangleFinanses(date);
-  const buf = canvas.toBuffer("image/png");
-  const arr = new Uint8Array(buf);
+  // 🔹 JSON — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return NextResponse.json(nums, {
+      headers: { "Cache-Control": "no-store" },
+    });
+  }
 
-  return new NextResponse(arr, {
-    headers: { "Content-Type": "image/png" },
-  });
+  // 🖼️ PNG: same numbers → same image, served from the render cache
+  return cachedRender(req, { route: "triangle/finanses", numbers: nums }, "image/png", () =>
+    drawTriangleFinanses(date, nums)
+  );
 }
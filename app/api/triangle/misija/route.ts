@@ -1,6 +1,8 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
-import { drawNumbersMisija } from "@/lib/triangles/numbersMisija";
+import { lookupMisija } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
+import { drawNumbersMisija, calcNumbersMisija } from "@/lib/triangles/numbersMisija";
 
 export const runtime = "nodejs";
 
@@ -8,13 +10,21 @@ export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
   const bg = searchParams.get("bg") || undefined; // можно передать ?bg=public/images/xxx.jpg или URL
+  const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupMisija(date) ?? calcNumbersMisija(date);
 
-  try {
-    const canvas = await drawNumbersMisija(date, bg);
-    const buf = canvas.toBuffer("image/png");
-    return new NextResponse(new Uint8Array(buf), {
-      headers: { "Content-Type": "image/png" },
+  // 🔹 JSON — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return NextResponse.json(nums, {
+      headers: { "Cache-Control": "no-store" },
     });
+  }
+
+  try {
+    // 🖼️ PNG: same numbers → same image, served from the render cache
+    return await cachedRender(req, { route: "triangle/misija", mode: bg ?? "", numbers: nums }, "image/png", async () =>
+      drawNumbersMisija(date, bg, nums)
+    );
   } catch (err: any) {
     console.error("NumbersMisija render error:", err);
     return NextResponse.json(
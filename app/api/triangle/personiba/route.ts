@@ -1,20 +1,26 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
-import { drawTriangleBase } from "@/lib/triangles/trianglePersoniba";
+import { lookupTriangle } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
+import { drawTriangleBase, calcPersonibaNumbers } from "@/lib/triangles/trianglePersoniba";
 
 export const runtime = "nodejs";
 
 export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
+  const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupTriangle("personiba", date) ?? calcPersonibaNumbers(date);
 
-  const canvas = drawTriangleBase(date);
-  const buf = canvas.toBuffer("image/png");
+  // 🔹 JSON — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return NextResponse.json(nums, {
+      headers: { "Cache-Control": "no-store" },
+    });
+  }
 
-  // ✅ Преобразуем Buffer → Uint8Array
-  const arrayBuffer = new Uint8Array(buf);
-
-  return new NextResponse(arrayBuffer, {
-    headers: { "Content-Type": "image/png" },
-  });
+  // 🖼️ PNG: same numbers → same image, served from the render cache
+  return cachedRender(req, { route: "triangle/personiba", numbers: nums }, "image/png", () =>
+    drawTriangleBase(date, nums)
+  );
 }
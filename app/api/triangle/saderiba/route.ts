@@ -1,5 +1,7 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
+import { lookupTriangle } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
 import { drawTriangleAttiecibasSaderiba, calcAttiecibasNumbers } from "@/lib/triangles/triangleAttiecibasSaderiba";
 
 export const runtime = "nodejs";
@@ -8,24 +10,17 @@ export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
   const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupTriangle("saderiba", date) ?? calcAttiecibasNumbers(date);
 
   // 🔹 Если формат JSON — просто вернуть числа
   if (format === "json" || format === "numbers") {
-    const nums = calcAttiecibasNumbers(date);
     return NextResponse.json(nums, {
       headers: { "Cache-Control": "no-store" },
     });
   }
 
-  // 🔹 Иначе отрисовываем PNG
-  const canvas = drawTriangleAttiecibasSaderiba(date);
-  const buffer = canvas.toBuffer("image/png");
-  const uint8 = new Uint8Array(buffer);
-
-  return new NextResponse(uint8, {
-    headers: {
-      "Content-Type": "image/png",
-      "Cache-Control": "no-store",
-    },
-  });
+  // 🖼️ PNG: same numbers → same image, served from the render cache
+  return cachedRender(req, { route: "triangle/saderiba", numbers: nums }, "image/png", () =>
+    drawTriangleAttiecibasSaderiba(date, nums)
+  );
 }
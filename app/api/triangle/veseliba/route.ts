@@ -1,21 +1,29 @@
 import "@/lib/registerFont";
 import { NextRequest, NextResponse } from "next/server";
-import { drawTriangleVeseliba } from "@/lib/triangles/triangleVeseliba";
+import { lookupTriangle } from "@/lib/numerologyTable";
+import { cachedRender } from "@/lib/renderCache";
+import { drawTriangleVeseliba, calcVeselibaNumbers } from "@/lib/triangles/triangleVeseliba";
 
 export const runtime = "nodejs";
 
 export async function GET(req: NextRequest) {
   const { searchParams } = new URL(req.url);
   const date = searchParams.get("date") || "10.08.1990";
+  const format = (searchParams.get("format") || "png").toLowerCase();
+  const nums = lookupTriangle("veseliba", date) ?? calcVeselibaNumbers(date);
 
-  try {
-    const canvas = drawTriangleVeseliba(date);
-    const buf = canvas.toBuffer("image/png");
-    const arr = new Uint8Array(buf);
-
-    return new NextResponse(arr, {
-      headers: { "Content-Type": "image/png" },
+  // 🔹 JSON — только числа (numerology.py сверяется с ними)
+  if (format === "json" || format === "numbers") {
+    return NextResponse.json(nums, {
+      headers: { "Cache-Control": "no-store" },
     });
+  }
+
+  try {
+    // 🖼️ PNG: same numbers → same image, served from the render cache
+    return await cachedRender(req, { route: "triangle/veseliba", numbers: nums }, "image/png", () =>
+      drawTriangleVeseliba(date, nums)
+    );
   } catch (err: any) {
     console.error("Veseliba render error:", err);
     return NextResponse.json(
@@ -0,0 +1,149 @@
+# asset_cache.py
+# Shared on-disk cache for Supabase storage slides (astro-forecasts/...).
+#
+# Blobs are content-addressed (sha256), so the same JPEG under two URLs is stored once.
+# An SQLite index maps url → blob + ETag. Entries younger than ASSET_CACHE_FRESH_SECONDS
+# are served without a request; older ones are revalidated with If-None-Match, so slides
+# edited in the bucket show up. Total blob size is capped, least recently used go first.
+#
+# The index is SQLite, so the worker processes, batch runs and CLI calls share one cache.
+
+import os, time, sqlite3, hashlib, threading
+
+CACHE_DIR = os.getenv("ASSET_CACHE_DIR", "/tmp/astro-asset-cache")
+MAX_BYTES = int(float(os.getenv("ASSET_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+FRESH_SECONDS = float(os.getenv("ASSET_CACHE_FRESH_SECONDS", "300"))
+ENABLED = os.getenv("ASSET_CACHE", "1") != "0"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    sha TEXT NOT NULL,
+    etag TEXT,
+    checked_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_lru ON blobs(last_used);
+"""
+
+
+class AssetCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES, fresh_seconds: float = FRESH_SECONDS):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fresh_seconds = fresh_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "blobs"), exist_ok=True)
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    # ---------- storage ----------
+    def _db(self) -> sqlite3.Connection:
+        # one connection per thread (prefetch runs on a thread pool)
+        # (and never reuse one inherited through fork)
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _blob_path(self, sha: str) -> str:
+        return os.path.join(self.root, "blobs", sha[:2], sha)
+
+    # ---------- lookups ----------
+    def lookup(self, url: str):
+        """(sha, etag, checked_at) for url, or None if unknown or the blob is gone."""
+        row = self._db().execute("SELECT sha, etag, checked_at FROM urls WHERE url = ?", (url,)).fetchone()
+        if row and os.path.exists(self._blob_path(row[0])):
+            return row
+        return None
+
+    def is_fresh(self, entry) -> bool:
+        return entry is not None and time.time() - entry[2] < self.fresh_seconds
+
+    def read(self, url: str, entry) -> bytes:
+        sha = entry[0]
+        with open(self._blob_path(sha), "rb") as f:
+            data = f.read()
+        with self._db() as db:
+            db.execute("UPDATE blobs SET last_used = ? WHERE sha = ?", (time.time(), sha))
+        return data
+
+    def revalidated(self, url: str):
+        """Server answered 304: the cached copy is good for another FRESH_SECONDS."""
+        with self._db() as db:
+            db.execute("UPDATE urls SET checked_at = ? WHERE url = ?", (time.time(), url))
+
+    # ---------- writes ----------
+    def store(self, url: str, content: bytes, etag: str = None):
+        sha = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(content)
+            os.replace(tmp, path)
+
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO blobs(sha, size, last_used) VALUES (?, ?, ?) "
+                "ON CONFLICT(sha) DO UPDATE SET last_used = excluded.last_used",
+                (sha, len(content), now),
+            )
+            db.execute(
+                "INSERT INTO urls(url, sha, etag, checked_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET sha = excluded.sha, etag = excluded.etag, checked_at = excluded.checked_at",
+                (url, sha, etag, now),
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used blobs (and their urls) until under max_bytes."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with db:
+            for sha, size in db.execute("SELECT sha, size FROM blobs ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM urls WHERE sha = ?", (sha,))
+                db.execute("DELETE FROM blobs WHERE sha = ?", (sha,))
+                try:
+                    os.remove(self._blob_path(sha))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self) -> dict:
+        db = self._db()
+        blobs, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+        urls = db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+        return {"urls": urls, "blobs": blobs, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def asset_cache():
+    """Process-wide cache, or None when ASSET_CACHE=0."""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AssetCache()
+    return _cache
+
+
+if __name__ == "__main__":
+    # python asset_cache.py  → print cache stats
+    import json
+    print(json.dumps(AssetCache().stats(), indent=2))
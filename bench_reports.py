@@ -0,0 +1,321 @@
+# bench_reports.py
+# End-to-end benchmark of the five report generators, fully offline.
+#
+# Starts bench_stub.py (storage, REST tables, render API with latency/jitter), points
+# SUPABASE_URL / API_BASE at it and runs every generator as a fresh CLI process for a
+# fixed set of birthdates. Per report: p50/p95 wall time, peak RSS, PDF size/pages and
+# stub requests per run. Email is off (REPORT_SEND_EMAIL=0), PDFs go to a temp dir.
+#
+# Usage: python3 bench_reports.py [--reports personiba,gada] [--repeat 3]
+#                                 [--latency-ms 30] [--jitter-ms 10]
+#                                 [--asset-cache cold|warm|off] [--no-index]
+#                                 [--streaming] [--slides 8] [--pdf-cache] [--importtime]
+#                                 [--json result.json] [--baseline old.json] [--tolerance 0.25]
+#
+# The stub lists folders from a catalogue of every slide the benchmark's plans can ask for
+# (report_plan.py --assets), so the storage existence index works like against the real
+# bucket; --no-index turns the index off and optional slides are probed with GET instead.
+#
+# --streaming runs the generators with REPORT_STREAMING=1 (bounded memory). The stub spreads
+# its paths over --slides different pictures; reportlab stores equal pictures once, so
+# use about one per page (--slides 60) when comparing peak RSS.
+# The finished-PDF cache (pdf_cache.py) is off unless --pdf-cache: repeats would only time hits
+# (it lives in the asset cache dir, so use it with --asset-cache warm).
+#
+# --importtime adds one untimed run per report under `python -X importtime`: total import
+# time of the process and the slowest top-level imports (cumulative, lazy ones included).
+#
+# --baseline compares p50 wall time and peak RSS with an earlier --json file and exits 1
+# when either grew by more than --tolerance (a regression check before deploying).
+
+import os, re, sys, json, time, shutil, tempfile, argparse, subprocess, urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SCRIPTS = {
+    "personiba": "make_personiba_pdf.py",
+    "finanses": "make_finanses_pdf.py",
+    "berns": "make_berns_pdf.py",
+    "saderiba": "make_saderiba_pdf.py",
+    "gada": "make_forecast_pdf_full.py",
+}
+
+# fixed inputs, so runs are comparable (leap day, year ends, different triangle shapes)
+DATES = ["01.02.1990", "29.12.1987", "28.08.1991", "29.02.2000", "31.12.1999", "07.07.1977"]
+PARTNER = "05.05.1985"
+YEAR = "2026"
+EMAIL = "bench@example.com"
+
+
+def script_args(report: str, date: str) -> list:
+    if report == "gada":
+        return [date, YEAR, EMAIL]
+    if report == "saderiba":
+        return [date, PARTNER, EMAIL]
+    return [date, EMAIL]
+
+
+def pct(values: list, p: float):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else None
+
+
+# =========================
+# STUB
+# =========================
+CATALOGUE_BASE = "http://catalogue.invalid"
+
+def write_catalogue(reports: list, dates: list, path: str) -> int:
+    """Storage paths of every slide the plans for these dates can use (gada's come from the stub tables)."""
+    orders = "\n".join(
+        json.dumps({"report": r, "date": d, "partner": PARTNER, "email": EMAIL})
+        for r in reports if r != "gada" for d in dates
+    )
+    env = {**os.environ, "SUPABASE_URL": CATALOGUE_BASE, "SUPABASE_KEY": "bench",
+           "SUPABASE_SERVICE_ROLE_KEY": "bench", "API_BASE": CATALOGUE_BASE, "STORAGE_INDEX": "0"}
+    proc = subprocess.run([sys.executable, os.path.join(HERE, "report_plan.py"), "-", "--assets"],
+                          input=orders, capture_output=True, text=True, cwd=HERE, env=env)
+    if proc.returncode != 0:
+        raise SystemExit(f"❌ Planning failed: {proc.stderr.strip()[-500:]}")
+    prefix = f"{CATALOGUE_BASE}/storage/v1/object/public/"
+    paths = sorted({url[len(prefix):] for url in proc.stdout.split() if url.startswith(prefix)})
+    with open(path, "w") as f:
+        f.write("\n".join(paths) + "\n")
+    return len(paths)
+
+
+def start_stub(latency_ms: float, jitter_ms: float, catalogue: str, slides: int):
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, "bench_stub.py"), "--port", "0",
+         "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms), "--catalogue", catalogue,
+         "--slides", str(slides)],
+        stdout=subprocess.PIPE, text=True,
+    )
+    line = proc.stdout.readline()
+    if not line.startswith("STUB "):
+        proc.kill()
+        raise SystemExit(f"❌ Stub did not start: {line!r}")
+    print(f"🧪 {line.strip()}", file=sys.stderr)
+    return proc, line.split()[1]
+
+
+def stub_counts(base: str) -> dict:
+    with urllib.request.urlopen(f"{base}/stats") as r:
+        return json.load(r)
+
+
+# =========================
+# ONE RUN
+# =========================
+def run_once(report: str, date: str, env: dict, log_dir: str) -> dict:
+    """Run one generator CLI; wall time, peak RSS of that process, PDF size and pages."""
+    log_path = os.path.join(log_dir, f"{report}-{date}.log")
+    with open(log_path, "w+") as log:
+        t0 = time.perf_counter()
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, SCRIPTS[report]), *script_args(report, date)],
+            cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT,
+        )
+        # wait4 → rusage of this child only (RUSAGE_CHILDREN would be the max over all runs)
+        _, status, usage = os.wait4(proc.pid, 0)
+        wall_ms = (time.perf_counter() - t0) * 1000
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        log.seek(0)
+        output = log.read()
+
+    run = {"ok": proc.returncode == 0, "ms": round(wall_ms), "rss_mb": round(usage.ru_maxrss / 1024, 1)}
+    saved = re.search(r"✅ PDF saved: (.+)", output)
+    if run["ok"] and saved:
+        path = saved.group(1).strip()
+        with open(path, "rb") as f:
+            pdf = f.read()
+        os.unlink(path)
+        run["pdf_kb"] = round(len(pdf) / 1024)
+        run["pages"] = len(re.findall(rb"/Type /Page\b", pdf))
+    else:
+        run["ok"] = False
+        run["error"] = output.strip().splitlines()[-1] if output.strip() else f"exit {proc.returncode}"
+    return run
+
+
+# =========================
+# IMPORT PROFILE
+# =========================
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$", re.M)
+
+def import_profile(report: str, date: str, env: dict, top: int = 6) -> dict:
+    """One CLI run under -X importtime: import ms in total and per top-level import."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(HERE, SCRIPTS[report]), *script_args(report, date)],
+        cwd=HERE, env=env, capture_output=True, text=True,
+    )
+    saved = re.search(r"✅ PDF saved: (.+)", proc.stdout)
+    if saved and os.path.exists(saved.group(1).strip()):
+        os.unlink(saved.group(1).strip())
+
+    total_us, slowest = 0, {}
+    for m in IMPORT_LINE.finditer(proc.stderr):
+        self_us, cumulative_us, indent, name = int(m[1]), int(m[2]), m[3], m[4]
+        total_us += self_us
+        if not indent:  # imported by the script or at first use, not by another module
+            package = name.partition(".")[0]
+            slowest[package] = slowest.get(package, 0) + cumulative_us
+    return {
+        "total_ms": round(total_us / 1000),
+        "slowest": [[name, round(us / 1000)] for name, us in sorted(slowest.items(), key=lambda kv: -kv[1])[:top]],
+    }
+
+
+# =========================
+# REPORT
+# =========================
+def summarize(runs: list, requests: dict) -> dict:
+    ok = [r for r in runs if r["ok"]]
+    return {
+        "runs": len(runs),
+        "failed": len(runs) - len(ok),
+        "p50_ms": pct([r["ms"] for r in ok], 0.5),
+        "p95_ms": pct([r["ms"] for r in ok], 0.95),
+        "peak_rss_mb": max((r["rss_mb"] for r in ok), default=None),
+        "pdf_kb": pct([r["pdf_kb"] for r in ok], 0.5),
+        "pages": pct([r["pages"] for r in ok], 0.5),
+        "requests_per_run": {k: round(v / len(runs), 1) for k, v in requests.items()} if runs else {},
+    }
+
+
+def print_table(results: dict):
+    print(f"{'report':<10} {'runs':>4} {'fail':>4} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>7} {'PDF KB':>7} {'pages':>5}  requests/run")
+    for name, s in results.items():
+        reqs = " ".join(f"{k}={v}" for k, v in sorted(s["requests_per_run"].items()))
+        print(f"{name:<10} {s['runs']:>4} {s['failed']:>4} {s['p50_ms'] or '-':>8} {s['p95_ms'] or '-':>8} "
+              f"{s['peak_rss_mb'] or '-':>7} {s['pdf_kb'] or '-':>7} {s['pages'] or '-':>5}  {reqs}")
+
+
+def print_imports(results: dict):
+    print(f"\n{'report':<10} {'import ms':>9}  slowest top-level imports (cumulative ms)")
+    for name, s in results.items():
+        if "imports" in s:
+            slowest = " ".join(f"{pkg}={ms}" for pkg, ms in s["imports"]["slowest"])
+            print(f"{name:<10} {s['imports']['total_ms']:>9}  {slowest}")
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """Print the change against a baseline --json; False if something regressed."""
+    with open(baseline_path) as f:
+        base = json.load(f)["reports"]
+    ok = True
+    for name, s in results.items():
+        old = base.get(name)
+        if not old:
+            continue
+        for key in ("p50_ms", "peak_rss_mb"):
+            if not old.get(key) or s.get(key) is None:
+                continue
+            change = s[key] / old[key] - 1
+            flag = "❌" if change > tolerance else "✅"
+            ok &= change <= tolerance
+            print(f"{flag} {name:<10} {key:<12} {old[key]:>8} → {s[key]:>8} ({change:+.0%})")
+    return ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline end-to-end benchmark of the PDF generators")
+    ap.add_argument("--reports", default=",".join(SCRIPTS), help="comma-separated report types")
+    ap.add_argument("--dates", default=",".join(DATES), help="comma-separated birthdates")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per (report, date)")
+    ap.add_argument("--latency-ms", type=float, default=30)
+    ap.add_argument("--jitter-ms", type=float, default=10)
+    ap.add_argument("--asset-cache", choices=("cold", "warm", "off"), default="cold",
+                    help="cold: empty slide cache every run; warm: shared, filled by an untimed pass")
+    ap.add_argument("--no-index", action="store_true", help="storage existence index off (probe optional slides)")
+    ap.add_argument("--streaming", action="store_true", help="REPORT_STREAMING=1 (bounded-memory rendering)")
+    ap.add_argument("--slides", type=int, default=8, help="different slide pictures the stub serves")
+    ap.add_argument("--pdf-cache", action="store_true", help="finished-PDF cache on (repeats become cache hits)")
+    ap.add_argument("--importtime", action="store_true", help="profile imports with -X importtime (one extra run per report)")
+    ap.add_argument("--json", help="write the results here")
+    ap.add_argument("--baseline", help="earlier --json file to compare with")
+    ap.add_argument("--tolerance", type=float, default=0.25)
+    opts = ap.parse_args(argv)
+
+    reports = [r for r in opts.reports.split(",") if r]
+    unknown = [r for r in reports if r not in SCRIPTS]
+    if unknown:
+        raise SystemExit(f"❌ Unknown report(s): {', '.join(unknown)}")
+    dates = [d for d in opts.dates.split(",") if d]
+
+    work = tempfile.mkdtemp(prefix="astro-bench-")
+    catalogue = os.path.join(work, "catalogue.txt")
+    print(f"🗂️ Catalogue: {write_catalogue(reports, dates, catalogue)} slides", file=sys.stderr)
+    stub, base = start_stub(opts.latency_ms, opts.jitter_ms, catalogue, opts.slides)
+    env = {
+        **os.environ,
+        "SUPABASE_URL": base,
+        "SUPABASE_KEY": "bench",
+        "SUPABASE_SERVICE_ROLE_KEY": "bench",
+        "API_BASE": base,
+        "SENDGRID_API_KEY": "SG.bench",
+        "REPORT_SEND_EMAIL": "0",
+        "REPORT_PDF_DIR": work,
+        "ASSET_CACHE_DIR": os.path.join(work, "assets"),
+        "ASSET_CACHE": "0" if opts.asset_cache == "off" else "1",
+        "STORAGE_INDEX": "0" if opts.no_index else "1",
+        "REPORT_STREAMING": "1" if opts.streaming else "0",
+        "PDF_CACHE": "1" if opts.pdf_cache else "0",
+    }
+    env.pop("REPORT_PDF_FD", None)
+
+    results = {}
+    try:
+        if opts.asset_cache == "warm":
+            for report in reports:
+                for date in dates:
+                    run_once(report, date, env, work)
+
+        for report in reports:
+            runs = []
+            before = stub_counts(base)
+            for _ in range(opts.repeat):
+                for date in dates:
+                    if opts.asset_cache == "cold":
+                        shutil.rmtree(env["ASSET_CACHE_DIR"], ignore_errors=True)
+                    run = run_once(report, date, env, work)
+                    if not run["ok"]:
+                        print(f"❌ {report} {date}: {run['error']}", file=sys.stderr)
+                    runs.append(run)
+            after = stub_counts(base)
+            requests = {k: after[k] - before.get(k, 0) for k in after if after[k] != before.get(k, 0)}
+            results[report] = summarize(runs, requests)
+            if opts.importtime:
+                results[report]["imports"] = import_profile(report, dates[0], env)
+            print(f"⏱️ {report}: p50 {results[report]['p50_ms']} ms", file=sys.stderr)
+    finally:
+        stub.terminate()
+        shutil.rmtree(work, ignore_errors=True)
+
+    print_table(results)
+    if opts.importtime:
+        print_imports(results)
+    if opts.json:
+        meta = {
+            "when": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "dates": dates,
+            "repeat": opts.repeat,
+            "latency_ms": opts.latency_ms,
+            "jitter_ms": opts.jitter_ms,
+            "asset_cache": opts.asset_cache,
+            "storage_index": not opts.no_index,
+            "streaming": opts.streaming,
+            "slides": opts.slides,
+            "pdf_cache": opts.pdf_cache,
+            "importtime": opts.importtime,
+            "cpus": os.cpu_count(),
+        }
+        with open(opts.json, "w") as f:
+            json.dump({"meta": meta, "reports": results}, f, indent=2)
+    if opts.baseline and not compare(results, opts.baseline, opts.tolerance):
+        return 1
+    return 0 if all(s["failed"] == 0 for s in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# bench_stub.py
+# Offline stand-in for Supabase (storage + REST) and the Next render API, for bench_reports.py.
+#
+#   /storage/v1/object/public/...   synthetic 1920x1080 JPEG slides (ETag, 304 on If-None-Match)
+#   /rest/v1/<table>                forecast_gada_images, forecast_menesa_images, daily_texts
+#                                   (eq.* filters, offset/limit paging like PostgREST)
+#   POST /storage/v1/object/list/.. folder listing (storage_index.py) from --catalogue
+#   /api/...                        synthetic PNG (star / triangle renders)
+#   /stats                          request counts
+#
+# Every request waits latency ± jitter, so a run can mimic the real network.
+# Paths matching --missing answer 404, like slides that are absent from the bucket.
+# --catalogue is a file of object paths ("astro-forecasts/berns/main/berna_last.jpg", one
+# per line; bench_reports.py writes it from the report plans); without it listing answers
+# 400 and the generators fall back to probing. --missing paths are never listed.
+# --slides: how many different pictures the paths are spread over. reportlab stores equal
+# pictures once per PDF, so measure memory with about one per page (60).
+#
+# Usage: python3 bench_stub.py [--port 8765] [--latency-ms 30] [--jitter-ms 10] [--missing REGEX]
+#                              [--catalogue FILE] [--slides 8]
+
+import io, re, sys, json, time, random, hashlib, argparse, threading
+from urllib.parse import urlsplit, parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from PIL import Image, ImageDraw
+
+# like the real bucket: no 4th berns group slide for most numbers, no frc1, ac1/ac2, mc1/mc2
+DEFAULT_MISSING = (r"/berns/group/\d+/c\d+_3\.jpg$|/finanses/frc1\.jpg$"
+                   r"|/personiba/attiecibas/ac[12][pm]\.jpg$|/personiba/misija/mc[12]\.jpg$")
+PUBLIC = "/storage/v1/object/public/"
+SLIDE_VARIANTS = 8
+
+
+# =========================
+# SYNTHETIC IMAGES
+# =========================
+def make_slide(seed: int, quality: int) -> bytes:
+    """1920x1080 JPEG with gradient + noise, roughly the size of a real slide."""
+    rnd = random.Random(seed)
+    base = Image.linear_gradient("L").resize((1920, 1080)).convert("RGB")
+    tint = Image.new("RGB", (1920, 1080), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256)))
+    img = Image.blend(base, tint, 0.6)
+    noise = Image.effect_noise((1920, 1080), 40).convert("RGB")
+    img = Image.blend(img, noise, 0.12)
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):  # "text" blocks
+        x, y = rnd.randrange(1700), rnd.randrange(1000)
+        draw.rectangle([x, y, x + rnd.randrange(100, 600), y + rnd.randrange(10, 60)], fill=(240, 240, 240))
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def make_render() -> bytes:
+    """Transparent PNG like the star / triangle renders."""
+    img = Image.new("RGBA", (1200, 1000), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.polygon([(600, 60), (1100, 900), (100, 900)], outline=(212, 175, 55, 255), width=8)
+    for x, y in [(600, 60), (1100, 900), (100, 900), (850, 480), (350, 480), (600, 900)]:
+        draw.ellipse([x - 70, y - 70, x + 70, y + 70], fill=(11, 31, 28, 255), outline=(212, 175, 55, 255), width=6)
+    buf = io.BytesIO()
+    img.save(buf, "PNG")
+    return buf.getvalue()
+
+
+# =========================
+# REST TABLES
+# =========================
+def make_tables(store: str) -> dict:
+    gada = [{"gada_cipars": n, "image_url": f"{store}/gada/gada_{n}.jpg"} for n in range(1, 23)]
+    menesa = [
+        {"menesa_cipars": n, "variant": v, "image_url": f"{store}/menesis/{n}_{v}.jpg"}
+        for n in range(1, 23)
+        for v in (1.1, 1.2, 2.1, 3.1, 3.2)
+    ]
+    daily = [
+        {"number": n, "lang": "lv", "variant": v, "title": f"Cipars {n}", "content": f"Teksts {n}.{v}"}
+        for n in range(1, 23)
+        for v in range(1, 31)
+    ]
+    return {"forecast_gada_images": gada, "forecast_menesa_images": menesa, "daily_texts": daily}
+
+
+def query_table(rows: list, params: list) -> list:
+    """The subset of PostgREST the generators use: col=eq.value, offset, limit."""
+    offset, limit = 0, None
+    for key, value in params:
+        if key == "offset":
+            offset = int(value)
+        elif key == "limit":
+            limit = int(value)
+        elif value.startswith("eq."):
+            rows = [r for r in rows if str(r.get(key)) == value[3:]]
+    rows = rows[offset:]
+    return rows if limit is None else rows[:limit]
+
+
+# =========================
+# SERVER
+# =========================
+class Stub(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like Supabase / Next
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, body: bytes = b"", ctype: str = "application/octet-stream", headers=None):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _count(self, kind: str):
+        with self.server.lock:
+            self.server.counts[kind] = self.server.counts.get(kind, 0) + 1
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        srv = self.server
+        url = urlsplit(self.path)
+        path = url.path
+
+        if path == "/stats":
+            with srv.lock:
+                return self._send(200, json.dumps(srv.counts).encode(), "application/json")
+
+        delay = srv.latency + random.uniform(-srv.jitter, srv.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if path.startswith("/rest/v1/"):
+            self._count("rest")
+            rows = srv.tables.get(path.rsplit("/", 1)[-1])
+            if rows is None:
+                return self._send(404, b'{"message":"relation does not exist"}', "application/json")
+            body = json.dumps(query_table(rows, parse_qsl(url.query)), ensure_ascii=False).encode()
+            return self._send(200, body, "application/json")
+
+        if path.startswith("/storage/v1/object/public/"):
+            self._count("storage")
+            if srv.missing and srv.missing.search(path):
+                self._count("storage_404")
+                return self._send(404, b'{"error":"not_found"}', "application/json")
+            i, etag = srv.slide(path)
+            if self.headers.get("If-None-Match") == etag:
+                self._count("storage_304")
+                return self._send(304, headers={"ETag": etag})
+            return self._send(200, srv.slides[i], "image/jpeg", {"ETag": etag})
+
+        if path.startswith("/api/"):
+            self._count("api")
+            return self._send(200, srv.render, "image/png")
+
+        self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        srv = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        delay = srv.latency + random.uniform(-srv.jitter, srv.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if self.path.startswith("/storage/v1/object/list/"):
+            self._count("list")
+            if not srv.catalogue:
+                return self._send(400, b'{"error":"listing disabled"}', "application/json")
+            bucket = self.path.rsplit("/", 1)[-1]
+            req = json.loads(body or b"{}")
+            folder = f"{bucket}/{req.get('prefix', '').strip('/')}/"
+            names = sorted(
+                p[len(folder):] for p in srv.catalogue
+                if p.startswith(folder) and "/" not in p[len(folder):]
+                and not (srv.missing and srv.missing.search(PUBLIC + p))
+            )
+            offset, limit = int(req.get("offset", 0)), int(req.get("limit", 100))
+            rows = [{"name": n, "id": hashlib.sha1((folder + n).encode()).hexdigest(),
+                     "metadata": {"eTag": srv.slide(PUBLIC + folder + n)[1]}}
+                    for n in names[offset:offset + limit]]
+            return self._send(200, json.dumps(rows).encode(), "application/json")
+
+        self._send(404, b"not found", "text/plain")
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency_ms: float, jitter_ms: float, missing: str, quality: int,
+                 catalogue: list = (), slides: int = SLIDE_VARIANTS):
+        super().__init__(("127.0.0.1", port), Stub)
+        base = f"http://127.0.0.1:{self.server_address[1]}"
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.missing = re.compile(missing) if missing else None
+        self.started = int(time.time())
+        self.slides = [make_slide(i, quality) for i in range(slides)]
+        self.render = make_render()
+        self.tables = make_tables(f"{base}{PUBLIC}astro-forecasts")
+        self.catalogue = set(catalogue)
+        if self.catalogue:  # the forecast table slides exist too
+            self.catalogue.update(
+                row["image_url"].split(PUBLIC, 1)[1]
+                for name in ("forecast_gada_images", "forecast_menesa_images")
+                for row in self.tables[name]
+            )
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def slide(self, path: str):
+        """Storage path → (index into self.slides, ETag); the listing reports the same ETag."""
+        i = int(hashlib.sha1(path.encode()).hexdigest(), 16) % len(self.slides)
+        return i, f'"{i}-{self.started}"'
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Offline Supabase + render API stub for benchmarks")
+    ap.add_argument("--port", type=int, default=8765, help="0 = any free port")
+    ap.add_argument("--latency-ms", type=float, default=30)
+    ap.add_argument("--jitter-ms", type=float, default=10)
+    ap.add_argument("--missing", default=DEFAULT_MISSING, help="regex of storage paths that 404 ('' = none)")
+    ap.add_argument("--jpeg-quality", type=int, default=85)
+    ap.add_argument("--catalogue", help="object paths for folder listing, one per line")
+    ap.add_argument("--slides", type=int, default=SLIDE_VARIANTS,
+                    help="distinct slide pictures (~60: no two pages of a report share one, like the real bucket)")
+    opts = ap.parse_args(argv)
+
+    catalogue = []
+    if opts.catalogue:
+        with open(opts.catalogue) as f:
+            catalogue = [line.strip() for line in f if line.strip()]
+    server = StubServer(opts.port, opts.latency_ms, opts.jitter_ms, opts.missing, opts.jpeg_quality, catalogue,
+                        opts.slides)
+    kb = sum(len(s) for s in server.slides) // len(server.slides) // 1024
+    # first line is parsed by bench_reports.py
+    print(f"STUB http://127.0.0.1:{server.server_address[1]} slides≈{kb}KB "
+          f"latency={opts.latency_ms}±{opts.jitter_ms}ms", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
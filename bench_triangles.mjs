@@ -0,0 +1,185 @@
+// bench_triangles.mjs
+// The triangle PNGs before and after the static layers (lib/triangles/layers.ts), compared.
+//
+// Renders a sample of birthdates through the modules as they were before the layers
+// (git show BASE:lib/triangles/...) and through the current ones, with node-canvas as in
+// the routes: every module, misija with the default background and with ?bg= (an image
+// generated here). Per module: how many PNGs are byte-equal, pixel-equal, the worst
+// difference, and images per second of each path in one warm process.
+// Exits 1 when any image differs.
+//
+// Needs the app's node_modules (canvas, typescript) and git; run from the repo root:
+//   node bench_triangles.mjs [--base REV] [--dates 40] [--seconds 2] [--json result.json]
+// BASE defaults to the commit before lib/triangles/layers.ts was added.
+
+import fs from "fs";
+import path from "path";
+import { execFileSync } from "child_process";
+import { createRequire } from "module";
+
+const require = createRequire(path.join(process.cwd(), "package.json"));
+const ts = require("typescript");
+const { createCanvas, loadImage } = require("canvas");
+
+const MODULES = [
+  ["trianglePersoniba", "drawTriangleBase"],
+  ["trianglePersonibaBerns", "drawTrianglePersonibaBerns"],
+  ["triangleDzimta", "drawTriangleDzimta"],
+  ["triangleFinanses", "drawTriangleFinanses"],
+  ["triangleAttiecibas", "drawTriangleAttiecibas"],
+  ["triangleAttiecibasSaderiba", "drawTriangleAttiecibasSaderiba"],
+  ["triangleVeseliba", "drawTriangleVeseliba"],
+];
+const MISIJA = ["numbersMisija", "drawNumbersMisija"];
+const BUILD = path.join("node_modules", ".cache", "bench-triangles");
+const log = console.log;
+console.log = () => {}; // the modules log their calculations on every render
+
+function opt(name, fallback) {
+  const i = process.argv.indexOf(`--${name}`);
+  return i > 0 ? process.argv[i + 1] : fallback;
+}
+
+function git(...args) {
+  return execFileSync("git", args, { encoding: "utf8", maxBuffer: 16 << 20 });
+}
+
+// TS → CommonJS next to node_modules, so "canvas" resolves as in the app; "@/" is the repo root
+function build(dir, files, read) {
+  fs.mkdirSync(dir, { recursive: true });
+  for (const file of files) {
+    const src = read(file).replace(/from "@\/lib\/triangles\/(\w+)"/g, 'from "./$1"');
+    const out = ts.transpileModule(src, {
+      compilerOptions: { module: ts.ModuleKind.CommonJS, target: ts.ScriptTarget.ES2020, esModuleInterop: true },
+    });
+    fs.writeFileSync(path.join(dir, path.basename(file).replace(/\.ts$/, ".js")), out.outputText);
+  }
+  return (name) => require(path.resolve(dir, `${name}.js`));
+}
+
+function sampleDates(n) {
+  const first = Date.UTC(1900, 0, 1), last = Date.UTC(2100, 11, 31);
+  const pad = (v) => String(v).padStart(2, "0");
+  return Array.from({ length: n }, (_, i) => {
+    const d = new Date(first + Math.floor(((last - first) / 86400000) * ((i * 0.618034) % 1)) * 86400000);
+    return `${pad(d.getUTCDate())}.${pad(d.getUTCMonth() + 1)}.${d.getUTCFullYear()}`;
+  });
+}
+
+// a busy background for ?bg=: gradients and noise, so glow and text blend with real pixels
+function writeBackground(file) {
+  const canvas = createCanvas(1366, 768);
+  const ctx = canvas.getContext("2d");
+  const img = ctx.createImageData(1366, 768);
+  let seed = 1;
+  for (let i = 0; i < img.data.length; i += 4) {
+    const x = (i / 4) % 1366, y = Math.floor(i / 4 / 1366);
+    seed = (seed * 1103515245 + 12345) & 0x7fffffff;
+    img.data[i] = (x * 255) / 1366;
+    img.data[i + 1] = (y * 255) / 768;
+    img.data[i + 2] = seed % 256;
+    img.data[i + 3] = 255;
+  }
+  ctx.putImageData(img, 0, 0);
+  fs.writeFileSync(file, canvas.toBuffer("image/png"));
+}
+
+const png = (out) => (Buffer.isBuffer(out) ? out : out.toBuffer("image/png"));
+
+async function pixels(buf) {
+  const img = await loadImage(buf);
+  const ctx = createCanvas(img.width, img.height).getContext("2d");
+  ctx.drawImage(img, 0, 0);
+  return ctx.getImageData(0, 0, img.width, img.height).data;
+}
+
+async function pixelDiff(a, b) {
+  const [pa, pb] = [await pixels(a), await pixels(b)];
+  if (pa.length !== pb.length) return { pixels: Infinity, maxDelta: 255 };
+  let n = 0, maxDelta = 0;
+  for (let i = 0; i < pa.length; i += 4) {
+    let d = 0;
+    for (let k = 0; k < 4; k++) d = Math.max(d, Math.abs(pa[i + k] - pb[i + k]));
+    if (d) {
+      n++;
+      maxDelta = Math.max(maxDelta, d);
+    }
+  }
+  return { pixels: n, maxDelta };
+}
+
+async function perSecond(draw, dates, ms) {
+  png(await draw(dates[0])); // warm: the new path draws its layer here
+  let n = 0;
+  const t0 = performance.now();
+  while (performance.now() - t0 < ms) png(await draw(dates[n++ % dates.length]));
+  return Math.round((n * 1000) / (performance.now() - t0));
+}
+
+async function compare(label, oldDraw, newDraw, dates, ms) {
+  let bytesEqual = 0, pixelEqual = 0, worst = null;
+  for (const date of dates) {
+    const a = png(await oldDraw(date)), b = png(await newDraw(date));
+    if (a.equals(b)) {
+      bytesEqual++;
+      pixelEqual++;
+      continue;
+    }
+    const d = await pixelDiff(a, b);
+    if (!d.pixels) pixelEqual++;
+    else if (!worst || d.pixels > worst.pixels) worst = { date, ...d };
+  }
+  const row = {
+    module: label,
+    dates: dates.length,
+    bytesEqual,
+    pixelEqual,
+    worst,
+    oldPerS: await perSecond(oldDraw, dates, ms),
+    newPerS: await perSecond(newDraw, dates, ms),
+  };
+  const speedup = (row.newPerS / row.oldPerS).toFixed(2);
+  log(
+    `${label.padEnd(30)} bytes ${bytesEqual}/${dates.length}  pixels ${pixelEqual}/${dates.length}  ` +
+      `${String(row.oldPerS).padStart(5)} → ${String(row.newPerS).padStart(5)} img/s (×${speedup})` +
+      (worst ? `  worst ${worst.date}: ${worst.pixels} px, Δ${worst.maxDelta}` : "")
+  );
+  return row;
+}
+
+async function main() {
+  const layersCommit = git("log", "-1", "--format=%H", "--diff-filter=A", "--", "lib/triangles/layers.ts").trim();
+  const base = opt("base", layersCommit ? `${layersCommit}^` : "");
+  if (!base) throw new Error("no --base and lib/triangles/layers.ts has no adding commit");
+  const dates = sampleDates(Number(opt("dates", 40)));
+  const ms = Number(opt("seconds", 2)) * 1000;
+
+  const files = [...MODULES, MISIJA].map(([name]) => `lib/triangles/${name}.ts`);
+  const loadOld = build(path.join(BUILD, "old"), files, (f) => git("show", `${base}:${f}`));
+  const loadNew = build(path.join(BUILD, "new"), [...files, "lib/triangles/layers.ts"], (f) => fs.readFileSync(f, "utf8"));
+  build(BUILD, ["lib/registerFont.ts"], (f) => fs.readFileSync(f, "utf8"))("registerFont"); // as the routes do
+  const bg = path.resolve(BUILD, "bg.png");
+  writeBackground(bg);
+
+  log(`old: ${git("rev-parse", "--short", base).trim()}, new: working tree; ${dates.length} dates, node ${process.version}`);
+  const rows = [];
+  for (const [name, fn] of MODULES) {
+    const [oldM, newM] = [loadOld(name), loadNew(name)];
+    rows.push(await compare(name, (d) => oldM[fn](d), (d) => newM[fn](d), dates, ms));
+  }
+  const [oldM, newM] = [loadOld(MISIJA[0]), loadNew(MISIJA[0])];
+  const [, fn] = MISIJA;
+  rows.push(await compare("numbersMisija", (d) => oldM[fn](d), (d) => newM[fn](d), dates, ms));
+  rows.push(await compare("numbersMisija ?bg=", (d) => oldM[fn](d, bg), (d) => newM[fn](d, bg), dates, ms));
+
+  const json = opt("json");
+  if (json) fs.writeFileSync(json, JSON.stringify({ base, node: process.version, rows }, null, 2));
+  const differing = rows.filter((r) => r.pixelEqual !== r.dates);
+  log(differing.length ? `❌ ${differing.length} module(s) differ` : "✅ every image is pixel-equal");
+  process.exit(differing.length ? 1 : 0);
+}
+
+main().catch((err) => {
+  console.error(err);
+  process.exit(2);
+});
@@ -0,0 +1,184 @@
+# build_numerology_table.py
+# Build numerology_table.bin: every number of every birthdate in [FIRST_YEAR, LAST_YEAR],
+# computed for all dates at once with NumPy. Layout: see numerology_table.py.
+#
+# Usage: python3 build_numerology_table.py [--from 1900] [--to 2100] [--out PATH] [--no-verify]
+#
+# The result is checked row by row against numerology.py (the reference port of the TS)
+# before it is written, so a wrong vectorization can't ship.
+
+import os, sys, time, argparse
+import numpy as np
+
+import numerology
+from numerology_table import (TABLE_PATH, MAGIC, HEADER, COLUMNS, TRIANGLE_NAMES, TRIANGLE_KEYS,
+                              STAR_ALL, data_offset, NumerologyTable)
+
+FIRST_YEAR = 1900
+LAST_YEAR = 2100
+
+
+# =========================
+# VECTORIZED MATH (same formulas as numerology.py)
+# =========================
+def digit_sum(x: np.ndarray) -> np.ndarray:
+    s = np.zeros_like(x)
+    x = x.copy()
+    while x.any():
+        s += x % 10
+        x //= 10
+    return s
+
+def reduce22(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.int32)
+    while (x > 22).any():
+        x = np.where(x > 22, digit_sum(x), x)
+    return x
+
+def tri(top, right, left):
+    return {"top": top, "right": right, "left": left,
+            "mr": reduce22(top + right), "ml": reduce22(top + left), "mb": reduce22(right + left)}
+
+def compute(d: np.ndarray, m: np.ndarray, y: np.ndarray) -> dict:
+    cols = {}
+    r = reduce22
+    y_sum = digit_sum(y)
+    yR = r(y_sum)
+    d1 = r(d)
+    mR = r(m)
+
+    # --- star.ts calcStar ---
+    n = {1: np.where(d <= 22, d, d1), 2: m, 3: yR}
+    n[4] = r(n[1] + n[2] + n[3])
+    n[5] = r(n[1] + n[2] + n[3] + n[4])
+    n[6] = r(n[1] + n[2] + n[3] + n[4] + n[5])
+    n[7], n[8], n[9], n[10], n[11] = r(n[1] + n[2]), r(n[2] + n[3]), r(n[3] + n[4]), r(n[4] + n[5]), r(n[5] + n[1])
+    for k, (a, b) in enumerate([(1, 7), (1, 11), (7, 11), (7, 2), (8, 2), (7, 8), (3, 8), (3, 9),
+                                (8, 9), (4, 9), (4, 10), (9, 10), (5, 10), (5, 11), (11, 10)], start=12):
+        n[k] = r(n[a] + n[b])
+    for i in range(1, 27):
+        cols[f"calc{i}"] = n[i]
+
+    # --- starMath.ts calcStarNumbers ---
+    s1, s2, s3 = np.where(d > 22, d1, d), m, yR
+    s4 = r(s1 + s2 + s3)
+    s5 = r(s1 + s2 + s3 + s4)
+    s7, s9 = r(s1 + s2), r(s2 + s3)
+    s20, s23, s26 = r(s1 + s5), r(s4 + s5), r(s3 + s4)
+    cols.update({"star_left1": s1, "star_top9": s2, "star_right6": s3, "star_br16": s4, "star_bl5": s5})
+    cols.update({"star_ch6": r(s1 + s7), "star_ch7": s7, "star_ch8": r(s7 + s9), "star_ch9": s9, "star_ch10": r(s9 + s3)})
+    cols["star_center"] = r(s1 + s2 + s3 + s4 + s5)
+    star_all = {
+        12: r(s7 + s2), 13: r(s2 + s9), 15: r(s9 + s26), 16: r(s23 + s26), 17: r(s20 + s23),
+        18: r(s7 + s20), 19: r(s1 + s20), 20: s20, 21: r(s5 + s20), 22: r(s5 + s23), 23: s23,
+        24: r(s4 + s23), 25: r(s4 + s26), 26: s26, 27: r(s3 + s26),
+    }
+    for i in STAR_ALL:
+        cols[f"star_{i}"] = star_all[i]
+
+    # --- triangles ---
+    tris = {}
+    a4 = r(d1 + m + yR)
+    tris["personiba"] = tri(d1, r(d1 + m), r(d1 + r(d1 + m + yR + a4)))
+    b4 = r(d1 + mR + yR)
+    tris["berns"] = tri(d1, r(d + m), r(d1 + r(d1 + mR + yR + b4)))
+    tris["dzimta"] = tri(mR, r(mR + yR), r(d1 + mR))
+    inner = r(d1 + mR + yR)
+    tris["finanses"] = tri(yR, r(yR + inner), r(yR + mR))
+    top = r(d1 + m + yR)
+    tris["attiecibas"] = tri(top, r(top + r(d + m + y_sum + top)), r(top + yR))
+    base = r(d1 + mR + yR)
+    vtop = r(d1 + mR + yR + base)
+    tris["veseliba"] = tri(vtop, r(vtop + d1), r(vtop + base))
+    for name in TRIANGLE_NAMES:
+        for k in TRIANGLE_KEYS:
+            cols[f"{name}_{k}"] = tris[name][k]
+
+    # --- misija ---
+    first = n[6]
+    second = r(n[7] + n[8] + n[9] + n[10] + n[11])
+    cols.update({"misija_first": first, "misija_second": second, "misija_third": r(first + second)})
+    return cols
+
+
+# =========================
+# BUILD / VERIFY
+# =========================
+def all_dates(first_year: int, last_year: int):
+    days = np.arange(np.datetime64(f"{first_year}-01-01"), np.datetime64(f"{last_year + 1}-01-01"))
+    y = days.astype("datetime64[Y]").astype(np.int32) + 1970
+    m = days.astype("datetime64[M]").astype(np.int32) % 12 + 1
+    d = (days - days.astype("datetime64[M]")).astype(np.int32) + 1
+    return d, m, y
+
+def build(first_year: int, last_year: int) -> np.ndarray:
+    d, m, y = all_dates(first_year, last_year)
+    cols = compute(d, m, y)
+    rows = np.stack([cols[name] for name in COLUMNS], axis=1)
+    assert rows.min() >= 0 and rows.max() <= 255
+    return rows.astype(np.uint8)
+
+def write(path: str, rows: np.ndarray, first_year: int, last_year: int):
+    names = "\n".join(COLUMNS).encode()
+    offset = data_offset(len(names))
+    header = HEADER.pack(MAGIC, first_year, last_year, rows.shape[0], rows.shape[1], len(names)) + names
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(offset, b"\0"))
+        f.write(np.ascontiguousarray(rows).tobytes())
+    os.replace(tmp, path)  # running workers keep their old mmap until restart
+
+def verify(path: str) -> int:
+    """Compare every row with the scalar reference implementation."""
+    t = NumerologyTable(path)
+    bad = 0
+    for i, (d, m, y) in enumerate(zip(*all_dates(t.first_year, t.last_year))):
+        d, m, y = int(d), int(m), int(y)
+        ds = f"{d:02d}.{m:02d}.{y}"
+        r = t.row(d, m, y)
+        want = {f"calc{k}": v for k, v in numerology.star_calc(ds).items()}
+        star = numerology.star_numbers(ds)
+        want.update({f"star_{k}": v for k, v in star["outer"].items()})
+        want.update({f"star_ch{i}": v for i, v in zip(range(6, 11), star["chakras"])})
+        want["star_center"] = star["center"]
+        want.update({f"star_{k}": v for k, v in star["all"].items()})
+        for name in TRIANGLE_NAMES:
+            want.update({f"{name}_{k}": v for k, v in numerology.TRIANGLES[name](d, m, y).items()})
+        want.update(zip(("misija_first", "misija_second", "misija_third"), numerology.misija_numbers(d, m, y)))
+        for name, v in want.items():
+            if r[t.col[name]] != v:
+                bad += 1
+                if bad <= 10:
+                    print(f"❌ {ds} {name}: table {r[t.col[name]]} != {v}")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Build numerology_table.bin")
+    ap.add_argument("--from", dest="first_year", type=int, default=FIRST_YEAR)
+    ap.add_argument("--to", dest="last_year", type=int, default=LAST_YEAR)
+    ap.add_argument("--out", default=TABLE_PATH)
+    ap.add_argument("--no-verify", action="store_true")
+    opts = ap.parse_args()
+
+    t0 = time.perf_counter()
+    rows = build(opts.first_year, opts.last_year)
+    tmp = f"{opts.out}.new"
+    write(tmp, rows, opts.first_year, opts.last_year)
+    print(f"🧮 {rows.shape[0]} dates × {rows.shape[1]} numbers in {time.perf_counter() - t0:.2f}s")
+
+    if not opts.no_verify:
+        t1 = time.perf_counter()
+        bad = verify(tmp)
+        if bad:
+            os.unlink(tmp)
+            print(f"❌ {bad} mismatches with numerology.py, table not written")
+            sys.exit(1)
+        print(f"✅ Verified against numerology.py in {time.perf_counter() - t1:.2f}s")
+
+    os.replace(tmp, opts.out)
+    print(f"✅ {opts.out} ({os.path.getsize(opts.out) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
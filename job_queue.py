@@ -0,0 +1,183 @@
+# job_queue.py
+# Durable queue for paid reports (Stripe webhook → report_worker.py).
+#
+# The webhook only enqueues; the worker drains the queue with as many dispatchers as it
+# has processes, so a burst of orders waits in SQLite instead of starting dozens of
+# reportlab processes at once. A failed job is retried with exponential backoff
+# (QUEUE_RETRY_BASE_SECONDS · 2^(attempt-1), up to QUEUE_MAX_ATTEMPTS tries).
+# Jobs left "running" by a crashed worker are put back on startup.
+# `ref` is the Stripe event id: a webhook retry of an event that is already queued (or done)
+# gets the existing job back instead of a second one.
+#
+# Usage: python3 job_queue.py stats
+#        python3 job_queue.py enqueue REPORT ARGS...
+
+import os, json, time, sqlite3, threading
+
+QUEUE_PATH = os.getenv("REPORT_QUEUE_DB", "/tmp/astro-report-queue.sqlite")
+MAX_ATTEMPTS = int(os.getenv("QUEUE_MAX_ATTEMPTS", "4"))
+RETRY_BASE_SECONDS = float(os.getenv("QUEUE_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = float(os.getenv("QUEUE_RETRY_MAX_SECONDS", "900"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    report TEXT NOT NULL,
+    args TEXT NOT NULL,
+    ref TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',   -- queued | running | done | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    ms INTEGER,
+    pdf TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs(status, run_at);
+CREATE INDEX IF NOT EXISTS jobs_ref ON jobs(ref);
+"""
+
+
+class JobQueue:
+    def __init__(self, path: str = QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        # one connection per thread (dispatchers + socket handlers), never one inherited through fork
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    # ---------- producer ----------
+    def enqueue(self, report: str, args: list, ref: str = None, max_attempts: int = MAX_ATTEMPTS) -> tuple:
+        """(job id, created). With a ref that's already in the queue: (that job's id, False)."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT id FROM jobs WHERE ref = ? ORDER BY id LIMIT 1", (ref,)).fetchone() if ref else None
+            if row is None:
+                cur = db.execute(
+                    "INSERT INTO jobs(report, args, ref, max_attempts, run_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (report, json.dumps(list(args), ensure_ascii=False), ref, max_attempts, now, now),
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return (cur.lastrowid, True) if row is None else (row["id"], False)
+
+    # ---------- consumer ----------
+    def claim(self):
+        """Take the oldest due job (status → running), or None. Safe across threads and processes."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND run_at <= ? ORDER BY run_at, id LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, started_at = ? WHERE id = ?",
+                (now, row["id"]),
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        job = dict(row)
+        job["args"] = json.loads(job["args"])
+        job["attempts"] += 1
+        return job
+
+    def complete(self, job: dict, result: dict):
+        self._db().execute(
+            "UPDATE jobs SET status = 'done', finished_at = ?, ms = ?, pdf = ?, error = NULL WHERE id = ?",
+            (time.time(), result.get("ms"), result.get("pdf"), job["id"]),
+        )
+
+    def fail(self, job: dict, error: str) -> bool:
+        """Record a failed attempt. Returns True if the job will be retried."""
+        now = time.time()
+        if job["attempts"] < job["max_attempts"]:
+            delay = min(RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1), RETRY_MAX_SECONDS)
+            self._db().execute(
+                "UPDATE jobs SET status = 'queued', run_at = ?, error = ? WHERE id = ?",
+                (now + delay, error, job["id"]),
+            )
+            return True
+        self._db().execute(
+            "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+            (now, error, job["id"]),
+        )
+        return False
+
+    def requeue_running(self) -> int:
+        """After a worker restart: jobs it was running never finished, run them again."""
+        cur = self._db().execute("UPDATE jobs SET status = 'queued', run_at = ? WHERE status = 'running'", (time.time(),))
+        return cur.rowcount
+
+    def next_run_at(self):
+        row = self._db().execute("SELECT MIN(run_at) FROM jobs WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    # ---------- visibility ----------
+    def stats(self, window: int = 200) -> dict:
+        db = self._db()
+        now = time.time()
+        counts = {status: n for status, n in db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")}
+        oldest = db.execute("SELECT MIN(created_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        recent = db.execute(
+            "SELECT finished_at - created_at, ms FROM jobs WHERE status = 'done' ORDER BY finished_at DESC LIMIT ?",
+            (window,),
+        ).fetchall()
+        latency = sorted(r[0] for r in recent)
+        run_ms = sorted(r[1] for r in recent if r[1] is not None)
+
+        def pct(values, p):
+            return values[min(len(values) - 1, int(p * len(values)))] if values else None
+
+        return {
+            "depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_queued_s": round(now - oldest, 1) if oldest else 0,
+            # enqueue → finished, including time spent waiting and retrying
+            "latency_p50_s": round(pct(latency, 0.5), 2) if latency else None,
+            "latency_p95_s": round(pct(latency, 0.95), 2) if latency else None,
+            "run_p50_ms": pct(run_ms, 0.5),
+            "run_p95_ms": pct(run_ms, 0.95),
+        }
+
+    def recent(self, limit: int = 20) -> list:
+        rows = self._db().execute(
+            "SELECT id, report, ref, status, attempts, created_at, finished_at, ms, error FROM jobs ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+if __name__ == "__main__":
+    import sys
+    q = JobQueue()
+    if len(sys.argv) >= 3 and sys.argv[1] == "enqueue":
+        print(q.enqueue(sys.argv[2], sys.argv[3:])[0])
+    elif len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        print(json.dumps({"stats": q.stats(), "recent": q.recent()}, indent=2, ensure_ascii=False))
+    else:
+        print("❌ Usage: python job_queue.py stats | enqueue REPORT ARGS...")
+        sys.exit(1)
@@ -0,0 +1,105 @@
+// lib/admission.ts
+// Admission control for the synchronous report routes (personiba, finanses, berns, saderiba,
+// forecast_pdf). Each holds the HTTP request open while a report renders, so without a limit
+// a burst starts one reportlab process per request and every request slows down together.
+//   REPORT_MAX_INFLIGHT  reports rendering at once in this Node process (default: CPU count)
+//   REPORT_MAX_QUEUED    requests waiting for a slot, first come first served (default 16)
+//   REPORT_QUEUE_WAIT_MS longest a request waits for a slot (default 60 s)
+// A full queue, or a wait that runs out, is answered 503 + Retry-After at once (estimated
+// from recent run times). GET /api/report_admission shows the counts; it is 503 itself while
+// the queue is full, so a load balancer health check can route around a saturated instance.
+// Paid orders don't come through here: they go to the worker's job queue (enqueueReport).
+import os from "os";
+
+const LIMIT = Math.max(1, Number(process.env.REPORT_MAX_INFLIGHT || os.cpus().length));
+const MAX_QUEUED = Math.max(0, Number(process.env.REPORT_MAX_QUEUED || 16));
+const QUEUE_WAIT_MS = Number(process.env.REPORT_QUEUE_WAIT_MS || 60_000);
+
+type Waiter = { start: () => void; timer: NodeJS.Timeout };
+
+let inflight = 0;
+const waiting: Waiter[] = [];
+let avgRunMs = 3000; // moving average of a report's run time, for Retry-After
+const stats = { admitted: 0, waited: 0, rejected: 0, timedOut: 0 };
+
+export class AdmissionBusy extends Error {
+  constructor(public reason: "queue_full" | "timeout", public retryAfterS: number) {
+    super(reason === "queue_full" ? "Too many reports in progress" : "Timed out waiting for a report slot");
+  }
+}
+
+// Seconds until a slot is likely free for one more request
+function retryAfter(): number {
+  return Math.max(1, Math.ceil((avgRunMs * (waiting.length + 1)) / LIMIT / 1000));
+}
+
+function acquire(): Promise<void> {
+  if (inflight < LIMIT && waiting.length === 0) {
+    inflight++;
+    return Promise.resolve();
+  }
+  if (waiting.length >= MAX_QUEUED) {
+    stats.rejected++;
+    return Promise.reject(new AdmissionBusy("queue_full", retryAfter()));
+  }
+  stats.waited++;
+  return new Promise((resolve, reject) => {
+    const waiter: Waiter = {
+      start: resolve,
+      timer: setTimeout(() => {
+        waiting.splice(waiting.indexOf(waiter), 1);
+        stats.timedOut++;
+        reject(new AdmissionBusy("timeout", retryAfter()));
+      }, QUEUE_WAIT_MS),
+    };
+    waiting.push(waiter);
+  });
+}
+
+function release(runMs: number) {
+  avgRunMs = avgRunMs * 0.8 + runMs * 0.2;
+  const next = waiting.shift();
+  if (next) {
+    clearTimeout(next.timer);
+    next.start(); // the slot goes straight to the next request, inflight stays the same
+  } else {
+    inflight--;
+  }
+}
+
+/** Run `fn` once a slot is free; rejects with AdmissionBusy when the instance is saturated. */
+export async function withAdmission<T>(fn: () => Promise<T>): Promise<T> {
+  await acquire();
+  stats.admitted++;
+  const started = Date.now();
+  try {
+    return await fn();
+  } finally {
+    release(Date.now() - started);
+  }
+}
+
+// 503 + Retry-After for a request that wasn't admitted
+export function busyResponse(err: AdmissionBusy): Response {
+  return new Response(JSON.stringify({ error: err.message, reason: err.reason, retryAfter: err.retryAfterS }), {
+    status: 503,
+    headers: {
+      "Content-Type": "application/json",
+      "Retry-After": String(err.retryAfterS),
+      "Cache-Control": "no-store",
+    },
+  });
+}
+
+export function admissionStats() {
+  return {
+    inflight,
+    queued: waiting.length,
+    limit: LIMIT,
+    maxQueued: MAX_QUEUED,
+    saturated: waiting.length >= MAX_QUEUED && inflight >= LIMIT,
+    retryAfterS: retryAfter(),
+    avgRunMs: Math.round(avgRunMs),
+    ...stats,
+  };
+}
@@ -0,0 +1,122 @@
+// lib/dailyTexts.ts
+// In-process copy of Supabase `daily_texts` (lang=lv) for /api/forecast.
+// A forecast depends only on (dailyNumber, day of year) → at most 22 answers a day, so the
+// whole table is kept here and every answer is built once per day, with its ETag.
+//   - first request loads the table (concurrent callers share the load)
+//   - older than DAILY_TEXTS_TTL_SECONDS → served as is, reloaded in the background
+//   - a failed reload keeps the old rows; only a cold start without rows reports the error
+import crypto from "crypto";
+import { createClient } from "@supabase/supabase-js";
+
+const SUPABASE_URL = process.env.SUPABASE_URL || "";
+const SUPABASE_KEY =
+  process.env.SUPABASE_SERVICE_ROLE_KEY ||
+  process.env.SUPABASE_ANON_KEY ||
+  "";
+
+const TTL_MS = Number(process.env.DAILY_TEXTS_TTL_SECONDS || 300) * 1000;
+const PAGE_ROWS = 1000; // PostgREST max-rows default
+const LANG = "lv";
+
+export type DailyText = {
+  number: number;
+  lang: string;
+  variant: number;
+  title: string;
+  content: string;
+};
+
+export type DailyResponse = { body: string; etag: string };
+
+let supabase: any = null;
+if (SUPABASE_URL && SUPABASE_KEY) {
+  supabase = createClient(SUPABASE_URL, SUPABASE_KEY);
+}
+
+let byNumber: Map<number, DailyText[]> | null = null;
+let version = "";    // hash of the rows: unchanged table → same ETags after a reload
+let loadedAt = 0;
+let loading: Promise<void> | null = null;
+const responses = new Map<string, DailyResponse>(); // `${doy}:${num}` for the current version
+
+const sha1 = (s: string) => crypto.createHash("sha1").update(s).digest("hex");
+
+async function fetchAll(): Promise<DailyText[]> {
+  if (!supabase) throw new Error("Supabase is not configured");
+  const rows: DailyText[] = [];
+  for (;;) {
+    const { data, error } = await supabase
+      .from("daily_texts")
+      .select("number, lang, variant, title, content")
+      .eq("lang", LANG)
+      .order("number", { ascending: true })
+      .order("variant", { ascending: true })
+      .range(rows.length, rows.length + PAGE_ROWS - 1);
+    if (error) throw new Error(error.message);
+    rows.push(...(data || []));
+    if (!data || data.length < PAGE_ROWS) return rows;
+  }
+}
+
+function load(): Promise<void> {
+  if (!loading) {
+    loading = (async () => {
+      try {
+        const rows = await fetchAll();
+        const next = new Map<number, DailyText[]>();
+        for (const row of rows) {
+          const n = Number(row.number); // the lookup is by a computed number, whatever the column type
+          if (!next.has(n)) next.set(n, []);
+          next.get(n)!.push(row);
+        }
+        const nextVersion = sha1(JSON.stringify(rows));
+        if (nextVersion !== version) responses.clear();
+        byNumber = next;
+        version = nextVersion;
+        loadedAt = Date.now();
+      } catch (err) {
+        if (!byNumber) throw err;
+        console.warn("⚠️ daily_texts refresh failed, serving cached rows:", (err as Error).message);
+      } finally {
+        loading = null;
+      }
+    })();
+  }
+  return loading;
+}
+
+async function texts(): Promise<Map<number, DailyText[]>> {
+  if (!byNumber) await load();
+  else if (Date.now() - loadedAt > TTL_MS) load().catch(() => {}); // stale-while-revalidate
+  return byNumber!;
+}
+
+/**
+ * Ready JSON body + ETag for a daily number on a given day of year,
+ * or null if daily_texts has no rows for that number. Throws only if the table was never loaded.
+ */
+export async function dailyResponse(num: number, doy: number): Promise<DailyResponse | null> {
+  const table = await texts();
+  const key = `${doy}:${num}`;
+  const ready = responses.get(key);
+  if (ready) return ready;
+
+  const data = table.get(num);
+  if (!data || data.length === 0) return null;
+
+  // same pick as before: data[doy % data.length], variants in ascending order
+  const pick = data[doy % data.length];
+  const body = JSON.stringify({
+    dailyNumber: num,
+    forecast: {
+      title: `Cipars ${num}`,
+      content: pick.content,
+    },
+  });
+  const built = { body, etag: `"${sha1(`${version}|${body}`).slice(0, 27)}"` };
+
+  // keep only today's answers (a new day of year drops yesterday's)
+  for (const k of responses.keys()) if (!k.startsWith(`${doy}:`)) responses.delete(k);
+  responses.set(key, built);
+  return built;
+}
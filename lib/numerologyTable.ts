@@ -0,0 +1,125 @@
+// lib/numerologyTable.ts
+// Reader for numerology_table.bin (built by build_numerology_table.py, layout in numerology_table.py).
+// Every number of every birthdate 1900..2100 → O(1) lookup by day number.
+// Node has no mmap, so the file is read into one Buffer on first use (≈6 MB, shared by all requests).
+// Missing table or a date outside it → null, and the caller computes the numbers as before.
+import fs from "fs";
+import path from "path";
+import { calcStarNumbers, parseBirth, type StarNumbers } from "@/lib/starMath";
+
+const TABLE_PATH = process.env.NUMEROLOGY_TABLE || path.join(process.cwd(), "numerology_table.bin");
+const MAGIC = "NUMTAB01";
+const HEADER_SIZE = 20;
+const DATA_ALIGN = 16;
+
+export type TriangleNumbers = {
+  top: number;
+  bottomRight: number;
+  bottomLeft: number;
+  midRight: number;
+  midLeft: number;
+  midBottom: number;
+};
+
+type Table = {
+  buf: Buffer;
+  firstYear: number;
+  lastYear: number;
+  rowSize: number;
+  offset: number;
+  col: Record<string, number>;
+};
+
+let table: Table | null | undefined;
+
+function load(): Table | null {
+  if (table !== undefined) return table;
+  try {
+    const buf = fs.readFileSync(TABLE_PATH);
+    if (buf.toString("latin1", 0, 8) !== MAGIC) throw new Error("bad magic");
+    const namesLen = buf.readUInt16LE(18);
+    const names = buf.toString("utf8", HEADER_SIZE, HEADER_SIZE + namesLen).split("\n");
+    table = {
+      buf,
+      firstYear: buf.readUInt16LE(8),
+      lastYear: buf.readUInt16LE(10),
+      rowSize: buf.readUInt16LE(16),
+      offset: Math.ceil((HEADER_SIZE + namesLen) / DATA_ALIGN) * DATA_ALIGN,
+      col: Object.fromEntries(names.map((n, i) => [n, i])),
+    };
+  } catch (err: any) {
+    if (err?.code !== "ENOENT") console.warn("⚠️ Numerology table unusable:", err?.message);
+    table = null;
+  }
+  return table;
+}
+
+// Byte offset of a date's row, or -1 if it's not a real date inside the table
+function rowStart(t: Table, d: number, m: number, y: number): number {
+  if (!(y >= t.firstYear && y <= t.lastYear)) return -1;
+  const ms = Date.UTC(y, m - 1, d);
+  const check = new Date(ms);
+  if (check.getUTCFullYear() !== y || check.getUTCMonth() !== m - 1 || check.getUTCDate() !== d) return -1;
+  const day = Math.round((ms - Date.UTC(t.firstYear, 0, 1)) / 86400000);
+  return t.offset + day * t.rowSize;
+}
+
+function parseDots(dateStr: string) {
+  // same as the triangles: dateStr.split(".").map(Number)
+  const [d, m, y] = dateStr.split(".").map(Number);
+  return { d, m, y };
+}
+
+export function lookupTriangle(name: string, dateStr: string): TriangleNumbers | null {
+  const t = load();
+  if (!t) return null;
+  const { d, m, y } = parseDots(dateStr);
+  const at = rowStart(t, d, m, y);
+  if (at < 0) return null;
+  const key = name === "saderiba" ? "attiecibas" : name;
+  const v = (k: string) => t.buf[at + t.col[`${key}_${k}`]];
+  return {
+    top: v("top"),
+    bottomRight: v("right"),
+    bottomLeft: v("left"),
+    midRight: v("mr"),
+    midLeft: v("ml"),
+    midBottom: v("mb"),
+  };
+}
+
+export function lookupMisija(dateStr: string): { first: number; second: number; third: number } | null {
+  const t = load();
+  if (!t) return null;
+  const { d, m, y } = parseDots(dateStr);
+  const at = rowStart(t, d, m, y);
+  if (at < 0) return null;
+  return {
+    first: t.buf[at + t.col.misija_first],
+    second: t.buf[at + t.col.misija_second],
+    third: t.buf[at + t.col.misija_third],
+  };
+}
+
+// starMath.ts calcStarNumbers; takes already-parsed d/m/y (parseBirth accepts several formats)
+export function lookupStar(d: number, m: number, y: number): StarNumbers | null {
+  const t = load();
+  if (!t) return null;
+  const at = rowStart(t, d, m, y);
+  if (at < 0) return null;
+  const v = (k: string) => t.buf[at + t.col[`star_${k}`]];
+  const all: Record<number, number> = {};
+  for (const i of [12, 13, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27]) all[i] = v(String(i));
+  return {
+    outer: { left1: v("left1"), top9: v("top9"), right6: v("right6"), br16: v("br16"), bl5: v("bl5") },
+    chakras: [v("ch6"), v("ch7"), v("ch8"), v("ch9"), v("ch10")],
+    center: v("center"),
+    all,
+  };
+}
+
+// calcStarNumbers(date), from the table when the date is in it
+export function starNumbers(date: string): StarNumbers {
+  const { d, m, y } = parseBirth(date);
+  return lookupStar(d, m, y) ?? calcStarNumbers(date);
+}
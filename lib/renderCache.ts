@@ -0,0 +1,197 @@
+// lib/renderCache.ts
+// Cache for star/triangle images. An image depends only on (route, mode, numbers) — many
+// dates share the same numbers — so the key is a hash of those, not of the date.
+//   memory: LRU by total bytes (RENDER_CACHE_MAX_MB)
+//   disk:   RENDER_CACHE_DIR, survives restarts, trimmed oldest-first (RENDER_CACHE_DISK_MB)
+// The key hash is also the ETag, so If-None-Match is answered with 304 before any lookup.
+// Bump RENDER_CACHE_VERSION when drawing code changes, to drop old images.
+import fs from "fs";
+import path from "path";
+import crypto from "crypto";
+
+const VERSION = process.env.RENDER_CACHE_VERSION || "1";
+const MAX_BYTES = Number(process.env.RENDER_CACHE_MAX_MB || 64) * 1024 * 1024;
+const DISK_DIR = process.env.RENDER_CACHE_DIR || "/tmp/astro-render-cache";
+const DISK_MAX_BYTES = Number(process.env.RENDER_CACHE_DISK_MB || 512) * 1024 * 1024;
+const DISK_ENABLED = process.env.RENDER_CACHE_DISK !== "0";
+const CACHE_CONTROL = "public, max-age=86400";
+
+export type RenderKey = {
+  route: string;     // "star", "triangle/personiba", ...
+  mode?: string;     // output format / variant (png, pdf, bg=...)
+  numbers: unknown;  // whatever the image is drawn from
+};
+
+type Rendered = Buffer | Uint8Array;
+
+const memory = new Map<string, Buffer>(); // insertion order = LRU order
+let memoryBytes = 0;
+const pending = new Map<string, Promise<[Buffer, string]>>();
+const stats = { hits: 0, diskHits: 0, misses: 0, notModified: 0, evictions: 0 };
+
+// JSON with sorted keys, so {a,b} and {b,a} hash the same
+function stable(v: unknown): string {
+  if (Array.isArray(v)) return `[${v.map(stable).join(",")}]`;
+  if (v && typeof v === "object") {
+    return `{${Object.keys(v as object)
+      .sort()
+      .map((k) => `${JSON.stringify(k)}:${stable((v as any)[k])}`)
+      .join(",")}}`;
+  }
+  return JSON.stringify(v);
+}
+
+export function renderKey(key: RenderKey): string {
+  return crypto
+    .createHash("sha1")
+    .update(`${VERSION}|${key.route}|${key.mode ?? ""}|${stable(key.numbers)}`)
+    .digest("hex");
+}
+
+// ---------- memory ----------
+function memGet(hash: string): Buffer | undefined {
+  const buf = memory.get(hash);
+  if (buf) {
+    memory.delete(hash);
+    memory.set(hash, buf); // most recently used → end
+  }
+  return buf;
+}
+
+function memSet(hash: string, buf: Buffer) {
+  if (buf.length > MAX_BYTES) return;
+  const old = memory.get(hash);
+  if (old) memoryBytes -= old.length;
+  memory.delete(hash);
+  memory.set(hash, buf);
+  memoryBytes += buf.length;
+  for (const [k, v] of memory) {
+    if (memoryBytes <= MAX_BYTES) break;
+    memory.delete(k);
+    memoryBytes -= v.length;
+    stats.evictions++;
+  }
+}
+
+// ---------- disk ----------
+const diskPath = (hash: string) => path.join(DISK_DIR, hash.slice(0, 2), `${hash}.bin`);
+
+async function diskGet(hash: string): Promise<Buffer | null> {
+  if (!DISK_ENABLED) return null;
+  try {
+    const file = diskPath(hash);
+    const buf = await fs.promises.readFile(file);
+    const now = new Date();
+    fs.promises.utimes(file, now, now).catch(() => {}); // mtime = last use, for trimming
+    return buf;
+  } catch {
+    return null;
+  }
+}
+
+let writesSinceTrim = 0;
+
+async function diskSet(hash: string, buf: Buffer) {
+  if (!DISK_ENABLED) return;
+  const file = diskPath(hash);
+  const tmp = `${file}.${process.pid}.tmp`;
+  try {
+    await fs.promises.mkdir(path.dirname(file), { recursive: true });
+    await fs.promises.writeFile(tmp, buf);
+    await fs.promises.rename(tmp, file);
+    if (++writesSinceTrim >= 100) {
+      writesSinceTrim = 0;
+      await trimDisk();
+    }
+  } catch (err) {
+    console.warn("⚠️ Render cache disk write failed:", err);
+  }
+}
+
+// Delete least recently used files until the directory fits DISK_MAX_BYTES
+async function trimDisk() {
+  const files: { file: string; size: number; mtime: number }[] = [];
+  for (const dir of await fs.promises.readdir(DISK_DIR)) {
+    const sub = path.join(DISK_DIR, dir);
+    for (const name of await fs.promises.readdir(sub).catch(() => [] as string[])) {
+      if (!name.endsWith(".bin")) continue;
+      const file = path.join(sub, name);
+      const st = await fs.promises.stat(file).catch(() => null);
+      if (st) files.push({ file, size: st.size, mtime: st.mtimeMs });
+    }
+  }
+  let total = files.reduce((s, f) => s + f.size, 0);
+  files.sort((a, b) => a.mtime - b.mtime);
+  for (const f of files) {
+    if (total <= DISK_MAX_BYTES) break;
+    await fs.promises.unlink(f.file).catch(() => {});
+    total -= f.size;
+  }
+}
+
+// ---------- lookup ----------
+async function load(hash: string, render: () => Rendered | Promise<Rendered>): Promise<[Buffer, string]> {
+  const hit = memGet(hash);
+  if (hit) {
+    stats.hits++;
+    return [hit, "hit"];
+  }
+  // concurrent misses for the same image render once
+  let job = pending.get(hash);
+  if (!job) {
+    job = (async () => {
+      const fromDisk = await diskGet(hash);
+      if (fromDisk) {
+        stats.diskHits++;
+        memSet(hash, fromDisk);
+        return [fromDisk, "disk"] as [Buffer, string];
+      }
+      stats.misses++;
+      const out = await render();
+      const buf = Buffer.isBuffer(out) ? out : Buffer.from(out.buffer, out.byteOffset, out.byteLength);
+      memSet(hash, buf);
+      diskSet(hash, buf);
+      return [buf, "miss"] as [Buffer, string];
+    })().finally(() => pending.delete(hash));
+    pending.set(hash, job);
+  }
+  return job;
+}
+
+/**
+ * Response for a cacheable image: 304 on a matching If-None-Match, otherwise the cached bytes
+ * (rendering them on a miss). `headers` are added as-is (Content-Disposition etc.).
+ */
+export async function cachedRender(
+  req: Request,
+  key: RenderKey,
+  contentType: string,
+  render: () => Rendered | Promise<Rendered>,
+  headers: Record<string, string> = {}
+): Promise<Response> {
+  const hash = renderKey(key);
+  const etag = `"${hash}"`;
+  const common = { ETag: etag, "Cache-Control": CACHE_CONTROL, ...headers };
+
+  const inm = req.headers.get("if-none-match");
+  if (inm && inm.split(",").some((t) => t.trim().replace(/^W\//, "") === etag)) {
+    stats.notModified++;
+    return new Response(null, { status: 304, headers: { ...common, "X-Render-Cache": "304" } });
+  }
+
+  const [buf, state] = await load(hash, render);
+  return new Response(new Uint8Array(buf), {
+    headers: { "Content-Type": contentType, ...common, "X-Render-Cache": state },
+  });
+}
+
+export function renderCacheStats() {
+  const lookups = stats.hits + stats.diskHits + stats.misses;
+  return {
+    ...stats,
+    hitRate: lookups ? (stats.hits + stats.diskHits) / lookups : 0,
+    entries: memory.size,
+    bytes: memoryBytes,
+    maxBytes: MAX_BYTES,
+  };
+}
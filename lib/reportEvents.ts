@@ -0,0 +1,95 @@
+// lib/reportEvents.ts
+// Latency histograms per report and stage, from the generators' timing events (report_events.py).
+// Python prints one `📊 {json}` line per event; runReport output is fed in here, and queued
+// (paid) jobs come from the worker's event buffer when /api/report_stats is read.
+// Fetch and pdf_cache events are split by cache state ("fetch:hit", "pdf_cache:miss", ...),
+// so storage time is visible separately from cached reads. "save" events carry the generator's peak
+// memory (peak_rss_mb), kept as the highest seen per report.
+const EVENT_PREFIX = "📊 ";
+
+// upper bounds in ms; the last bucket is everything above
+export const BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000];
+
+export type ReportEvent = { stage: string; ms: number; [field: string]: unknown };
+
+type Histogram = {
+  count: number;
+  sumMs: number;
+  maxMs: number;
+  bytes: number;
+  errors: number;
+  peakRssMb: number;
+  buckets: number[]; // BUCKETS_MS.length + 1
+};
+
+const histograms = new Map<string, Histogram>(); // `${report} ${stage}`
+let reportsSeen = 0;
+
+export function parseEvents(output: string): ReportEvent[] {
+  const events: ReportEvent[] = [];
+  for (const line of output.split("\n")) {
+    if (!line.startsWith(EVENT_PREFIX)) continue;
+    try {
+      const ev = JSON.parse(line.slice(EVENT_PREFIX.length));
+      if (typeof ev?.stage === "string" && typeof ev?.ms === "number") events.push(ev);
+    } catch {
+      // a line cut in half by a crash — ignore
+    }
+  }
+  return events;
+}
+
+function observe(key: string, ms: number, ev?: ReportEvent) {
+  let h = histograms.get(key);
+  if (!h) {
+    h = { count: 0, sumMs: 0, maxMs: 0, bytes: 0, errors: 0, peakRssMb: 0, buckets: new Array(BUCKETS_MS.length + 1).fill(0) };
+    histograms.set(key, h);
+  }
+  h.count++;
+  h.sumMs += ms;
+  h.maxMs = Math.max(h.maxMs, ms);
+  if (typeof ev?.bytes === "number") h.bytes += ev.bytes;
+  if (ev?.error) h.errors++;
+  if (typeof ev?.peak_rss_mb === "number") h.peakRssMb = Math.max(h.peakRssMb, ev.peak_rss_mb);
+  const i = BUCKETS_MS.findIndex((le) => ms <= le);
+  h.buckets[i < 0 ? BUCKETS_MS.length : i]++;
+}
+
+/** Add one report run: its stage events, plus the whole run as stage "total" when ms is known. */
+export function recordEvents(report: string, output: string, totalMs?: number) {
+  for (const ev of parseEvents(output)) {
+    const stage = (ev.stage === "fetch" || ev.stage === "pdf_cache") && ev.cache ? `${ev.stage}:${ev.cache}` : ev.stage;
+    observe(`${report} ${stage}`, ev.ms, ev);
+  }
+  if (typeof totalMs === "number") observe(`${report} total`, totalMs);
+  reportsSeen++;
+}
+
+// bucket upper bound at which the running count reaches p of all observations
+function quantile(h: Histogram, p: number): number {
+  let seen = 0;
+  for (let i = 0; i < h.buckets.length; i++) {
+    seen += h.buckets[i];
+    if (seen >= p * h.count) return i < BUCKETS_MS.length ? Math.min(BUCKETS_MS[i], Math.round(h.maxMs)) : Math.round(h.maxMs);
+  }
+  return h.maxMs;
+}
+
+export function reportEventStats() {
+  const stages: Record<string, Record<string, unknown>> = {};
+  for (const [key, h] of [...histograms].sort(([a], [b]) => a.localeCompare(b))) {
+    stages[key] = {
+      count: h.count,
+      totalMs: Math.round(h.sumMs),
+      avgMs: Math.round((h.sumMs / h.count) * 10) / 10,
+      p50Ms: quantile(h, 0.5),
+      p95Ms: quantile(h, 0.95),
+      maxMs: Math.round(h.maxMs),
+      ...(h.bytes ? { bytes: h.bytes } : {}),
+      ...(h.errors ? { errors: h.errors } : {}),
+      ...(h.peakRssMb ? { peakRssMb: h.peakRssMb } : {}),
+      buckets: h.buckets,
+    };
+  }
+  return { reports: reportsSeen, bucketsMs: BUCKETS_MS, stages };
+}
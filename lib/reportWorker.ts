@@ -0,0 +1,284 @@
+// lib/reportWorker.ts
+// Client for report_worker.py (pre-warmed Python over a Unix socket).
+// If the worker is not running, falls back to the old cold `python3 script.py ...` spawn.
+// Paid orders go through enqueueReport → the worker's SQLite job queue (retries, no bursts).
+// The worker emails in the background (mail_queue.py), so a result comes back as soon as the
+// PDF is rendered; the cold spawn still sends before it exits.
+// Download mode ({ pdf: true }) gets the PDF bytes as a stream — from the socket, or from fd 3
+// of the spawned python — so no /tmp file is written or read back.
+import net from "net";
+import path from "path";
+import { spawn } from "child_process";
+import { Readable, PassThrough } from "stream";
+import { recordEvents } from "@/lib/reportEvents";
+
+const SOCKET_PATH = process.env.REPORT_WORKER_SOCKET || "/tmp/astro-report-worker.sock";
+
+// report → python file (same map as report_jobs.py)
+export const REPORT_SCRIPTS: Record<string, string> = {
+  personiba: "make_personiba_pdf.py",
+  finanses: "make_finanses_pdf.py",
+  berns: "make_berns_pdf.py",
+  saderiba: "make_saderiba_pdf.py",
+  gada: "make_forecast_pdf_full.py",
+};
+
+export type ReportResult = {
+  ok: boolean;
+  pdf?: string | null;  // file name (the PDF itself only exists in memory)
+  bytes?: number;
+  body?: Readable;      // the PDF, when requested with { pdf: true }
+  coalesced?: boolean;  // joined an identical run already in flight in the worker (nothing rendered twice)
+  error?: string | null;
+  output: string;
+  ms?: number;
+  // per-host connection reuse of the worker's pooled HTTP session
+  http?: Record<string, { requests: number; connections: number; reuse: number }>;
+};
+
+// Build python args for a report (same order as the CLI)
+export function reportArgs(
+  report: string,
+  p: { date: string; partner?: string; year?: string; email: string; seed?: string }
+): string[] {
+  switch (report) {
+    case "gada":
+      // make_forecast_pdf_full.py DD.MM.YYYY YEAR EMAIL [SEED]
+      return [p.date, String(p.year ?? ""), p.email, ...(p.seed ? [p.seed] : [])];
+    case "saderiba":
+      // make_saderiba_pdf.py DATE1 DATE2 EMAIL
+      return [p.date, p.partner ?? "", p.email];
+    default:
+      // personiba / finanses / berns: DATE EMAIL
+      return [p.date, p.email];
+  }
+}
+
+// One JSON line to the worker, one JSON line back
+function workerRequest<T>(payload: object): Promise<T> {
+  return new Promise((resolve, reject) => {
+    const sock = net.createConnection(SOCKET_PATH);
+    let buf = "";
+
+    sock.setEncoding("utf8");
+    sock.on("connect", () => sock.write(JSON.stringify(payload) + "\n"));
+    sock.on("data", (chunk) => (buf += chunk));
+    sock.on("error", reject);
+    sock.on("end", () => {
+      try {
+        resolve(JSON.parse(buf));
+      } catch (err) {
+        reject(new Error(`Bad reply from report worker: ${buf.slice(0, 200)}`));
+      }
+    });
+  });
+}
+
+// Download mode: the JSON line is followed by `bytes` raw PDF bytes, piped on as `body`
+function viaWorkerPdf(report: string, args: string[]): Promise<ReportResult> {
+  return new Promise((resolve, reject) => {
+    const sock = net.createConnection(SOCKET_PATH);
+    let head = Buffer.alloc(0);
+
+    const onData = (chunk: Buffer) => {
+      head = Buffer.concat([head, chunk]);
+      const nl = head.indexOf(10);
+      if (nl < 0) return;
+      sock.pause();
+      sock.off("data", onData);
+
+      let result: ReportResult;
+      try {
+        result = JSON.parse(head.subarray(0, nl).toString("utf8"));
+      } catch {
+        sock.destroy();
+        return reject(new Error(`Bad reply from report worker: ${head.subarray(0, 200)}`));
+      }
+      if (result.bytes) {
+        const body = new PassThrough();
+        body.write(head.subarray(nl + 1));
+        sock.on("error", (err) => body.destroy(err));
+        sock.pipe(body);
+        result.body = body;
+      } else {
+        sock.destroy();
+      }
+      resolve(result);
+    };
+
+    sock.on("connect", () => sock.write(JSON.stringify({ report, args, pdf: true }) + "\n"));
+    sock.on("data", onData);
+    sock.on("error", reject);
+    sock.on("end", () => reject(new Error(`Report worker closed without a reply: ${head.subarray(0, 200)}`)));
+  });
+}
+
+function viaWorker(report: string, args: string[], opts: { pdf?: boolean } = {}): Promise<ReportResult> {
+  if (opts.pdf) return viaWorkerPdf(report, args);
+  return workerRequest<ReportResult>({ report, args });
+}
+
+const workerDown = (err: any) => err?.code === "ENOENT" || err?.code === "ECONNREFUSED";
+
+// Legacy path: cold python3 process per report. The PDF comes back on fd 3 (REPORT_PDF_FD),
+// and is dropped unless it was asked for.
+function viaSpawn(report: string, args: string[], opts: { pdf?: boolean } = {}): Promise<ReportResult> {
+  const scriptPath = path.join(process.cwd(), REPORT_SCRIPTS[report]);
+  const started = Date.now();
+  const py = spawn("python3", [scriptPath, ...args], {
+    stdio: ["ignore", "pipe", "pipe", "pipe"],
+    env: { ...process.env, REPORT_PDF_FD: "3" },
+  });
+
+  let output = "";
+  let errorOutput = "";
+  const pdf: Buffer[] = [];
+
+  py.stdout!.on("data", (data) => (output += data.toString()));
+  py.stderr!.on("data", (data) => (errorOutput += data.toString()));
+  const pdfPipe = py.stdio[3] as Readable;
+  if (opts.pdf) pdfPipe.on("data", (chunk: Buffer) => pdf.push(chunk));
+  else pdfPipe.resume();
+
+  return new Promise((resolve) => {
+    py.on("close", (code) => {
+      const data = Buffer.concat(pdf);
+      resolve({
+        ok: code === 0,
+        error: code === 0 ? null : `exit code ${code}`,
+        output: output || errorOutput,
+        ms: Date.now() - started,
+        bytes: data.length,
+        body: opts.pdf && data.length ? Readable.from([data]) : undefined,
+      });
+    });
+  });
+}
+
+export async function runReport(
+  report: string,
+  args: string[],
+  opts: { pdf?: boolean } = {}
+): Promise<ReportResult> {
+  if (!REPORT_SCRIPTS[report]) {
+    return { ok: false, error: `Unknown report type: ${report}`, output: "" };
+  }
+  let result: ReportResult;
+  try {
+    result = await viaWorker(report, args, opts);
+  } catch (err: any) {
+    // worker not started (or socket stale) → cold spawn, like before
+    if (!workerDown(err)) throw err;
+    console.warn("⚠️ Report worker unavailable, spawning python3:", err.code);
+    result = await viaSpawn(report, args, opts);
+  }
+  if (!result.coalesced) recordEvents(report, result.output, result.ms); // a joined run's events are counted once
+  return result;
+}
+
+// Download response straight from the report's in-memory PDF
+export function pdfResponse(result: ReportResult, filename: string): Response {
+  return new Response(Readable.toWeb(result.body!) as ReadableStream, {
+    headers: {
+      "Content-Type": "application/pdf",
+      "Content-Disposition": `attachment; filename="${filename}"`,
+      ...(result.bytes ? { "Content-Length": String(result.bytes) } : {}),
+    },
+  });
+}
+
+// Paid orders: hand the job to the worker's durable queue (job_queue.py) and return at once.
+// Without a worker there is nothing draining the queue → run it directly, like before.
+export async function enqueueReport(
+  report: string,
+  args: string[],
+  ref?: string
+): Promise<{ queued: boolean; job?: number; duplicate?: boolean; result?: Promise<ReportResult> }> {
+  try {
+    const r = await workerRequest<{ ok: boolean; job?: number; duplicate?: boolean; error?: string }>({
+      op: "enqueue",
+      report,
+      args,
+      ref,
+    });
+    if (!r.ok) throw new Error(r.error || "enqueue failed");
+    return { queued: true, job: r.job, duplicate: r.duplicate };
+  } catch (err: any) {
+    if (!workerDown(err)) throw err;
+    console.warn("⚠️ Report worker unavailable, running report directly:", err.code);
+    const result = viaSpawn(report, args).then((r) => {
+      recordEvents(report, r.output, r.ms);
+      return r;
+    });
+    return { queued: false, result };
+  }
+}
+
+export type QueueStats = {
+  depth: number;
+  running: number;
+  done: number;
+  failed: number;
+  oldest_queued_s: number;
+  latency_p50_s: number | null;
+  latency_p95_s: number | null;
+  run_p50_ms: number | null;
+  run_p95_ms: number | null;
+};
+
+// email delivery queue of the worker (mail_queue.py)
+export type MailStats = {
+  depth: number;
+  sending: number;
+  sent: number;
+  failed: number;
+  oldest_queued_s: number;
+  latency_p50_s: number | null;  // render finished → accepted by SendGrid, retries included
+  latency_p95_s: number | null;
+  send_p50_ms: number | null;
+  send_p95_ms: number | null;
+};
+
+// peak memory of a pool process per report type (MB), for sizing REPORT_WORKER_PROCS
+export type RssStats = Record<string, { last: number; max: number }>;
+
+export async function reportQueueStats(): Promise<{
+  queue: QueueStats;
+  mail: MailStats | null;
+  procs: number;
+  rssMb: RssStats;
+  coalesced: number;
+} | null> {
+  try {
+    const r = await workerRequest<{
+      ok: boolean;
+      queue: QueueStats;
+      mail?: MailStats | null;
+      procs: number;
+      rss_mb?: RssStats;
+      coalesced?: number;
+    }>({
+      op: "stats",
+    });
+    return r.ok
+      ? { queue: r.queue, mail: r.mail ?? null, procs: r.procs, rssMb: r.rss_mb ?? {}, coalesced: r.coalesced ?? 0 }
+      : null;
+  } catch (err: any) {
+    if (workerDown(err)) return null;
+    throw err;
+  }
+}
+
+// Timing events of queued jobs (their output stays in the worker) → lib/reportEvents.ts
+export async function pullWorkerEvents(): Promise<number> {
+  try {
+    const r = await workerRequest<{ ok: boolean; jobs?: { report: string; ms?: number; events: string }[] }>({
+      op: "events",
+    });
+    for (const job of r.jobs ?? []) recordEvents(job.report, job.events, job.ms);
+    return r.jobs?.length ?? 0;
+  } catch (err: any) {
+    if (workerDown(err)) return 0;
+    throw err;
+  }
+}
@@ -0,0 +1,86 @@
+// lib/triangles/layers.ts
+// Static layers + pooled canvases for the triangle images.
+// Everything but the numbers (background, edges, badge circles with their glow) is the same
+// for every date, so each triangle type draws it once per process into a layer canvas. A
+// request copies that layer into a pooled canvas of the same size, writes its numbers and
+// encodes the PNG. The draw order changes: the old code drew each circle with its glow and
+// then its number, point by point; now every circle and glow is in the layer and all the
+// numbers come after. The images stay the same only because no glow reaches another
+// circle's number; bench_triangles.mjs compares both paths date by date.
+import { createCanvas, Canvas, CanvasRenderingContext2D } from "canvas";
+
+type Draw = (ctx: CanvasRenderingContext2D) => void;
+
+const MAX_LAYERS = 32; // misija keys its layer by ?bg=, the rest have one each
+
+const layers = new Map<string, Canvas | Promise<Canvas>>();
+const idle = new Map<string, Canvas[]>(); // `${w}x${h}` → canvases free for the next image
+const stats = { layersDrawn: 0, images: 0, canvasesCreated: 0 };
+
+function remember(key: string, layer: Canvas | Promise<Canvas>) {
+  if (layers.size >= MAX_LAYERS) layers.delete(layers.keys().next().value!);
+  layers.set(key, layer);
+}
+
+function blank(w: number, h: number, draw: Draw): Canvas {
+  const canvas = createCanvas(w, h);
+  draw(canvas.getContext("2d"));
+  stats.layersDrawn++;
+  return canvas;
+}
+
+/** The static layer `key`, drawn by `draw` on first use. */
+export function staticLayer(key: string, w: number, h: number, draw: Draw): Canvas {
+  let layer = layers.get(key) as Canvas | undefined;
+  if (!layer) {
+    layer = blank(w, h, draw);
+    remember(key, layer);
+  }
+  return layer;
+}
+
+/** Same for a layer that needs something loaded first (a background image); a failed load isn't kept. */
+export function staticLayerAsync(
+  key: string,
+  w: number,
+  h: number,
+  load: () => Promise<Draw>
+): Promise<Canvas> {
+  const known = layers.get(key) as Promise<Canvas> | undefined;
+  if (known) return known;
+  const layer = load().then((draw) => blank(w, h, draw));
+  layer.catch(() => {
+    if (layers.get(key) === layer) layers.delete(key); // not a newer load of the same key
+  });
+  remember(key, layer);
+  return layer;
+}
+
+/** PNG of `layer` with `draw` on top, rendered in a pooled canvas. */
+export function composePng(layer: Canvas, draw: Draw): Buffer {
+  const size = `${layer.width}x${layer.height}`;
+  const free = idle.get(size) ?? [];
+  idle.set(size, free);
+  let canvas = free.pop();
+  if (!canvas) {
+    canvas = createCanvas(layer.width, layer.height);
+    stats.canvasesCreated++;
+  }
+
+  const ctx = canvas.getContext("2d");
+  ctx.save();
+  try {
+    ctx.clearRect(0, 0, layer.width, layer.height);
+    ctx.drawImage(layer, 0, 0);
+    draw(ctx);
+    stats.images++;
+    return canvas.toBuffer("image/png");
+  } finally {
+    ctx.restore(); // the next image starts from default state (no shadow, font, fill left over)
+    free.push(canvas);
+  }
+}
+
+export function layerStats() {
+  return { ...stats, layers: layers.size, idleCanvases: [...idle.values()].reduce((n, c) => n + c.length, 0) };
+}
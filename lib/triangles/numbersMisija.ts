@@ -1,4 +1,5 @@
-import { createCanvas, CanvasRenderingContext2D, loadImage } from "canvas";
+import { CanvasRenderingContext2D, loadImage } from "canvas";
+import { staticLayerAsync, composePng } from "@/lib/triangles/layers";
 import * as fs from "fs";
 import * as path from "path";
 
@@ -14,7 +15,7 @@ function reduce22(num: number): number {
   return num;
 }
 
-function calcNumbersMisija(dateStr: string) {
+export function calcNumbersMisija(dateStr: string) {
   const [dRaw, mRaw, yRaw] = dateStr.split(".").map(Number);
   const day = reduce22(dRaw);
   const month = mRaw;
@@ -57,7 +58,7 @@ async function loadBackground(bgParam?: string) {
   return null;
 }
 
-function drawCircle(ctx: CanvasRenderingContext2D, x: number, y: number, text: string) {
+function drawCircle(ctx: CanvasRenderingContext2D, x: number, y: number) {
   ctx.shadowColor = "rgba(32,201,151,0.45)";
   ctx.shadowBlur = 12;
   ctx.beginPath();
@@ -68,7 +69,9 @@ function drawCircle(ctx: CanvasRenderingContext2D, x: number, y: number, text: s
   ctx.strokeStyle = ACCENT_STROKE;
   ctx.stroke();
   ctx.shadowBlur = 0;
+}
 
+function drawText(ctx: CanvasRenderingContext2D, x: number, y: number, text: string) {
   ctx.fillStyle = "white";
   ctx.font = "bold 38px Inter";
   ctx.textAlign = "center";
@@ -76,32 +79,39 @@ function drawCircle(ctx: CanvasRenderingContext2D, x: number, y: number, text: s
   ctx.fillText(text, x, y);
 }
 
-export async function drawNumbersMisija(dateStr = "10.08.1990", bgParam?: string) {
-  const nums = calcNumbersMisija(dateStr);
-  const canvas = createCanvas(W, H);
-  const ctx = canvas.getContext("2d");
-
+// координаты под заголовком MISIJA
+const baseY = 190;
+const spacing = 230;
+//const baseX = W / 2 - spacing;
+// ✅ теперь ровно по центру всей группы (три кружка)
+const totalWidth = spacing * 2;
+const baseX = W / 2 - totalWidth / 2 + 30;
+const CIRCLES_X = [baseX, baseX + spacing, baseX + spacing * 2];
+
+// === STATIC LAYER: background + the three circles, once per ?bg= ===
+async function loadBase(bgParam?: string) {
   const bg = await loadBackground(bgParam);
-  if (bg) {
-    ctx.drawImage(bg as any, 0, 0, W, H);
-  } else {
-    // fallback фон (как раньше)
-    ctx.fillStyle = "#0b1f1c";
-    ctx.fillRect(0, 0, W, H);
-  }
-
-  // координаты под заголовком MISIJA
-  const baseY = 190;
-  const spacing = 230;
-  //const baseX = W / 2 - spacing;
-  // ✅ теперь ровно по центру всей группы (три кружка)
-  const totalWidth = spacing * 2;
-  const baseX = W / 2 - totalWidth / 2 + 30;
-
-
-  drawCircle(ctx, baseX, baseY, String(nums.first));
-  drawCircle(ctx, baseX + spacing, baseY, String(nums.second));
-  drawCircle(ctx, baseX + spacing * 2, baseY, String(nums.third));
+  return (ctx: CanvasRenderingContext2D) => {
+    if (bg) {
+      ctx.drawImage(bg as any, 0, 0, W, H);
+    } else {
+      // fallback фон (как раньше)
+      ctx.fillStyle = "#0b1f1c";
+      ctx.fillRect(0, 0, W, H);
+    }
+    for (const x of CIRCLES_X) drawCircle(ctx, x, baseY);
+  };
+}
 
-  return canvas;
+// → PNG
+export async function drawNumbersMisija(
+  dateStr = "10.08.1990",
+  bgParam?: string,
+  nums = calcNumbersMisija(dateStr) // precomputed (numerology table) or calculated here
+): Promise<Buffer> {
+  const layer = await staticLayerAsync(`triangle/misija ${bgParam ?? ""}`, W, H, () => loadBase(bgParam));
+  const values = [nums.first, nums.second, nums.third];
+  return composePng(layer, (ctx) => {
+    CIRCLES_X.forEach((x, i) => drawText(ctx, x, baseY, String(values[i])));
+  });
 }
@@ -1,5 +1,6 @@
 // lib/triangleAttiecibasSaderiba.ts
-import { createCanvas, CanvasRenderingContext2D } from "canvas";
+import { CanvasRenderingContext2D } from "canvas";
+import { staticLayer, composePng } from "@/lib/triangles/layers";
 
 // === COLORS (в тон звезде SaderibaSum) ===
 const EDGE = "rgba(255,255,255,0.5)";
@@ -50,8 +51,11 @@ function mid(p1: { x: number; y: number }, p2: { x: number; y: number }) {
   return { x: (p1.x + p2.x) / 2, y: (p1.y + p2.y) / 2 };
 }
 
+// top, bottom right, bottom left, mid right, mid left, mid bottom
+const POINTS = [TRI.top, TRI.right, TRI.left, mid(TRI.top, TRI.right), mid(TRI.top, TRI.left), mid(TRI.left, TRI.right)];
+
 // === Draw helpers ===
-function drawNode(ctx: CanvasRenderingContext2D, x: number, y: number, num: number) {
+function drawNode(ctx: CanvasRenderingContext2D, x: number, y: number) {
   ctx.shadowColor = "rgba(255,76,76,0.45)";
   ctx.shadowBlur = 10;
   ctx.beginPath();
@@ -62,7 +66,9 @@ function drawNode(ctx: CanvasRenderingContext2D, x: number, y: number, num: numb
   ctx.strokeStyle = ACCENT_STROKE;
   ctx.stroke();
   ctx.shadowBlur = 0;
+}
 
+function drawNodeNumber(ctx: CanvasRenderingContext2D, x: number, y: number, num: number) {
   ctx.fillStyle = TXT_COLOR;
   ctx.font = "bold 12px Inter";
   ctx.textAlign = "center";
@@ -70,14 +76,9 @@ function drawNode(ctx: CanvasRenderingContext2D, x: number, y: number, num: numb
   ctx.fillText(String(num), x, y);
 }
 
-// === MAIN DRAW ===
-export function drawTriangleAttiecibasSaderiba(dateStr = "10.08.1990") {
-  const nums = calcAttiecibasNumbers(dateStr);
-  const canvas = createCanvas(W, H);
-  const ctx = canvas.getContext("2d");
-
+// === STATIC LAYER (same for every date, drawn once) ===
+function drawBase(ctx: CanvasRenderingContext2D) {
   // ⚠️ прозрачный фон
-  ctx.clearRect(0, 0, W, H);
 
   // линии треугольника
   ctx.strokeStyle = EDGE;
@@ -89,22 +90,16 @@ export function drawTriangleAttiecibasSaderiba(dateStr = "10.08.1990") {
   ctx.closePath();
   ctx.stroke();
 
-  const midLeft = mid(TRI.top, TRI.left);
-  const midRight = mid(TRI.top, TRI.right);
-  const midBottom = mid(TRI.left, TRI.right);
-
-  const points = [
-    { ...TRI.top, val: nums.top },
-    { ...TRI.right, val: nums.bottomRight },
-    { ...TRI.left, val: nums.bottomLeft },
-    { ...midRight, val: nums.midRight },
-    { ...midLeft, val: nums.midLeft },
-    { ...midBottom, val: nums.midBottom },
-  ];
-
-  for (const p of points) {
-    drawNode(ctx, p.x, p.y, p.val);
-  }
+  for (const p of POINTS) drawNode(ctx, p.x, p.y);
+}
 
-  return canvas;
+// === MAIN DRAW === → PNG
+export function drawTriangleAttiecibasSaderiba(
+  dateStr = "10.08.1990",
+  nums = calcAttiecibasNumbers(dateStr) // precomputed (numerology table) or calculated here
+): Buffer {
+  const values = [nums.top, nums.bottomRight, nums.bottomLeft, nums.midRight, nums.midLeft, nums.midBottom];
+  return composePng(staticLayer("triangle/saderiba", W, H, drawBase), (ctx) => {
+    POINTS.forEach((p, i) => drawNodeNumber(ctx, p.x, p.y, values[i]));
+  });
 }
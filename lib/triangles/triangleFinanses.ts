@@ -1,4 +1,5 @@
-import { createCanvas, CanvasRenderingContext2D } from "canvas";
+import { CanvasRenderingContext2D } from "canvas";
+import { staticLayer, composePng } from "@/lib/triangles/layers";
 
 const BG = "#0b1f1c";
 const EDGE = "rgba(255,255,255,0.18)";
@@ -18,7 +19,7 @@ function reduce22(num: number): number {
   return num;
 }
 
-function calcFinansesNumbers(dateStr: string) {
+export function calcFinansesNumbers(dateStr: string) {
   const [dRaw, mRaw, yRaw] = dateStr.split(".").map(Number);
 
   // reduce each component first
@@ -89,15 +90,16 @@ function mid(p1: { x: number; y: number }, p2: { x: number; y: number }) {
   return { x: (p1.x + p2.x) / 2, y: (p1.y + p2.y) / 2 };
 }
 
-export function drawTriangleFinanses(dateStr = "10.08.1990") {
-  const nums = calcFinansesNumbers(dateStr);
-
-  const canvas = createCanvas(W, H);
-  const ctx = canvas.getContext("2d");
+// top, bottom right, bottom left, mid right, mid left, mid bottom
+const POINTS = [TRI.top, TRI.right, TRI.left, mid(TRI.top, TRI.right), mid(TRI.top, TRI.left), mid(TRI.left, TRI.right)];
 
+// === STATIC LAYER (same for every date, drawn once) ===
+function drawBase(ctx: CanvasRenderingContext2D) {
+  // background
   ctx.fillStyle = BG;
   ctx.fillRect(0, 0, W, H);
 
+  // triangle edges
   ctx.strokeStyle = EDGE;
   ctx.lineWidth = 1.8;
   ctx.beginPath();
@@ -107,23 +109,16 @@ export function drawTriangleFinanses(dateStr = "10.08.1990") {
   ctx.closePath();
   ctx.stroke();
 
-  const midLeft = mid(TRI.top, TRI.left);
-  const midRight = mid(TRI.top, TRI.right);
-  const midBottom = mid(TRI.left, TRI.right);
-
-  const points = [
-    { ...TRI.top, val: nums.top },
-    { ...TRI.right, val: nums.bottomRight },
-    { ...TRI.left, val: nums.bottomLeft },
-    { ...midRight, val: nums.midRight },
-    { ...midLeft, val: nums.midLeft },
-    { ...midBottom, val: nums.midBottom },
-  ];
-
-  for (const p of points) {
-    drawStarOuterPoint(ctx, p.x, p.y);
-    drawNumber(ctx, p.x, p.y, p.val);
-  }
+  for (const p of POINTS) drawStarOuterPoint(ctx, p.x, p.y);
+}
 
-  return canvas;
+// === MAIN DRAW === → PNG
+export function drawTriangleFinanses(
+  dateStr = "10.08.1990",
+  nums = calcFinansesNumbers(dateStr) // precomputed (numerology table) or calculated here
+): Buffer {
+  const values = [nums.top, nums.bottomRight, nums.bottomLeft, nums.midRight, nums.midLeft, nums.midBottom];
+  return composePng(staticLayer("triangle/finanses", W, H, drawBase), (ctx) => {
+    POINTS.forEach((p, i) => drawNumber(ctx, p.x, p.y, values[i]));
+  });
 }
@@ -0,0 +1,209 @@
+# mail_queue.py
+# Durable email delivery for reports rendered in report_worker.py.
+#
+# In the worker, send_pdf_email() only stores the message here (the PDF in MAIL_SPOOL_DIR)
+# and returns, so a download is answered as soon as the PDF is rendered and a slow SendGrid
+# doesn't hold a pool process. The worker's mailer threads send what is due; a failed send
+# (exception, 429 or 5xx) is retried with exponential backoff
+# (MAIL_RETRY_BASE_SECONDS · 2^(attempt-1), up to MAIL_MAX_ATTEMPTS tries); a 4xx answer is
+# final. Messages left "sending" by a crashed worker are put back on startup. A sent
+# message's PDF is deleted; a failed one's stays, for `retry`.
+# CLI runs and report_batch.py have no mailer and still send inline.
+#
+# Usage: python3 mail_queue.py stats
+#        python3 mail_queue.py retry ID
+
+import os, json, time, sqlite3, threading
+
+QUEUE_PATH = os.getenv("MAIL_QUEUE_DB", "/tmp/astro-mail-queue.sqlite")
+SPOOL_DIR = os.getenv("MAIL_SPOOL_DIR", "/tmp/astro-mail-spool")
+MAX_ATTEMPTS = int(os.getenv("MAIL_MAX_ATTEMPTS", "6"))
+RETRY_BASE_SECONDS = float(os.getenv("MAIL_RETRY_BASE_SECONDS", "30"))
+RETRY_MAX_SECONDS = float(os.getenv("MAIL_RETRY_MAX_SECONDS", "1800"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mails (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',   -- spooling | queued | sending | sent | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    ms INTEGER,
+    status_code INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS mails_due ON mails(status, run_at);
+"""
+
+
+class MailQueue:
+    def __init__(self, path: str = QUEUE_PATH, spool: str = SPOOL_DIR):
+        self.path = path
+        self.spool = spool
+        self._local = threading.local()
+        os.makedirs(spool, exist_ok=True)
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        # one connection per thread and process: pool children enqueue, the worker's mailer threads send
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _pdf_path(self, mail_id: int) -> str:
+        return os.path.join(self.spool, f"{mail_id}.pdf")
+
+    # ---------- producer ----------
+    def enqueue(self, recipient: str, pdf: bytes, filename: str, subject: str, html: str,
+                max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Store one message; it is only due once its PDF is in the spool."""
+        db = self._db()
+        now = time.time()
+        cur = db.execute(
+            "INSERT INTO mails(recipient, filename, subject, html, status, max_attempts, run_at, created_at) "
+            "VALUES (?, ?, ?, ?, 'spooling', ?, ?, ?)",
+            (recipient, filename, subject, html, max_attempts, now, now),
+        )
+        mail_id = cur.lastrowid
+        path = self._pdf_path(mail_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp, path)
+        except Exception:
+            db.execute("DELETE FROM mails WHERE id = ?", (mail_id,))
+            raise
+        db.execute("UPDATE mails SET status = 'queued' WHERE id = ?", (mail_id,))
+        return mail_id
+
+    # ---------- consumer ----------
+    def claim(self):
+        """Take the oldest due message (status → sending) with its PDF bytes, or None."""
+        db = self._db()
+        now = time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT * FROM mails WHERE status = 'queued' AND run_at <= ? ORDER BY run_at, id LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                db.execute("COMMIT")
+                return None
+            db.execute("UPDATE mails SET status = 'sending', attempts = attempts + 1 WHERE id = ?", (row["id"],))
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        mail = dict(row)
+        mail["attempts"] += 1
+        try:
+            with open(self._pdf_path(mail["id"]), "rb") as f:
+                mail["pdf"] = f.read()
+        except FileNotFoundError:
+            self.fail(mail, "PDF missing from the mail spool", retry=False)
+            return self.claim()
+        return mail
+
+    def sent(self, mail: dict, status_code: int, ms: int):
+        self._db().execute(
+            "UPDATE mails SET status = 'sent', sent_at = ?, ms = ?, status_code = ?, error = NULL WHERE id = ?",
+            (time.time(), ms, status_code, mail["id"]),
+        )
+        try:
+            os.remove(self._pdf_path(mail["id"]))
+        except FileNotFoundError:
+            pass
+
+    def fail(self, mail: dict, error: str, status_code: int = None, retry: bool = True) -> bool:
+        """Record a failed attempt. Returns True if the message will be retried."""
+        now = time.time()
+        if retry and mail["attempts"] < mail["max_attempts"]:
+            delay = min(RETRY_BASE_SECONDS * 2 ** (mail["attempts"] - 1), RETRY_MAX_SECONDS)
+            self._db().execute(
+                "UPDATE mails SET status = 'queued', run_at = ?, status_code = ?, error = ? WHERE id = ?",
+                (now + delay, status_code, error, mail["id"]),
+            )
+            return True
+        self._db().execute(
+            "UPDATE mails SET status = 'failed', status_code = ?, error = ? WHERE id = ?",
+            (status_code, error, mail["id"]),
+        )
+        return False
+
+    def retry(self, mail_id: int) -> bool:
+        """Send a failed message again (its PDF is still in the spool)."""
+        cur = self._db().execute(
+            "UPDATE mails SET status = 'queued', attempts = 0, run_at = ? WHERE id = ? AND status = 'failed'",
+            (time.time(), mail_id),
+        )
+        return cur.rowcount == 1
+
+    def requeue_sending(self) -> int:
+        """After a worker restart: messages it was sending may not have gone out, send them again."""
+        cur = self._db().execute("UPDATE mails SET status = 'queued', run_at = ? WHERE status = 'sending'", (time.time(),))
+        return cur.rowcount
+
+    def next_run_at(self):
+        row = self._db().execute("SELECT MIN(run_at) FROM mails WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    # ---------- visibility ----------
+    def stats(self, window: int = 200) -> dict:
+        db = self._db()
+        now = time.time()
+        counts = {status: n for status, n in db.execute("SELECT status, COUNT(*) FROM mails GROUP BY status")}
+        oldest = db.execute("SELECT MIN(created_at) FROM mails WHERE status = 'queued'").fetchone()[0]
+        recent = db.execute(
+            "SELECT sent_at - created_at, ms FROM mails WHERE status = 'sent' ORDER BY sent_at DESC LIMIT ?",
+            (window,),
+        ).fetchall()
+        latency = sorted(r[0] for r in recent)
+        send_ms = sorted(r[1] for r in recent if r[1] is not None)
+
+        def pct(values, p):
+            return values[min(len(values) - 1, int(p * len(values)))] if values else None
+
+        return {
+            "depth": counts.get("queued", 0),
+            "sending": counts.get("sending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_queued_s": round(now - oldest, 1) if oldest else 0,
+            # render finished → accepted by SendGrid, including retries
+            "latency_p50_s": round(pct(latency, 0.5), 2) if latency else None,
+            "latency_p95_s": round(pct(latency, 0.95), 2) if latency else None,
+            "send_p50_ms": pct(send_ms, 0.5),
+            "send_p95_ms": pct(send_ms, 0.95),
+        }
+
+    def recent(self, limit: int = 20) -> list:
+        rows = self._db().execute(
+            "SELECT id, recipient, filename, status, attempts, created_at, sent_at, ms, status_code, error "
+            "FROM mails ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+if __name__ == "__main__":
+    import sys
+    q = MailQueue()
+    if len(sys.argv) == 3 and sys.argv[1] == "retry":
+        print("✅ queued again" if q.retry(int(sys.argv[2])) else "❌ no failed message with that id")
+    elif len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        print(json.dumps({"stats": q.stats(), "recent": q.recent()}, indent=2, ensure_ascii=False))
+    else:
+        print("❌ Usage: python mail_queue.py stats | retry ID")
+        sys.exit(1)
@@ -1,42 +1,31 @@
 # make_berns_pdf.py
 # Generate "Bērna personības analīze" PDF (1920x1080)
-# Usage: python make_berns_pdf.py DD.MM.YYYY
+# Usage: python make_berns_pdf.py DD.MM.YYYY recipient@email.com
 
-import sys, os, requests
+import report_events
+import sys, os
 from io import BytesIO
 from datetime import datetime
-from collections import OrderedDict
-from dotenv import load_dotenv
-from supabase import create_client, Client
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from report_common import SUPABASE_URL, SUPABASE_KEY, send_pdf_email, write_pdf, EventCanvas
+import report_plan
+import pdf_cache
+from report_plan import page, each
+from numerology import reduce22, triangle
 
 API_BASE = os.getenv("API_BASE", "http://localhost:8080")
 
 # =========================
-# ENV & SUPABASE
+# ENV
 # =========================
-load_dotenv(".env.local")
-SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-SUPABASE_KEY = (
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    or os.getenv("SUPABASE_KEY")
-    or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-)
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise SystemExit("❌ SUPABASE_URL / KEY missing in .env.local")
 
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 # Public storage base
 STORE = f"{SUPABASE_URL}/storage/v1/object/public/astro-forecasts/berns"
 
-# Font (Latvian letters)
-pdfmetrics.registerFont(TTFont("DejaVu", os.path.join(os.path.dirname(__file__), "DejaVuSans.ttf")))
-
 # =========================
 # LAYOUT TUNING (easy to tweak)
 # =========================
@@ -59,44 +48,9 @@ STAR_URL_TPL = API_BASE + "/api/star/berns?date={date}&format=png"
 TRI_URL_TPL  = API_BASE + "/api/triangle/berns?date={date}&format=png"
 
 
-# =========================
-# NUMERICS (same as Personība)
-# =========================
-def reduce22(n: int) -> int:
-    while n > 22:
-        n = sum(int(d) for d in str(n))
-    return n
-
-def year_reduced(y: int) -> int:
-    return reduce22(sum(int(d) for d in str(y)))
-
-def personiba_numbers(d: int, m: int, y: int):
-    d1 = reduce22(d)
-    yR = year_reduced(y)
-    # bottomRight
-    br = reduce22(d1 + m)
-    # bottomLeft cascade
-    a1 = d1
-    a2 = m
-    a3 = yR
-    a4 = reduce22(a1 + a2 + a3)
-    a5 = reduce22(a1 + a2 + a3 + a4)
-    bl = reduce22(a1 + a5)
-    # Middles
-    mr = reduce22(d1 + br)
-    ml = reduce22(d1 + bl)
-    mb = reduce22(br + bl)
-    return OrderedDict(top=d1, ml=ml, mr=mr, left=bl, mb=mb, right=br)
-
 # =========================
 # HELPERS
 # =========================
-def get(url: str) -> bytes:
-    r = requests.get(url)
-    if r.status_code != 200:
-        raise RuntimeError(f"GET failed: {url} -> {r.status_code}")
-    return r.content
-
 def draw_full_bg(c: canvas.Canvas, W: float, H: float, img_bytes: bytes, title: str = ""):
     green_bg = HexColor("#0b1f1c")
     c.setFillColor(green_bg)
@@ -158,132 +112,91 @@ def draw_slide_bg_then_overlay(c: canvas.Canvas, W: float, H: float,
 
     c.showPage()
 
-def add_group_slides(c: canvas.Canvas, W: float, H: float, n: int):
-    """Append 4 slides for number n (skip missing silently)."""
-    n = reduce22(int(n))
-    base = f"{STORE}/group/{n}"
-    names = [f"c{n}.jpg", f"c{n}_1.jpg", f"c{n}_2.jpg", f"c{n}_3.jpg"]
-
-    for fname in names:
-        url = f"{base}/{fname}"
-        try:
-            img = get(url)
-        except Exception:
-            print(f"⚠️  Skip missing: {url}")
-            continue
+def draw_full_page(c: canvas.Canvas, img_bytes: bytes):
+    W, H = CUSTOM_PAGE
+    draw_full_bg(c, W, H, img_bytes)
+    c.showPage()
 
-        # Draw and go to next page
-        draw_full_bg(c, W, H, img_bytes=img)
-        c.showPage()
+def unique_group_numbers(nums) -> list:
+    """5–28: slides by unique numbers (avoid duplicates)."""
+    seq = ["top", "ml", "mr", "left", "mb", "right"]
+    seen = set()
+    out = []
+    for key in seq:
+        val = int(nums[key])
+        if val in seen:
+            print(f"⚠️ Skip duplicate number {val} ({key})")
+            continue
+        seen.add(val)
+        out.append(val)
+    return out
 
 # =========================
-# MAIN
+# MANIFEST
 # =========================
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("❌ Usage: python make_berns_pdf.py DD.MM.YYYY recipient@email.com")
-        sys.exit(1)
+CUSTOM_PAGE = (1920, 1080)
 
-    birthdate = sys.argv[1]
-    recipient_email = sys.argv[2]
+def numbers(birthdate: str) -> dict:
     d, m, y = map(int, birthdate.split("."))
+    nums = triangle("berns", d, m, y)  # same as /api/triangle/berns
+    return {"groups": [reduce22(n) for n in unique_group_numbers(nums)]}
 
-    # Prepare PDF
-    CUSTOM_PAGE = (1920, 1080)
-    W, H = CUSTOM_PAGE
-    out_pdf = f"/tmp/BERNA_PERSONIBA_{birthdate.replace('.', '')}.pdf"
-    c = canvas.Canvas(out_pdf, pagesize=CUSTOM_PAGE)
+MANIFEST = [
+    # ---- 1–2. Slides: 1-berna_main.jpg, 2-berna_main2.jpg
+    page("full", "{store}/main/1-berna_main.jpg"),
+    page("full", "{store}/main/2-berna_main2.jpg"),
+    # ---- 3. Slide: background + STAR (transparent) a bit lower than center
+    page("overlay", "{store}/main/3-berna_zvaigzne.jpg", STAR_URL_TPL,
+         shift_down_rel=STAR_SHIFT_DOWN_PCT),
+    # ---- 4. Slide: background + TRIANGLE (transparent) centered inside light triangle
+    page("overlay", "{store}/main/4-berna_trissturis.jpg", TRI_URL_TPL,
+         box_rel=(TRI_BOX_X_PCT, TRI_BOX_Y_PCT, TRI_BOX_W_PCT, TRI_BOX_H_PCT)),
+    # --- 5–28: up to 4 slides per unique number; any of them may be missing in the bucket
+    each("groups",
+         page("full", "{store}/group/{n}/c{n}.jpg", optional=True),
+         page("full", "{store}/group/{n}/c{n}_1.jpg", optional=True),
+         page("full", "{store}/group/{n}/c{n}_2.jpg", optional=True),
+         page("full", "{store}/group/{n}/c{n}_3.jpg", optional=True)),
+    # ---- 29. Final slide: berna_last.jpg
+    page("full", "{store}/main/berna_last.jpg"),
+]
+
+DRAWERS = {
+    "full": draw_full_page,
+    "overlay": lambda c, bg, overlay, **kw: draw_slide_bg_then_overlay(c, *CUSTOM_PAGE, bg, overlay, **kw),
+}
+
+def plan_pages(birthdate: str) -> report_plan.Plan:
+    return report_plan.plan(MANIFEST, store=STORE, date=birthdate, **numbers(birthdate))
 
-    # ---- 1. Slide: 1-berna_main.jpg
-    img1 = get(f"{STORE}/main/1-berna_main.jpg")
-    draw_full_bg(c, W, H, img1); c.showPage()
 
-    # ---- 2. Slide: 2-berna_main2.jpg
-    img2 = get(f"{STORE}/main/2-berna_main2.jpg")
-    draw_full_bg(c, W, H, img2); c.showPage()
+# =========================
+# BUILD
+# =========================
+def build_pdf(birthdate: str) -> bytes:
+    with report_events.stage("numerology"):
+        pages = plan_pages(birthdate)
+    # same plan + same slides → same PDF: a re-order is served from the cache
+    return pdf_cache.cached(pages, lambda: render_pdf(pages), "berns", birthdate)
 
-    # ---- 3. Slide: background + STAR (transparent) a bit lower than center
-    bg3 = get(f"{STORE}/main/3-berna_zvaigzne.jpg")
-    star_png = get(STAR_URL_TPL.format(date=birthdate))
-    draw_slide_bg_then_overlay(
-        c, W, H,
-        bg_bytes=bg3,
-        overlay_bytes=star_png,
-        box_rel=None,
-        shift_down_rel=STAR_SHIFT_DOWN_PCT
-    )
 
-    # ---- 4. Slide: background + TRIANGLE (transparent) centered inside light triangle
-    bg4 = get(f"{STORE}/main/4-berna_trissturis.jpg")
-    tri_png = get(TRI_URL_TPL.format(date=birthdate))
-    draw_slide_bg_then_overlay(
-        c, W, H,
-        bg_bytes=bg4,
-        overlay_bytes=tri_png,
-        box_rel=(TRI_BOX_X_PCT, TRI_BOX_Y_PCT, TRI_BOX_W_PCT, TRI_BOX_H_PCT)
-    )
-
-    # ---- Triangles math
-    nums = personiba_numbers(d, m, y)
-
-# --- 5–28: slides by unique numbers (avoid duplicates) ---
-seq = ["top", "ml", "mr", "left", "mb", "right"]
-seen = set()
-for key in seq:
-    val = int(nums[key])
-    if val in seen:
-        print(f"⚠️ Skip duplicate number {val} ({key})")
-        continue
-    seen.add(val)
-    add_group_slides(c, W, H, val)
-
-
-# ---- 29. Final slide: berna_last.jpg
-last = get(f"{STORE}/main/berna_last.jpg")
-draw_full_bg(c, W, H, last); c.showPage()
-
-# === SAVE AND SEND EMAIL ===
-c.save()
-print(f"✅ PDF saved: {out_pdf}")
-
-# === SENDGRID EMAIL SEND ===
-print(f"📧 Sending email via SendGrid to: {recipient_email}")
-
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import (
-    Mail, Email, To, Attachment,
-    FileContent, FileName, FileType, Disposition
-)
-import base64
-
-SENDGRID_KEY = os.getenv("SENDGRID_API_KEY")
-SENDGRID_FROM = os.getenv("SENDGRID_FROM", "info@parnumerologiju.lv")
-SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Par Numeroloģiju")
-SENDGRID_REPLY_TO = os.getenv("SENDGRID_REPLY_TO", "info@parnumerologiju.lv")
-
-if not SENDGRID_KEY:
-    raise SystemExit("❌ Missing SENDGRID_API_KEY environment variable")
-
-print("DEBUG: SENDGRID_KEY prefix:", SENDGRID_KEY[:10] if SENDGRID_KEY else "NONE")
-sg = SendGridAPIClient(SENDGRID_KEY)
-
-# Read PDF
-with open(out_pdf, "rb") as f:
-    pdf_data = f.read()
-    encoded_pdf = base64.b64encode(pdf_data).decode()
-
-attachment = Attachment(
-    FileContent(encoded_pdf),
-    FileName(os.path.basename(out_pdf)),
-    FileType("application/pdf"),
-    Disposition("attachment")
-)
-
-message = Mail(
-    from_email=Email(SENDGRID_FROM, SENDGRID_FROM_NAME),
-    to_emails=To(recipient_email),
-    subject="Bērna personības analīze",
-    html_content="""
+def render_pdf(pages: report_plan.Plan) -> bytes:
+    out = BytesIO()
+    c = EventCanvas(out, pagesize=CUSTOM_PAGE)
+
+    report_plan.render(c, pages, DRAWERS)
+
+    c.save()
+    pdf = out.getvalue()
+    print(f"✅ PDF built: {len(pdf) // 1024} KB, {c.getPageNumber() - 1} pages")
+    return pdf
+
+
+# =========================
+# EMAIL
+# =========================
+EMAIL_SUBJECT = "Bērna personības analīze"
+EMAIL_HTML = """
     <p>Labdien,</p>
 
     <p>Paldies, ka izvēlējies <b>Bērna personības analīzi</b>. Skati to zemāk pielikumā.</p>
@@ -302,19 +215,32 @@ message = Mail(
     <p>Ar pateicību un sirsnīgiem sveicieniem,<br>
     <b>Evija</b></p>
     """
-)
-
-message.reply_to = Email(SENDGRID_REPLY_TO)
-message.attachment = attachment
-
-try:
-    response = sg.send(message)
-    print(f"📧 SendGrid status: {response.status_code}")
-    try:
-        print(f"📧 SendGrid response body: {response.body}")
-    except Exception:
-        pass
-    print("📧 Email sent via SendGrid (no exception)")
-except Exception as e:
-    print("❌ SendGrid error:", repr(e))
 
+
+# =========================
+# MAIN
+# =========================
+def main(argv) -> tuple:
+    """argv: [DD.MM.YYYY, recipient@email.com]. Returns (file name, PDF bytes)."""
+    if len(argv) < 2:
+        print("❌ Usage: python make_berns_pdf.py DD.MM.YYYY recipient@email.com")
+        sys.exit(1)
+
+    birthdate = argv[0]
+    recipient_email = argv[1]
+
+    filename = f"BERNA_PERSONIBA_{birthdate.replace('.', '')}.pdf"
+    pdf = build_pdf(birthdate)
+
+    # === SENDGRID EMAIL SEND ===
+    send_pdf_email(recipient_email, pdf, filename, EMAIL_SUBJECT, EMAIL_HTML)
+    return filename, pdf
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--plan"]:
+        # python make_berns_pdf.py --plan DD.MM.YYYY → pages + URLs as JSON, nothing is downloaded
+        report_plan.dry_run(plan_pages, sys.argv[2:3])
+    else:
+        report_events.startup()
+        write_pdf(*main(sys.argv[1:]))
@@ -1,50 +1,30 @@
 # make_finanses_pdf.py
-import sys, os, requests
+import report_events
+import sys, os
 from io import BytesIO
 from datetime import datetime
-from collections import OrderedDict
-from dotenv import load_dotenv
-from supabase import create_client, Client
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
-# === ENV & SUPABASE ===
-load_dotenv(".env.local")
-SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-SUPABASE_KEY = (
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    or os.getenv("SUPABASE_KEY")
-    or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-)
+from report_common import SUPABASE_URL, SUPABASE_KEY, send_pdf_email, write_pdf, EventCanvas
+import report_plan
+import pdf_cache
+from report_plan import page, each
+from numerology import reduce22, triangle
+
+# === ENV ===
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise SystemExit("❌ Missing SUPABASE_URL or SUPABASE_KEY")
 
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 STORE = f"{SUPABASE_URL}/storage/v1/object/public/astro-forecasts/finanses"
-pdfmetrics.registerFont(TTFont("DejaVu", os.path.join(os.path.dirname(__file__), "DejaVuSans.ttf")))
 
 API_BASE = os.getenv("API_BASE", "http://localhost:8080")
 
+CUSTOM_PAGE = (1920, 1080)
+width, height = CUSTOM_PAGE
 
-# === HELPERS ===
-def reduce22(n: int) -> int:
-    while n > 22:
-        n = sum(int(d) for d in str(n))
-    return n
-
-def year_reduced(y: int) -> int:
-    return reduce22(sum(int(d) for d in str(y)))
-
-def get(url: str) -> bytes:
-    r = requests.get(url)
-    if r.status_code != 200:
-        raise RuntimeError(f"GET failed: {url} -> {r.status_code}")
-    return r.content
 
+# === HELPERS ===
 def draw_page(c: canvas.Canvas, title: str, img_bytes: bytes, is_star=False):
     W, H = width, height
     green_bg = HexColor("#0b1f1c")
@@ -110,128 +90,86 @@ def tri_order(nums: dict):
     # верхняя → средняя левая → средняя правая → нижняя левая → нижняя средняя → нижняя правая
     return uniq_keep_order([nums["top"], nums["ml"], nums["mr"], nums["left"], nums["mb"], nums["right"]])
 
-# === TRIANGLE CALC ===
-def finanses_numbers(d: int, m: int, y: int):
-    yR = year_reduced(y)
-    inner = reduce22(d + m + yR)
-    top = yR
-    right = reduce22(yR + inner)
-    left = reduce22(yR + m)
-    mr = reduce22(top + right)
-    ml = reduce22(top + left)
-    mb = reduce22(right + left)
-    return OrderedDict(top=top, right=right, left=left, mr=mr, ml=ml, mb=mb)
-
-# === MAIN ===
-if len(sys.argv) < 3:
-    print("❌ Usage: python make_finanses_pdf.py DD.MM.YYYY recipient@email.com")
-    sys.exit(1)
+def draw_last_page(c: canvas.Canvas, img_bytes: bytes):
+    reader = ImageReader(BytesIO(img_bytes))
+    W, H = width, height
 
-birthdate = sys.argv[1]
-recipient_email = sys.argv[2]
-d, m, y = map(int, birthdate.split("."))
+    # рисуем фон
+    green_bg = HexColor("#0b1f1c")
+    c.setFillColor(green_bg)
+    c.rect(0, 0, W, H, fill=1, stroke=0)
+    c.drawImage(reader, 0, 0, width=W, height=H, preserveAspectRatio=False, mask="auto")
+
+    # добавляем надпись
+    c.setFont("DejaVu", 150)
+    c.setFillColor(HexColor("#ff4c4c"))
+    c.saveState()
+    c.translate(W / 2, H / 2)
+    c.rotate(25)
+    c.setFillAlpha(0.25)
+    c.drawCentredString(0, 0, "PARAUGS")
+    c.restoreState()
 
-CUSTOM_PAGE = (1920, 1080)
-out_pdf = f"/tmp/FINANSES_REALIZACIJA_{birthdate.replace('.','')}.pdf"
-c = canvas.Canvas(out_pdf, pagesize=CUSTOM_PAGE)
-width, height = CUSTOM_PAGE
+    c.showPage()
 
-# 1–3 MAIN IMAGES
-for i in (1, 2, 3):
-    img = get(f"{STORE}/main/{i}.jpg")
-    draw_page(c, "", img)
-
-# 4 STAR
-star_png = get(f"{API_BASE}/api/star?date={birthdate}&format=png")
-draw_page(c, "Tava numeroloģiskā zvaigzne", star_png, is_star=True)
-
-# 5 DZC (day number)
-day_reduced = reduce22(d)
-img = get(f"{STORE}/dzimta/dzc{day_reduced}.jpg")
-draw_page(c, "", img)
-
-# 6 TRIANGLE
-tri_fin = get(f"{API_BASE}/api/triangle/finanses?date={birthdate}&format=png")
-draw_page(c, "FINANSES UN REALIZĀCIJA\nTRIJSTŪRIS", tri_fin)
-
-# 7 trisstura_apraksts
-img = get(f"{STORE}/main/trisstura_apraksts.jpg")
-draw_page(c, "", img)
-
-# 8–13 frcX.jpg by triangle order
-fin_nums = finanses_numbers(d, m, y)
-order_nums = tri_order(fin_nums)
-for n in order_nums:
-    if n == 1:
-        continue  # frc1.jpg не существует
-    img = get(f"{STORE}/finanses/frc{n}.jpg")
-    draw_page(c, "", img)
-
-# 14 last.jpg + overlay text "PARAUGS"
-img = get(f"{STORE}/main/last.jpg")
-reader = ImageReader(BytesIO(img))
-W, H = width, height
-
-# рисуем фон
-green_bg = HexColor("#0b1f1c")
-c.setFillColor(green_bg)
-c.rect(0, 0, W, H, fill=1, stroke=0)
-c.drawImage(reader, 0, 0, width=W, height=H, preserveAspectRatio=False, mask="auto")
-
-# добавляем надпись
-c.setFont("DejaVu", 150)
-c.setFillColor(HexColor("#ff4c4c"))
-c.saveState()
-c.translate(W / 2, H / 2)
-c.rotate(25)
-c.setFillAlpha(0.25)
-c.drawCentredString(0, 0, "PARAUGS")
-c.restoreState()
-
-c.showPage()
-
-# === SAVE AND SEND EMAIL ===
-c.save()
-print(f"✅ PDF saved: {out_pdf}")
-
-# === SENDGRID EMAIL SEND ===
-print(f"📧 Sending email via SendGrid to: {recipient_email}")
-
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import (
-    Mail, Email, To, Attachment,
-    FileContent, FileName, FileType, Disposition
-)
-import base64
-
-SENDGRID_KEY = os.getenv("SENDGRID_API_KEY")
-SENDGRID_FROM = os.getenv("SENDGRID_FROM", "info@parnumerologiju.lv")
-SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Par Numeroloģiju")
-SENDGRID_REPLY_TO = os.getenv("SENDGRID_REPLY_TO", "info@parnumerologiju.lv")
-
-if not SENDGRID_KEY:
-    raise SystemExit("❌ Missing SENDGRID_API_KEY environment variable")
-
-print("DEBUG: SENDGRID_KEY prefix:", SENDGRID_KEY[:10] if SENDGRID_KEY else "NONE")
-sg = SendGridAPIClient(SENDGRID_KEY)
-
-# read pdf file
-with open(out_pdf, "rb") as f:
-    pdf_data = f.read()
-    encoded_pdf = base64.b64encode(pdf_data).decode()
-
-attachment = Attachment(
-    FileContent(encoded_pdf),
-    FileName(os.path.basename(out_pdf)),
-    FileType("application/pdf"),
-    Disposition("attachment"),
-)
-
-message = Mail(
-    from_email=Email(SENDGRID_FROM, SENDGRID_FROM_NAME),
-    to_emails=To(recipient_email),
-    subject="Finanšu un Realizācijas ceļvedis",
-    html_content="""
+# === MANIFEST ===
+def numbers(birthdate: str) -> dict:
+    d, m, y = map(int, birthdate.split("."))
+    return {
+        "day": reduce22(d),
+        "finanses": tri_order(triangle("finanses", d, m, y)),
+    }
+
+MANIFEST = [
+    # 1–3 MAIN IMAGES
+    page("page", "{store}/main/1.jpg"),
+    page("page", "{store}/main/2.jpg"),
+    page("page", "{store}/main/3.jpg"),
+    # 4 STAR
+    page("page", "{api}/api/star?date={date}&format=png", title="Tava numeroloģiskā zvaigzne", is_star=True),
+    # 5 DZC (day number)
+    page("page", "{store}/dzimta/dzc{day}.jpg"),
+    # 6 TRIANGLE
+    page("page", "{api}/api/triangle/finanses?date={date}&format=png", title="FINANSES UN REALIZĀCIJA\nTRIJSTŪRIS"),
+    # 7 trisstura_apraksts
+    page("page", "{store}/main/trisstura_apraksts.jpg"),
+    # 8–13 frcX.jpg by triangle order
+    each("finanses", page("page", "{store}/finanses/frc{n}.jpg"), skip=(1,)),  # frc1.jpg не существует
+    # 14 last.jpg + overlay text "PARAUGS"
+    page("last", "{store}/main/last.jpg"),
+]
+
+DRAWERS = {
+    "page": lambda c, img, title="", is_star=False: draw_page(c, title, img, is_star=is_star),
+    "last": draw_last_page,
+}
+
+def plan_pages(birthdate: str) -> report_plan.Plan:
+    """All 14 pages in order, with the assets to fetch."""
+    return report_plan.plan(MANIFEST, store=STORE, api=API_BASE, date=birthdate, **numbers(birthdate))
+
+# === BUILD ===
+def build_pdf(birthdate: str) -> bytes:
+    with report_events.stage("numerology"):
+        pages = plan_pages(birthdate)
+    # same plan + same slides → same PDF: a re-order is served from the cache
+    return pdf_cache.cached(pages, lambda: render_pdf(pages), "finanses", birthdate)
+
+
+def render_pdf(pages: report_plan.Plan) -> bytes:
+    out = BytesIO()
+    c = EventCanvas(out, pagesize=CUSTOM_PAGE)
+
+    report_plan.render(c, pages, DRAWERS)
+
+    c.save()
+    pdf = out.getvalue()
+    print(f"✅ PDF built: {len(pdf) // 1024} KB, {c.getPageNumber() - 1} pages")
+    return pdf
+
+# === EMAIL ===
+EMAIL_SUBJECT = "Finanšu un Realizācijas ceļvedis"
+EMAIL_HTML = """
     <p>Labdien,</p>
 
     <p>Paldies, ka izvēlējies <b>Finanšu un realizācijas ceļvedi</b>! Skati to zemāk pielikumā.</p>
@@ -256,18 +194,29 @@ message = Mail(
 
     <p>Ar sirsnīgiem sveicieniem,<br><b>Evija</b></p>
     """
-)
-
-message.reply_to = Email(SENDGRID_REPLY_TO)
-message.attachment = attachment
-
-try:
-    response = sg.send(message)
-    print(f"📧 SendGrid status: {response.status_code}")
-    try:
-        print(f"📧 SendGrid response body: {response.body}")
-    except Exception:
-        pass
-    print("📧 Email sent via SendGrid (no exception)")
-except Exception as e:
-    print("❌ SendGrid error:", repr(e))
+
+# === MAIN ===
+def main(argv) -> tuple:
+    """argv: [DD.MM.YYYY, recipient@email.com]. Returns (file name, PDF bytes)."""
+    if len(argv) < 2:
+        print("❌ Usage: python make_finanses_pdf.py DD.MM.YYYY recipient@email.com")
+        sys.exit(1)
+
+    birthdate = argv[0]
+    recipient_email = argv[1]
+
+    filename = f"FINANSES_REALIZACIJA_{birthdate.replace('.','')}.pdf"
+    pdf = build_pdf(birthdate)
+
+    # === SENDGRID EMAIL SEND ===
+    send_pdf_email(recipient_email, pdf, filename, EMAIL_SUBJECT, EMAIL_HTML)
+    return filename, pdf
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--plan"]:
+        # python make_finanses_pdf.py --plan DD.MM.YYYY → pages + URLs as JSON, nothing is downloaded
+        report_plan.dry_run(plan_pages, sys.argv[2:3])
+    else:
+        report_events.startup()
+        write_pdf(*main(sys.argv[1:]))
@@ -1,18 +1,15 @@
-import sys, os, random, requests, smtplib
+import report_events
+import re, sys, os, time, hashlib
 from datetime import datetime
-from supabase import create_client
-from dotenv import load_dotenv
 from collections import defaultdict
 from io import BytesIO
-from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
-from email import encoders
+from report_common import supabase_client, send_pdf_email, write_pdf, EventCanvas
+from report_http import prefetch
+import report_plan
+import pdf_cache
+from report_plan import page, each
 
 API_BASE = os.getenv("API_BASE", "http://localhost:3333")
 
@@ -26,14 +23,39 @@ YEAR_OFFSETS = {
 }
 
 
-# === Load env ===
-load_dotenv(".env.local")
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-GMAIL_USER = "evijaparnumerologiju@gmail.com"
-GMAIL_PASS = os.getenv("GMAIL_APP_PASSWORD")
+# === Forecast image tables ===
+# Both tables are small and rarely edited: each is loaded whole in one query and kept in the
+# process (the worker reuses it across reports) for FORECAST_TABLES_TTL seconds.
+FORECAST_TABLES_TTL = float(os.getenv("FORECAST_TABLES_TTL", "600"))
+TABLE_PAGE_ROWS = 1000  # PostgREST max-rows default
+
+_tables = {"loaded_at": 0.0, "gada": None, "menesa": None}
+
+
+def fetch_table(name: str) -> list:
+    rows = []
+    while True:
+        res = supabase_client().table(name).select("*").range(len(rows), len(rows) + TABLE_PAGE_ROWS - 1).execute()
+        rows += res.data
+        if len(res.data) < TABLE_PAGE_ROWS:
+            return rows
+
+
+def forecast_tables() -> tuple:
+    """({gada_cipars: rows}, {menesa_cipars: rows}), no older than FORECAST_TABLES_TTL."""
+    now = time.monotonic()
+    if _tables["gada"] is None or now - _tables["loaded_at"] > FORECAST_TABLES_TTL:
+        gada, menesa = defaultdict(list), defaultdict(list)
+        with report_events.stage("db", tables=2):
+            # int keys whatever the column type: the lookups are by computed ints
+            for row in fetch_table("forecast_gada_images"):
+                gada[int(row["gada_cipars"])].append(row)
+            for row in fetch_table("forecast_menesa_images"):
+                menesa[int(row["menesa_cipars"])].append(row)
+        _tables.update(loaded_at=now, gada=dict(gada), menesa=dict(menesa))
+        print(f"🗂️ Forecast tables loaded: {len(gada)} gada, {len(menesa)} mēneša cipari")
+    return _tables["gada"], _tables["menesa"]
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 # === Helpers ===
 def reduce_22(num: int) -> int:
@@ -41,67 +63,45 @@ def reduce_22(num: int) -> int:
         num = sum(map(int, str(num)))
     return num
 
-# Register DejaVu font for Latvian characters
-script_dir = os.path.dirname(__file__)
-font_path = os.path.join(script_dir, "DejaVuSans.ttf")
-pdfmetrics.registerFont(TTFont("DejaVu", font_path))
-
-# === Args ===
-if len(sys.argv) < 4:
-    print("❌ Usage: python make_forecast_pdf_full.py DD.MM.YYYY TARGET_YEAR recipient@email.com")
-    sys.exit(1)
-
-birthdate = sys.argv[1]
-target_year_str = sys.argv[2]
-recipient_email = sys.argv[3]
+CUSTOM_PAGE = (1920, 1080)
+width, height = CUSTOM_PAGE
+green_bg = HexColor("#0b1f1c")
 
-try:
-    target_year = int(target_year_str)
-except ValueError:
-    print("❌ TARGET_YEAR must be an integer, e.g. 2025")
-    sys.exit(1)
+MONTH_NAMES = [
+    "JANVĀRIS", "FEBRUĀRIS", "MARTS", "APRĪLIS", "MAIJS", "JŪNIJS",
+    "JŪLIJS", "AUGUSTS", "SEPTEMBRIS", "OKTOBRIS", "NOVEMBRIS", "DECEMBRIS"
+]
 
-print(f"📅 Birthdate: {birthdate}, forecast for {target_year}")
-print(f"📧 Will be sent to: {recipient_email}")
 
 # === Calculate gada cipars using fixed offsets ===
-d, m, y = map(int, birthdate.split("."))
-
-year_offset = YEAR_OFFSETS.get(target_year)
-if year_offset is None:
-    # безопасный фоллбек, если забудем добавить год
-    year_offset = sum(map(int, str(target_year)))
-    print(f"⚠️ No offset configured for {target_year}, using digit sum: {year_offset}")
-else:
-    print(f"🧮 Using configured offset for {target_year}: {year_offset}")
-
-# === GADA CIPARS по новой формуле ===
-# 1) d + m → если >22, редуцируем
-base_sum = d + m
-if base_sum > 22:
-    base_sum = reduce_22(base_sum)
-
-# 2) base_sum + year_offset → если >22, редуцируем
-gada_raw = base_sum + year_offset
-if gada_raw > 22:
-    gada_cipars = reduce_22(gada_raw)
-else:
-    gada_cipars = gada_raw
-
-print(f"🧮 Gada cipars formula: ({d} + {m}) -> {base_sum} + {year_offset} = {gada_cipars}")
-
+def gada_cipars_for(d: int, m: int, target_year: int) -> int:
+    year_offset = YEAR_OFFSETS.get(target_year)
+    if year_offset is None:
+        # безопасный фоллбек, если забудем добавить год
+        year_offset = sum(map(int, str(target_year)))
+        print(f"⚠️ No offset configured for {target_year}, using digit sum: {year_offset}")
+    else:
+        print(f"🧮 Using configured offset for {target_year}: {year_offset}")
+
+    # === GADA CIPARS по новой формуле ===
+    # 1) d + m → если >22, редуцируем
+    base_sum = d + m
+    if base_sum > 22:
+        base_sum = reduce_22(base_sum)
+
+    # 2) base_sum + year_offset → если >22, редуцируем
+    gada_raw = base_sum + year_offset
+    if gada_raw > 22:
+        gada_cipars = reduce_22(gada_raw)
+    else:
+        gada_cipars = gada_raw
 
+    print(f"🧮 Gada cipars formula: ({d} + {m}) -> {base_sum} + {year_offset} = {gada_cipars}")
+    return gada_cipars
 
 
-# === Prepare PDF ===
-pdf_path = f"/tmp/GADA_PROGNOZE_{birthdate.replace('.', '')}_{target_year}.pdf"
-CUSTOM_PAGE = (1920, 1080)
-c = canvas.Canvas(pdf_path, pagesize=CUSTOM_PAGE)
-width, height = CUSTOM_PAGE
-green_bg = HexColor("#0b1f1c")
-
 # === Draw page ===
-def draw_page(title, image_bytes, is_star=False):
+def draw_page(c, title, image_bytes, is_star=False):
     W, H = width, height
     c.setFillColor(green_bg)
     c.rect(0, 0, W, H, fill=1, stroke=0)
@@ -133,93 +133,114 @@ def draw_page(title, image_bytes, is_star=False):
 
     c.showPage()
 
-# === 1. Star image ===
-star_url = f"{API_BASE}/api/star?date={birthdate}&format=png"
-resp = requests.get(star_url)
-if resp.status_code != 200:
-    raise SystemExit("❌ Failed to generate star image")
-draw_page("Tava numeroloģiskā zvaigzne", resp.content, is_star=True)
-
-# === 2. Gada cipars page ===
-gada_res = supabase.table("forecast_gada_images").select("*").eq("gada_cipars", gada_cipars).execute()
-if not gada_res.data:
-    raise SystemExit(f"❌ gada_cipars {gada_cipars} not found")
-gada_img_url = gada_res.data[0]["image_url"]
-gada_bytes = requests.get(gada_img_url).content
-draw_page("", gada_bytes)
-
-# === 3. Mēneša cipari pages ===
-month_names = [
-    "JANVĀRIS", "FEBRUĀRIS", "MARTS", "APRĪLIS", "MAIJS", "JŪNIJS",
-    "JŪLIJS", "AUGUSTS", "SEPTEMBRIS", "OKTOBRIS", "NOVEMBRIS", "DECEMBRIS"
+
+# === Variant choice ===
+def variant_order(main: str):
+    # "2" before "10"; table row order isn't stable, so the groups are sorted
+    return (0, int(main), "") if main.isdigit() else (1, 0, main)
+
+
+def pick_variant(groups: list, d: int, m: int, y: int, target_year: int, month_num: int, seed: str = ""):
+    """One of the variant groups for this month, uniform like random.choice but the same on every run.
+
+    sha256 of (birthdate, year, month, seed): a re-send or a support re-run gets the slides the
+    customer got; a different seed gives another, equally likely pick.
+    """
+    h = hashlib.sha256(f"{d:02d}.{m:02d}.{y}|{target_year}|{month_num}|{seed}".encode()).digest()
+    return groups[int.from_bytes(h[:8], "big") % len(groups)]
+
+
+# === Manifest ===
+def numbers(birthdate: str, target_year: int, seed: str = "") -> dict:
+    """Gada slide + the month slides (one seeded variant group per month) from the tables."""
+    with report_events.stage("numerology"):
+        d, m, y = map(int, birthdate.split("."))
+        gada_cipars = gada_cipars_for(d, m, target_year)
+    gada_rows, menesa_rows = forecast_tables()
+
+    # === 2. Gada cipars page ===
+    gada_data = gada_rows.get(gada_cipars)
+    if not gada_data:
+        raise SystemExit(f"❌ gada_cipars {gada_cipars} not found")
+
+    # === 3. Mēneša cipari pages ===
+    months = []
+    for month_num, month_name in enumerate(MONTH_NAMES, start=1):
+        menesa_cipars = reduce_22(gada_cipars + month_num)
+        menesa_data = menesa_rows.get(menesa_cipars)
+        if not menesa_data:
+            print(f"⚠️ No data for mēneša cipars {menesa_cipars}")
+            continue
+
+        groups = defaultdict(list)
+        for item in menesa_data:
+            variant_str = str(item["variant"])
+            main = variant_str.split(".")[0]
+            groups[main].append(item)
+
+        chosen_main = pick_variant(sorted(groups, key=variant_order), d, m, y, target_year, month_num, seed)
+        chosen_items = sorted(groups[chosen_main], key=lambda x: x["variant"])
+
+        print(f"📂 {month_name}: cipars={menesa_cipars}, variant={chosen_main}, slides={len(chosen_items)}")
+
+        for item in chosen_items:
+            # название месяца поверх слайда
+            months.append({"url": item["image_url"], "title": month_name})
+
+    return {"gada": gada_data[0]["image_url"], "months": months}
+
+STAR_URL = "{api}/api/star?date={date}&format=png"
+
+MANIFEST = [
+    # === 1. Star image ===
+    page("page", STAR_URL, title="Tava numeroloģiskā zvaigzne", is_star=True),
+    # === 2–3. Gada + mēneša pages ===
+    page("page", "{gada}"),
+    each("months", page("page", "{url}", title="{title}")),
 ]
 
-for month_num, month_name in enumerate(month_names, start=1):
-    menesa_cipars = reduce_22(gada_cipars + month_num)
-    menesa_res = supabase.table("forecast_menesa_images").select("*").eq("menesa_cipars", menesa_cipars).execute()
-    if not menesa_res.data:
-        print(f"⚠️ No data for mēneša cipars {menesa_cipars}")
-        continue
-
-    groups = defaultdict(list)
-    for item in menesa_res.data:
-        variant_str = str(item["variant"])
-        main = variant_str.split(".")[0]
-        groups[main].append(item)
-
-    chosen_main = random.choice(list(groups.keys()))
-    chosen_items = sorted(groups[chosen_main], key=lambda x: x["variant"])
-
-    print(f"📂 {month_name}: cipars={menesa_cipars}, variant={chosen_main}, slides={len(chosen_items)}")
-
-    for item in chosen_items:
-        img_bytes = requests.get(item["image_url"]).content
-        # теперь название месяца поверх слайда
-        draw_page(month_name, img_bytes)
-
-
-# === Save PDF ===
-c.save()
-print(f"✅ PDF saved: {pdf_path}")
-
-# === SENDGRID EMAIL SEND ===
-print(f"📧 Sending email via SendGrid to: {recipient_email}")
-
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import (
-    Mail, Email, To, Attachment,
-    FileContent, FileName, FileType, Disposition
-)
-import base64
-
-SENDGRID_KEY = os.getenv("SENDGRID_API_KEY")
-SENDGRID_FROM = os.getenv("SENDGRID_FROM", "info@parnumerologiju.lv")
-SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Par Numeroloģiju")
-SENDGRID_REPLY_TO = os.getenv("SENDGRID_REPLY_TO", "info@parnumerologiju.lv")
-
-if not SENDGRID_KEY:
-    raise SystemExit("❌ Missing SENDGRID_API_KEY environment variable")
-
-print("DEBUG: SENDGRID_KEY prefix:", SENDGRID_KEY[:10] if SENDGRID_KEY else "NONE")
-sg = SendGridAPIClient(SENDGRID_KEY)
-
-# Read PDF
-with open(pdf_path, "rb") as f:
-    pdf_data = f.read()
-    encoded_pdf = base64.b64encode(pdf_data).decode()
-
-attachment = Attachment(
-    FileContent(encoded_pdf),
-    FileName(os.path.basename(pdf_path)),
-    FileType("application/pdf"),
-    Disposition("attachment")
-)
-
-message = Mail(
-    from_email=Email(SENDGRID_FROM, SENDGRID_FROM_NAME),
-    to_emails=To(recipient_email),
-    subject=f"Gada prognoze {target_year}",
-    html_content=f"""
+DRAWERS = {
+    "page": lambda c, img, title="", is_star=False: draw_page(c, title, img, is_star=is_star),
+}
+
+def plan_pages(birthdate: str, target_year, seed: str = "") -> report_plan.Plan:
+    return report_plan.plan(MANIFEST, api=API_BASE, date=birthdate, **numbers(birthdate, int(target_year), seed))
+
+
+# === Build ===
+def build_pdf(birthdate: str, target_year: int, seed: str = "") -> bytes:
+    pages = plan_pages(birthdate, target_year, seed)
+    # the variants are seeded, so the same plan + same slides → same PDF;
+    # a cache hit makes no render call at all (the star is only asked for in render_pdf)
+    return pdf_cache.cached(pages, lambda: render_pdf(pages, STAR_URL.format(api=API_BASE, date=birthdate)),
+                            "gada", birthdate, target_year, seed)
+
+
+def render_pdf(pages: report_plan.Plan, star_url: str) -> bytes:
+    out = BytesIO()
+    c = EventCanvas(out, pagesize=CUSTOM_PAGE)
+
+    # the star render starts first, the slides download while it runs
+    with prefetch([star_url]) as assets:
+        assets.add(pages.assets, optional=pages.optional)
+        try:
+            assets(star_url)
+        except RuntimeError:
+            raise SystemExit("❌ Failed to generate star image")
+        report_plan.render(c, pages, DRAWERS, assets)
+
+    # === Save PDF ===
+    c.save()
+    pdf = out.getvalue()
+    print(f"✅ PDF built: {len(pdf) // 1024} KB, {c.getPageNumber() - 1} pages")
+    return pdf
+
+
+# === Email ===
+def email_subject(target_year: int) -> str:
+    return f"Gada prognoze {target_year}"
+
+EMAIL_HTML = """
     <p>Labdien,</p>
 
     <p>Paldies, ka izvēlējies Gada prognozi! Skati to zemāk pielikumā.</p>
@@ -236,18 +257,45 @@ message = Mail(
     <p>No sirds pateicos par uzticību!</p>
     <p>Ar sirsnīgiem sveicieniem,<br><b>Evija</b></p>
     """
-)
 
-message.reply_to = Email(SENDGRID_REPLY_TO)
-message.attachment = attachment
 
-try:
-    response = sg.send(message)
-    print(f"📧 SendGrid status: {response.status_code}")
+# === Main ===
+def main(argv) -> tuple:
+    """argv: [DD.MM.YYYY, TARGET_YEAR, recipient@email.com, (SEED)]. Returns (file name, PDF bytes)."""
+    if len(argv) < 3:
+        print("❌ Usage: python make_forecast_pdf_full.py DD.MM.YYYY TARGET_YEAR recipient@email.com [SEED]")
+        sys.exit(1)
+
+    birthdate = argv[0]
+    target_year_str = argv[1]
+    recipient_email = argv[2]
+    seed = argv[3] if len(argv) > 3 else ""  # another month-variant pick for the same order
+
     try:
-        print(f"📧 SendGrid response body: {response.body}")
-    except Exception:
-        pass
-    print("📧 Email sent via SendGrid (no exception)")
-except Exception as e:
-    print("❌ SendGrid error:", repr(e))
\ No newline at end of file
+        target_year = int(target_year_str)
+    except ValueError:
+        print("❌ TARGET_YEAR must be an integer, e.g. 2025")
+        sys.exit(1)
+
+    print(f"📅 Birthdate: {birthdate}, forecast for {target_year}")
+    print(f"📧 Will be sent to: {recipient_email}")
+
+    filename = f"GADA_PROGNOZE_{birthdate.replace('.', '')}_{target_year}.pdf"
+    if seed:
+        # another variant pick is another PDF: keep it apart from the unseeded one
+        tag = seed if re.fullmatch(r"[A-Za-z0-9_-]{1,32}", seed) else hashlib.sha1(seed.encode()).hexdigest()[:10]
+        filename = filename.replace(".pdf", f"_{tag}.pdf")
+    pdf = build_pdf(birthdate, target_year, seed)
+
+    # === SENDGRID EMAIL SEND ===
+    send_pdf_email(recipient_email, pdf, filename, email_subject(target_year), EMAIL_HTML)
+    return filename, pdf
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--plan"]:
+        # python make_forecast_pdf_full.py --plan DD.MM.YYYY TARGET_YEAR [SEED] → pages + URLs as JSON, nothing is downloaded
+        report_plan.dry_run(plan_pages, sys.argv[2:5])
+    else:
+        report_events.startup()
+        write_pdf(*main(sys.argv[1:]))
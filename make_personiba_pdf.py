@@ -1,57 +1,36 @@
-import sys, os, requests
+import report_events
+import sys, os
 from io import BytesIO
 from datetime import datetime
-from collections import OrderedDict
-from dotenv import load_dotenv
-from supabase import create_client, Client
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from report_common import SUPABASE_URL, SUPABASE_KEY, send_pdf_email, write_pdf, EventCanvas
+import report_plan
+import pdf_cache
+from report_plan import page, each
+from numerology import reduce22, triangle, misija
 
 # -----------------------
-# ENV & CLIENT
+# ENV
 # -----------------------
-load_dotenv(".env.local")
-SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
-SUPABASE_KEY = (
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    or os.getenv("SUPABASE_KEY")
-    or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
-)
 if not SUPABASE_URL or not SUPABASE_KEY:
     raise SystemExit("❌ SUPABASE_URL / KEY are missing in .env.local")
 
-sb: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-
 API_BASE = os.getenv("API_BASE", "http://localhost:3333")
 
 
 # Storage base
 STORE = f"{SUPABASE_URL}/storage/v1/object/public/astro-forecasts/personiba"
 
-# Fonts
-pdfmetrics.registerFont(TTFont("DejaVu", os.path.join(os.path.dirname(__file__), "DejaVuSans.ttf")))
+# === PDF page (1920x1080) ===
+CUSTOM_PAGE = (1920, 1080)
+width, height = CUSTOM_PAGE
 
 # -----------------------
 # HELPERS
 # -----------------------
-def reduce22(n: int) -> int:
-    while n > 22:
-        n = sum(int(d) for d in str(n))
-    return n
-
-def year_reduced(y: int) -> int:
-    return reduce22(sum(int(d) for d in str(y)))
-
-def get(url: str) -> bytes:
-    r = requests.get(url)
-    if r.status_code != 200:
-        raise RuntimeError(f"GET failed: {url} -> {r.status_code}")
-    return r.content
-
 def draw_page(c: canvas.Canvas, title: str, img_bytes: bytes, is_star=False):
     W, H = width, height
     green_bg = HexColor("#0b1f1c")
@@ -124,348 +103,109 @@ def tri_order(nums: dict):
     return out
 
 # -----------------------
-# TRIANGLE MATH (как в TS)
+# MANIFEST
 # -----------------------
-def personiba_numbers(d: int, m: int, y: int):
-    d1 = reduce22(d)
-    yR = year_reduced(y)
-    # bottomRight
-    br = reduce22(d1 + m)
-    # bottomLeft — каскад по твоему описанию
-    a1 = d1
-    a2 = m
-    a3 = yR
-    a4 = reduce22(a1 + a2 + a3)
-    a5 = reduce22(a1 + a2 + a3 + a4)
-    bl = reduce22(a1 + a5)
-    # Middles
-    mr = reduce22(d1 + br)
-    ml = reduce22(d1 + bl)
-    mb = reduce22(br + bl)
-    return OrderedDict(top=d1, right=br, left=bl, mr=mr, ml=ml, mb=mb)
-
-def dzimta_numbers(d: int, m: int, y: int):
-    d1 = reduce22(d)
-    yR = year_reduced(y)
-    top = reduce22(m)
-    right = reduce22(m + yR)
-    left = reduce22(d1 + m)
-    mr = reduce22(top + right)
-    ml = reduce22(top + left)
-    mb = reduce22(right + left)
-    return OrderedDict(top=top, right=right, left=left, mr=mr, ml=ml, mb=mb)
-
-def finanses_numbers(d: int, m: int, y: int):
-    """
-    Full parity with triangleFinanses.ts
-    """
-    # === Reduce all base numbers ===
-    day_reduced = reduce22(d)
-    month_reduced = reduce22(m)
-    year_sum = sum(int(ch) for ch in str(y))
-    year_reduced = reduce22(year_sum)
-
-    # === Core math ===
-    inner_sum = reduce22(day_reduced + month_reduced + year_reduced)
-
-    top = year_reduced
-    right = reduce22(year_reduced + inner_sum)
-    left = reduce22(year_reduced + month_reduced)
-    mr = reduce22(year_reduced + right)
-    ml = reduce22(year_reduced + left)
-    mb = reduce22(right + left)
-
-    return OrderedDict(top=top, right=right, left=left, mr=mr, ml=ml, mb=mb)
-
-
-
-def attiecibas_numbers(d: int, m: int, y: int):
-    """
-    Full parity with triangleAttiecibas.ts (canvas version)
-    """
-    # === Reduce helpers ===
-    d1 = reduce22(d)
-    y_sum = sum(int(ch) for ch in str(y))
-    yR = reduce22(y_sum)
-    month = m  # месяц НЕ редуцируем
-
-    # (1) Верхняя = день↓ + месяц + год↓
-    top = reduce22(d1 + month + yR)
-
-    # внутренняя сумма (combo) = dRaw + mRaw + yearSum + top
-    combo = reduce22(d + m + y_sum + top)
-
-    # (2) Нижняя правая = top + combo
-    right = reduce22(top + combo)
-
-    # (3) Нижняя левая = top + год↓
-    left = reduce22(top + yR)
-
-    # (4) Средняя правая = top + right
-    mr = reduce22(top + right)
-
-    # (5) Средняя левая = top + left
-    ml = reduce22(top + left)
-
-    # (6) Средняя нижняя = right + left
-    mb = reduce22(right + left)
-
-    return OrderedDict(top=top, right=right, left=left, mr=mr, ml=ml, mb=mb)
-
-def veseliba_numbers(d: int, m: int, y: int):
-    """
-    Full parity with triangleVeseliba.ts
-    """
-    # === Reduce each component ===
-    day_reduced = reduce22(d)
-    month_reduced = reduce22(m)
-    year_sum = sum(int(ch) for ch in str(y))
-    year_reduced = reduce22(year_sum)
-
-    # (1) Внутренняя сумма (день + месяц + год)
-    base_sum = reduce22(day_reduced + month_reduced + year_reduced)
-
-    # (2) Верхняя = день + месяц + год + base_sum
-    top = reduce22(day_reduced + month_reduced + year_reduced + base_sum)
-
-    # (3) Нижняя правая = top + день
-    right = reduce22(top + day_reduced)
-
-    # (4) Нижняя левая = top + base_sum
-    left = reduce22(top + base_sum)
-
-    # (5) Средняя правая = top + right
-    mr = reduce22(top + right)
-
-    # (6) Средняя левая = top + left
-    ml = reduce22(top + left)
-
-    # (7) Средняя нижняя = right + left
-    mb = reduce22(right + left)
-
-    return OrderedDict(top=top, right=right, left=left, mr=mr, ml=ml, mb=mb)
-
-
-# Misija (3 числа)
-def misija_numbers(d: int, m: int, y: int):
-    one = reduce22(d)
-    two = m
-    three = year_reduced(y)
-    four = reduce22(one + two + three)
-    five = reduce22(one + two + three + four)
-    six = reduce22(one + two + three + four + five)
-    seven = reduce22(one + two)
-    eight = reduce22(two + three)
-    nine = reduce22(three + four)
-    ten = reduce22(four + five)
-    eleven = reduce22(five + one)
-    first = six
-    second = reduce22(seven + eight + nine + ten + eleven)
-    third = reduce22(first + second)  # чтобы точно был слайд mcX.jpg
-    return first, second, third
+MONTH_FILES = ["1-janvaris","2-februaris","3-marts","4-aprilis","5-maijs","6-junijs","7-julijs","8-augusts","9-septembris","10-oktobris","11-novembris","12-decembris"]
+
+def numbers(birthdate: str) -> dict:
+    """Slide numbers for the manifest (same as the API renders, numerology.py = порт TS)."""
+    d, m, y = map(int, birthdate.split("."))
+    att = tri_order(triangle("attiecibas", d, m, y))
+    # Диагностика на время теста (можно закомментить):
+    print("ATT order (top→ml→mr→left→mb→right):", att)
+    return {
+        "month": MONTH_FILES[m - 1],
+        "personiba": tri_order(triangle("personiba", d, m, y)),
+        "dzimta": tri_order(triangle("dzimta", d, m, y)),
+        "finanses": tri_order(triangle("finanses", d, m, y)),
+        "attiecibas": [int(n) for n in att],
+        "veseliba": tri_order(triangle("veseliba", d, m, y)),
+        # на всякий случай reduce22, чтобы точно был файл mcX.jpg
+        "misija": [reduce22(n) for n in misija(d, m, y)],
+    }
+
+MANIFEST = [
+    # 1-3 MAIN
+    page("page", "{store}/main/P-Main-1.jpg"),
+    page("page", "{store}/main/P-Main-2.jpg"),
+    page("page", "{store}/main/P-Main-3.jpg"),
+    # 4 STAR
+    page("page", "{api}/api/star?date={date}&format=png", title="Tava numeroloģiskā zvaigzne", is_star=True),
+
+    # ----- PERSONĪBA -----
+    page("page", "{store}/personiba/personiba.jpg"),
+    page("page", "{api}/api/triangle/personiba?date={date}&format=png", title="PERSONĪBA\nTRIJSTŪRIS"),
+    # slides by triangle numbers (unique, in the order: top, ml, mr, left, mb, right)
+    each("personiba", page("page", "{store}/personiba/P{n}.jpg")),
+
+    # ----- DZIMTA -----
+    page("page", "{store}/dzimta/dzimta.jpg"),
+    page("page", "{api}/api/triangle/dzimta?date={date}&format=png", title="DZIMTA UN GARĪGUMS\nTRIJSTŪRIS"),
+    page("page", "{store}/menesi/{month}.jpg"),
+    each("dzimta", page("page", "{store}/dzimta/dzc{n}.jpg")),
+
+    # ----- FINANSES -----
+    page("page", "{store}/finanses/finanses.jpg"),
+    page("page", "{api}/api/triangle/finanses?date={date}&format=png", title="FINANSES UN REALIZĀCIJA\nTRIJSTŪRIS"),
+    each("finanses", page("page", "{store}/finanses/frc{n}.jpg"), skip=(1,)),  # frc1 нет
+
+    # ----- ATTIECĪBAS -----
+    page("page", "{store}/attiecibas/attiecibas.jpg"),
+    page("page", "{api}/api/triangle/attiecibas?date={date}&format=png", title="ATTIECĪBAS\nTRIJSTŪRIS"),
+    # два слайда p/m по каждому числу; нет 1 и 2
+    each("attiecibas",
+         page("page", "{store}/attiecibas/ac{n}p.jpg"),
+         page("page", "{store}/attiecibas/ac{n}m.jpg"),
+         skip=(1, 2)),
+
+    # ----- VESELĪBA -----
+    page("page", "{store}/veseliba/veseliba.jpg"),
+    page("page", "{api}/api/triangle/veseliba?date={date}&format=png", title="VESELĪBA\nTRIJSTŪRIS"),
+    each("veseliba", page("page", "{store}/veseliba/vc{n}.jpg")),
+
+    # ----- MISIJA -----
+    # готовое изображение из API (три кружка на фоне), потом слайды по числам мисijas
+    page("page", "{api}/api/triangle/misija?date={date}&format=png"),
+    each("misija", page("page", "{store}/misija/mc{n}.jpg"), skip=(1, 2)),  # в папке нет mc1, mc2
+]
+
+DRAWERS = {
+    "page": lambda c, img, title="", is_star=False: draw_page(c, title, img, is_star=is_star),
+}
+
+def plan_pages(birthdate: str) -> report_plan.Plan:
+    """Every page of the report, in order, with the assets to fetch."""
+    return report_plan.plan(MANIFEST, store=STORE, api=API_BASE, date=birthdate, **numbers(birthdate))
 
 
 # -----------------------
-# MAIN
+# BUILD
 # -----------------------
-if len(sys.argv) < 3:
-    print("❌ Usage: python make_personiba_pdf.py DD.MM.YYYY recipient@email.com")
-    sys.exit(1)
-
-birthdate = sys.argv[1]
-recipient_email = sys.argv[2]
-d, m, y = map(int, birthdate.split("."))
+def build_pdf(birthdate: str) -> bytes:
+    with report_events.stage("numerology"):
+        pages = plan_pages(birthdate)
+    # same plan + same slides → same PDF: a re-order is served from the cache
+    return pdf_cache.cached(pages, lambda: render_pdf(pages), "personiba", birthdate)
 
 
-# === Prepare PDF (1920x1080) ===
-CUSTOM_PAGE = (1920, 1080)
-
-# универсальный путь — под деплой (Linux контейнер) и тесты
-out_pdf = f"/tmp/PERSONIBAS_ANALIZE_{birthdate.replace('.','')}.pdf"
+def render_pdf(pages: report_plan.Plan) -> bytes:
+    out = BytesIO()
+    c = EventCanvas(out, pagesize=CUSTOM_PAGE)
 
-c = canvas.Canvas(out_pdf, pagesize=CUSTOM_PAGE)
-width, height = CUSTOM_PAGE
+    # all downloads start now; pages are drawn in order as their image arrives
+    report_plan.render(c, pages, DRAWERS)
 
+    c.save()
+    pdf = out.getvalue()
+    print(f"✅ PDF built: {len(pdf) // 1024} KB, {c.getPageNumber() - 1} pages")
+    return pdf
 
 
-# 1-3 MAIN
-for i in (1, 2, 3):
-    img = get(f"{STORE}/main/P-Main-{i}.jpg")
-    draw_page(c, "", img)
-
-# 4 STAR
-star_png = get(f"{API_BASE}/api/star?date={birthdate}&format=png")
-draw_page(c, "Tava numeroloģiskā zvaigzne", star_png, is_star=True)
-
-# ----- PERSONĪBA -----
-# 5 personiba intro
-img = get(f"{STORE}/personiba/personiba.jpg")
-draw_page(c, "", img)
-
-# 6 triangle image with title
-tri_personiba = get(f"{API_BASE}/api/triangle/personiba?date={birthdate}&format=png")
-draw_page(c, "PERSONĪBA\nTRIJSTŪRIS", tri_personiba)
-
-# 7-12 slides by triangle numbers (unique, in the order: top, left, right, ml, mr, mb)
-p_nums = personiba_numbers(d, m, y)
-order_nums = tri_order(p_nums)
-for n in order_nums:
-    img = get(f"{STORE}/personiba/P{n}.jpg")
-    draw_page(c, "", img)
-
-
-# ----- DZIMTA -----
-# 13
-img = get(f"{STORE}/dzimta/dzimta.jpg")
-draw_page(c, "", img)
-
-# 14
-tri_dzimta = get(f"{API_BASE}/api/triangle/dzimta?date={birthdate}&format=png")
-draw_page(c, "DZIMTA UN GARĪGUMS\nTRIJSTŪRIS", tri_dzimta)
-
-# 15 month page
-month_files = ["1-janvaris","2-februaris","3-marts","4-aprilis","5-maijs","6-junijs","7-julijs","8-augusts","9-septembris","10-oktobris","11-novembris","12-decembris"]
-img = get(f"{STORE}/menesi/{month_files[m-1]}.jpg")
-draw_page(c, "", img)
-
-# 16-21 — dzc
-dz_nums = dzimta_numbers(d, m, y)
-order_nums = tri_order(dz_nums)
-for n in order_nums:
-    img = get(f"{STORE}/dzimta/dzc{n}.jpg")
-    draw_page(c, "", img)
-
-
-# ----- FINANSES -----
-# 22
-img = get(f"{STORE}/finanses/finanses.jpg")
-draw_page(c, "", img)
-
-# 23
-tri_fin = get(f"{API_BASE}/api/triangle/finanses?date={birthdate}&format=png")
-draw_page(c, "FINANSES UN REALIZĀCIJA\nTRIJSTŪRIS", tri_fin)
-
-# 24-29 — frc2..frc22 (нет frc1)
-fin_nums = finanses_numbers(d, m, y)
-order_nums = tri_order(fin_nums)
-for n in order_nums:
-    if n == 1:  # frc1 нет
-        continue
-    img = get(f"{STORE}/finanses/frc{n}.jpg")
-    draw_page(c, "", img)
-
-# ----- ATTIECĪBAS -----
-# 30
-img = get(f"{STORE}/attiecibas/attiecibas.jpg")
-draw_page(c, "", img)
-
-# 31
-tri_att = get(f"{API_BASE}/api/triangle/attiecibas?date={birthdate}&format=png")
-draw_page(c, "ATTIECĪBAS\nTRIJSTŪRIS", tri_att)
-
-# 32-43 — два слайда p/m по каждому числу; нет 1 и 2
-# Попытка взять JSON из API (чтобы совпадало с PNG). Если не получится — локальный расчёт.
-att_nums_dict = None
-try:
-    resp = requests.get(f"{API_BASE}/api/triangle/attiecibas?date={birthdate}&format=json", timeout=5)
-    # .json() может упасть, поймаем в except
-    data = resp.json()
-    # ожидаем ключи: top, ml, mr, left, mb, right
-    # приводим к int на всякий случай
-    att_nums_dict = {
-        "top": int(data["top"]),
-        "ml": int(data["ml"]),
-        "mr": int(data["mr"]),
-        "left": int(data["left"]),
-        "mb": int(data["mb"]),
-        "right": int(data["right"]),
-    }
-except Exception:
-    att_nums_dict = attiecibas_numbers(d, m, y)
-
-order_nums = tri_order(att_nums_dict)
-# Диагностика на время теста (можно закомментить):
-print("ATT order (top→ml→mr→left→mb→right):", order_nums)
-
-for n in order_nums:
-    n = int(n)
-    if n in (1, 2):  # этих файлов нет
-        continue
-    img_p = get(f"{STORE}/attiecibas/ac{n}p.jpg"); draw_page(c, "", img_p)
-    img_m = get(f"{STORE}/attiecibas/ac{n}m.jpg"); draw_page(c, "", img_m)
-
-
-# ----- VESELĪBA -----
-# 44
-img = get(f"{STORE}/veseliba/veseliba.jpg")
-draw_page(c, "", img)
-
-# 45
-tri_ves = get(f"{API_BASE}/api/triangle/veseliba?date={birthdate}&format=png")
-draw_page(c, "VESELĪBA\nTRIJSTŪRIS", tri_ves)
-
-# 46-51 — vc1..vc22
-ves_nums = veseliba_numbers(d, m, y)
-order_nums = tri_order(ves_nums)
-for n in order_nums:
-    img = get(f"{STORE}/veseliba/vc{n}.jpg")
-    draw_page(c, "", img)
-
-
-# ----- MISIJA -----
-# 52 — готовое изображение из API (три кружка на фоне)
-misija_png = get(f"{API_BASE}/api/triangle/misija?date={birthdate}&format=png")
-draw_page(c, "", misija_png)
-
-# 53-55 — три слайда по числам мисijas
-m1, m2, m3 = misija_numbers(d, m, y)
-for n in (m1, m2, m3):
-    n = reduce22(n)  # на всякий случай, чтобы точно был файл mcX.jpg
-    if n < 3:  # в папке нет mc1, mc2
-        continue
-    img = get(f"{STORE}/misija/mc{n}.jpg")
-    draw_page(c, "", img)
-
-
-# === SAVE AND SEND EMAIL ===
-c.save()
-print(f"✅ PDF saved: {out_pdf}")
-
-# === SENDGRID EMAIL SEND ===
-print(f"📧 Sending email via SendGrid to: {recipient_email}")
-
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Attachment, FileContent, FileName, FileType, Disposition
-import base64
-
-SENDGRID_KEY = os.getenv("SENDGRID_API_KEY")
-SENDGRID_FROM = os.getenv("SENDGRID_FROM", "info@parnumerologiju.lv")
-SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Par Numeroloģiju")
-SENDGRID_REPLY_TO = os.getenv("SENDGRID_REPLY_TO", "info@parnumerologiju.lv")
-
-if not SENDGRID_KEY:
-    raise SystemExit("❌ Missing SENDGRID_API_KEY environment variable")
-
-print("DEBUG: SENDGRID_KEY prefix:", SENDGRID_KEY[:10] if SENDGRID_KEY else "NONE")
-sg = SendGridAPIClient(SENDGRID_KEY)
-
-# read pdf file
-with open(out_pdf, "rb") as f:
-    pdf_data = f.read()
-    encoded_pdf = base64.b64encode(pdf_data).decode()
-
-attachment = Attachment(
-    FileContent(encoded_pdf),
-    FileName(os.path.basename(out_pdf)),
-    FileType("application/pdf"),
-    Disposition("attachment")
-)
-
-message = Mail(
-    from_email=Email(SENDGRID_FROM, SENDGRID_FROM_NAME),
-    to_emails=To(recipient_email),
-    subject="Numeroloģiskā Personības analīze",
-    html_content="""
+# -----------------------
+# EMAIL
+# -----------------------
+EMAIL_SUBJECT = "Numeroloģiskā Personības analīze"
+EMAIL_HTML = """
     <p>Labdien,</p>
     <p>Paldies, ka izvēlējies numeroloģisko <b>Personības analīzi</b> – to, kas palīdz tuvāk iepazīt sevi. 
     Skati to zemāk pielikumā.</p>
@@ -485,21 +225,32 @@ message = Mail(
   </body>
 </html>
 """
-)
-
-message.reply_to = Email(SENDGRID_REPLY_TO)
-message.attachment = attachment
-
-try:
-    response = sg.send(message)
-    print(f"📧 SendGrid status: {response.status_code}")
-    # На время дебага выводим body, чтобы видеть текст ошибки, если что
-    try:
-        print(f"📧 SendGrid response body: {response.body}")
-    except Exception:
-        pass
-    print("📧 Email sent via SendGrid (no exception)")
-except Exception as e:
-    # Очень важно: печатаем ошибку в stdout, чтобы её увидел Node
-    print("❌ SendGrid error:", repr(e))
 
+
+# -----------------------
+# MAIN
+# -----------------------
+def main(argv) -> tuple:
+    """argv: [DD.MM.YYYY, recipient@email.com]. Returns (file name, PDF bytes)."""
+    if len(argv) < 2:
+        print("❌ Usage: python make_personiba_pdf.py DD.MM.YYYY recipient@email.com")
+        sys.exit(1)
+
+    birthdate = argv[0]
+    recipient_email = argv[1]
+
+    filename = f"PERSONIBAS_ANALIZE_{birthdate.replace('.','')}.pdf"
+    pdf = build_pdf(birthdate)
+
+    # === SENDGRID EMAIL SEND ===
+    send_pdf_email(recipient_email, pdf, filename, EMAIL_SUBJECT, EMAIL_HTML)
+    return filename, pdf
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--plan"]:
+        # python make_personiba_pdf.py --plan DD.MM.YYYY → pages + URLs as JSON, nothing is downloaded
+        report_plan.dry_run(plan_pages, sys.argv[2:3])
+    else:
+        report_events.startup()
+        write_pdf(*main(sys.argv[1:]))
@@ -1,45 +1,33 @@
 # make_saderiba_pdf.py
-import sys, os, requests
+import report_events
+import sys, os
 from io import BytesIO
-from dotenv import load_dotenv
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from report_common import SUPABASE_URL, send_pdf_email, write_pdf, EventCanvas
+import report_plan
+import pdf_cache
+from report_plan import page
+from numerology import reduce22, parse_date, triangle, saderiba_sum
 
 # ====== ENV ======
-load_dotenv(".env.local")
-SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
 if not SUPABASE_URL:
     raise SystemExit("❌ SUPABASE_URL is missing")
 
 STORE = f"{SUPABASE_URL}/storage/v1/object/public/astro-forecasts/saderiba"
 API_BASE = os.getenv("API_BASE", "http://localhost:8080")
 
-# ====== PDF / FONT ======
+# ====== PDF ======
 CUSTOM_PAGE = (1920, 1080)
 BG = HexColor("#0b1f1c")
-FONT_PATH = os.path.join(os.path.dirname(__file__), "DejaVuSans.ttf")
-pdfmetrics.registerFont(TTFont("DejaVu", FONT_PATH))
 
 # ====== HELPERS ======
-def reduce22(n: int) -> int:
-    while n > 22:
-        n = sum(int(d) for d in str(n))
-    return n
-
 def reduce9(n: int) -> int:
     while n > 9:
         n = sum(int(d) for d in str(n))
     return n or 1
 
-def get_bytes(url: str) -> bytes:
-    r = requests.get(url)
-    if r.status_code != 200:
-        raise RuntimeError(f"GET failed: {url} -> {r.status_code}")
-    return r.content
-
 def draw_full(c: canvas.Canvas, img_bytes: bytes):
     W, H = CUSTOM_PAGE
     c.setFillColor(BG)
@@ -113,130 +101,82 @@ TRI_W = 650
 def clamp_attiecibas_index(n: int) -> int:
     return max(3, min(22, n))
 
-# ====== MAIN ======
-if len(sys.argv) < 4:
-    print("❌ Usage: python make_saderiba_pdf.py DD.MM.YYYY DD.MM.YYYY recipient@email.com")
-    sys.exit(1)
-
-date_you = sys.argv[1]
-date_partner = sys.argv[2]
-recipient_email = sys.argv[3]
-
-
-out_pdf = f"/tmp/SADERIBA_{date_you.replace('.', '')}_{date_partner.replace('.', '')}.pdf"
-c = canvas.Canvas(out_pdf, pagesize=CUSTOM_PAGE)
-
-# --- 1–2 ---
-for i in (1, 2):
-    img = get_bytes(f"{STORE}/saderiba_main/{i}.jpg")
-    draw_full(c, img)
-
-# --- 3. твоя звезда ---
-bg3 = get_bytes(f"{STORE}/saderiba_main/3.jpg")
-star_you = get_bytes(f"{API_BASE}/api/star/saderiba?date={date_you}&format=png")
-draw_overlay_with_title(c, bg3, star_you, "TAVA ZVAIGZNE", 0.78, 0, 0, 42)
-
-# --- 4. партнёр ---
-star_partner = get_bytes(f"{API_BASE}/api/star/saderiba?date={date_partner}&format=png")
-draw_overlay_with_title(c, bg3, star_partner, "PARTNERA ZVAIGZNE", 0.78, 0, 0, 42)
-
-# --- 5. твой треугольник ---
-tri_you = get_bytes(f"{API_BASE}/api/triangle/saderiba?date={date_you}&format=png")
-resp_you = requests.get(f"{API_BASE}/api/triangle/saderiba?date={date_you}&format=json")
-nums_you = resp_you.json()
-top_you = clamp_attiecibas_index(reduce22(int(nums_you.get("top", 3))))
-bg_ac = get_bytes(f"{STORE}/attiecibas/ac{top_you}.jpg")
-draw_triangle_in_slot(c, bg_ac, tri_you, TRI_X, TRI_Y, TRI_W)
-
-# --- 6–7 ---
-for suffix in ("_1", "_2"):
-    img = get_bytes(f"{STORE}/attiecibas/ac{top_you}{suffix}.jpg")
-    draw_full(c, img)
-
-# --- 8. партнёрский треугольник ---
-tri_partner = get_bytes(f"{API_BASE}/api/triangle/saderiba?date={date_partner}&format=png")
-resp_partner = requests.get(f"{API_BASE}/api/triangle/saderiba?date={date_partner}&format=json")
-nums_partner = resp_partner.json()
-top_partner = clamp_attiecibas_index(reduce22(int(nums_partner.get("top", 3))))
-bg_acp = get_bytes(f"{STORE}/attiecibas/ac{top_partner}p.jpg")
-draw_triangle_in_slot(c, bg_acp, tri_partner, TRI_X, TRI_Y, TRI_W)
-
-# --- 9–10 ---
-for suffix in ("_1", "_2"):
-    img = get_bytes(f"{STORE}/attiecibas/ac{top_partner}{suffix}.jpg")
-    draw_full(c, img)
-
-# --- 11. совместная звезда ---
-bg4 = get_bytes(f"{STORE}/saderiba_main/4-sad_zv.jpg")
-star_sum = get_bytes(
-    f"{API_BASE}/api/star/saderibasum?dateA={date_you}&dateB={date_partner}&format=png"
-)
-draw_overlay_with_title(c, bg4, star_sum, "", 0.50, -10, -555, 0)
-
-# --- 12–15 ---
-sum_nums = requests.get(
-    f"{API_BASE}/api/star/saderibasum?dateA={date_you}&dateB={date_partner}&format=json"
-).json()
-
-lm = reduce22(int(sum_nums.get("ml", 3)))
-top_c = reduce22(int(sum_nums.get("top", 3)))
-rm = reduce22(int(sum_nums.get("mr", 3)))
-rb_val = int(sum_nums.get("right") or sum_nums.get("br") or sum_nums.get("mb", 1))
-rc_idx = reduce9(rb_val)
-
-slides = [
-    (f"{STORE}/saderiba/sac{lm}.jpg"),
-    (f"{STORE}/stridi/stc{top_c}.jpg"),
-    (f"{STORE}/bizness/bc{rm}.jpg"),
-    (f"{STORE}/rekomendacijas/rc{rc_idx}.jpg"),
+# ====== MANIFEST ======
+def numbers(date_you: str, date_partner: str) -> dict:
+    """Те же числа, что /api/triangle/saderiba и /api/star/saderibasum."""
+    sum_nums = saderiba_sum(date_you, date_partner)
+    return {
+        "top_you": clamp_attiecibas_index(reduce22(triangle("saderiba", *parse_date(date_you))["top"])),
+        "top_partner": clamp_attiecibas_index(reduce22(triangle("saderiba", *parse_date(date_partner))["top"])),
+        "lm": reduce22(sum_nums["ml"]),
+        "top_c": reduce22(sum_nums["top"]),
+        "rm": reduce22(sum_nums["mr"]),
+        "rc_idx": reduce9(sum_nums["br"]),
+    }
+
+MANIFEST = [
+    # --- 1–2 ---
+    page("full", "{store}/saderiba_main/1.jpg"),
+    page("full", "{store}/saderiba_main/2.jpg"),
+    # --- 3. твоя звезда, 4. партнёр (один и тот же фон) ---
+    page("overlay", "{store}/saderiba_main/3.jpg", "{api}/api/star/saderiba?date={date}&format=png",
+         title="TAVA ZVAIGZNE", overlay_scale=0.78, title_size=42),
+    page("overlay", "{store}/saderiba_main/3.jpg", "{api}/api/star/saderiba?date={partner}&format=png",
+         title="PARTNERA ZVAIGZNE", overlay_scale=0.78, title_size=42),
+    # --- 5. твой треугольник, 6–7 ---
+    page("slot", "{store}/attiecibas/ac{top_you}.jpg", "{api}/api/triangle/saderiba?date={date}&format=png",
+         slot_x=TRI_X, slot_y=TRI_Y, slot_w=TRI_W),
+    page("full", "{store}/attiecibas/ac{top_you}_1.jpg"),
+    page("full", "{store}/attiecibas/ac{top_you}_2.jpg"),
+    # --- 8. партнёрский треугольник, 9–10 ---
+    page("slot", "{store}/attiecibas/ac{top_partner}p.jpg", "{api}/api/triangle/saderiba?date={partner}&format=png",
+         slot_x=TRI_X, slot_y=TRI_Y, slot_w=TRI_W),
+    page("full", "{store}/attiecibas/ac{top_partner}_1.jpg"),
+    page("full", "{store}/attiecibas/ac{top_partner}_2.jpg"),
+    # --- 11. совместная звезда ---
+    page("overlay", "{store}/saderiba_main/4-sad_zv.jpg",
+         "{api}/api/star/saderibasum?dateA={date}&dateB={partner}&format=png",
+         overlay_scale=0.50, y_shift=-10, x_shift=-555, title_size=0),
+    # --- 12–15 ---
+    page("full", "{store}/saderiba/sac{lm}.jpg"),
+    page("full", "{store}/stridi/stc{top_c}.jpg"),
+    page("full", "{store}/bizness/bc{rm}.jpg"),
+    page("full", "{store}/rekomendacijas/rc{rc_idx}.jpg"),
 ]
 
-for slide in slides:
-    img = get_bytes(slide)
-    draw_full(c, img)
-
-# === SAVE AND SEND EMAIL ===
-c.save()
-print(f"✅ PDF saved: {out_pdf}")
-
-# === SENDGRID EMAIL SEND ===
-print(f"📧 Sending email via SendGrid to: {recipient_email}")
-
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import (
-    Mail, Email, To, Attachment,
-    FileContent, FileName, FileType, Disposition
-)
-import base64
-
-SENDGRID_KEY = os.getenv("SENDGRID_API_KEY")
-SENDGRID_FROM = os.getenv("SENDGRID_FROM", "info@parnumerologiju.lv")
-SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Par Numeroloģiju")
-SENDGRID_REPLY_TO = os.getenv("SENDGRID_REPLY_TO", "info@parnumerologiju.lv")
-
-if not SENDGRID_KEY:
-    raise SystemExit("❌ Missing SENDGRID_API_KEY environment variable")
-
-print("DEBUG: SENDGRID_KEY prefix:", SENDGRID_KEY[:10] if SENDGRID_KEY else "NONE")
-sg = SendGridAPIClient(SENDGRID_KEY)
-
-# Read PDF
-with open(out_pdf, "rb") as f:
-    pdf_data = f.read()
-    encoded_pdf = base64.b64encode(pdf_data).decode()
-
-attachment = Attachment(
-    FileContent(encoded_pdf),
-    FileName(os.path.basename(out_pdf)),
-    FileType("application/pdf"),
-    Disposition("attachment")
-)
-
-message = Mail(
-    from_email=Email(SENDGRID_FROM, SENDGRID_FROM_NAME),
-    to_emails=To(recipient_email),
-    subject="Numeroloģiskā Saderības analīze",
-    html_content="""
+DRAWERS = {
+    "full": draw_full,
+    "overlay": draw_overlay_with_title,
+    "slot": draw_triangle_in_slot,
+}
+
+def plan_pages(date_you: str, date_partner: str) -> report_plan.Plan:
+    return report_plan.plan(MANIFEST, store=STORE, api=API_BASE, date=date_you, partner=date_partner,
+                            **numbers(date_you, date_partner))
+
+# ====== BUILD ======
+def build_pdf(date_you: str, date_partner: str) -> bytes:
+    with report_events.stage("numerology"):
+        pages = plan_pages(date_you, date_partner)
+    # same plan + same slides → same PDF: a re-order is served from the cache
+    return pdf_cache.cached(pages, lambda: render_pdf(pages), "saderiba", date_you, date_partner)
+
+
+def render_pdf(pages: report_plan.Plan) -> bytes:
+    out = BytesIO()
+    c = EventCanvas(out, pagesize=CUSTOM_PAGE)
+
+    report_plan.render(c, pages, DRAWERS)
+
+    c.save()
+    pdf = out.getvalue()
+    print(f"✅ PDF built: {len(pdf) // 1024} KB, {c.getPageNumber() - 1} pages")
+    return pdf
+
+
+# ====== EMAIL ======
+EMAIL_SUBJECT = "Numeroloģiskā Saderības analīze"
+EMAIL_HTML = """
     <p>Labdien,</p>
 
     <p>Paldies, ka izvēlējies numeroloģisko <b>Saderības analīzi</b> – tā ir iespēja dziļāk izprast attiecības un cilvēku savstarpējo mijiedarbību. 
@@ -258,18 +198,31 @@ message = Mail(
 
     <p>Ar sirsnīgiem sveicieniem,<br><b>Evija</b></p>
     """
-)
-
-message.reply_to = Email(SENDGRID_REPLY_TO)
-message.attachment = attachment
-
-try:
-    response = sg.send(message)
-    print(f"📧 SendGrid status: {response.status_code}")
-    try:
-        print(f"📧 SendGrid response body: {response.body}")
-    except Exception:
-        pass
-    print("📧 Email sent via SendGrid (no exception)")
-except Exception as e:
-    print("❌ SendGrid error:", repr(e))
\ No newline at end of file
+
+
+# ====== MAIN ======
+def main(argv) -> tuple:
+    """argv: [DD.MM.YYYY, DD.MM.YYYY, recipient@email.com]. Returns (file name, PDF bytes)."""
+    if len(argv) < 3:
+        print("❌ Usage: python make_saderiba_pdf.py DD.MM.YYYY DD.MM.YYYY recipient@email.com")
+        sys.exit(1)
+
+    date_you = argv[0]
+    date_partner = argv[1]
+    recipient_email = argv[2]
+
+    filename = f"SADERIBA_{date_you.replace('.', '')}_{date_partner.replace('.', '')}.pdf"
+    pdf = build_pdf(date_you, date_partner)
+
+    # === SENDGRID EMAIL SEND ===
+    send_pdf_email(recipient_email, pdf, filename, EMAIL_SUBJECT, EMAIL_HTML)
+    return filename, pdf
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--plan"]:
+        # python make_saderiba_pdf.py --plan DD.MM.YYYY DD.MM.YYYY → pages + URLs as JSON, nothing is downloaded
+        report_plan.dry_run(plan_pages, sys.argv[2:4])
+    else:
+        report_events.startup()
+        write_pdf(*main(sys.argv[1:]))
@@ -0,0 +1,318 @@
+# numerology.py
+# All report numbers in one place, ported 1:1 from the TS that draws the images:
+#   lib/starMath.ts (calcStarNumbers), lib/star.ts (calcStar),
+#   lib/triangles/*.ts (calc*Numbers) and /api/star/saderibasum (format=json).
+# The generators take their slide numbers from here, so the slides always match the
+# PNG the API renders — no HTTP round trip just to read numbers.
+#
+# Triangles are returned as OrderedDict(top, right, left, mr, ml, mb):
+#   right = bottomRight, left = bottomLeft, mr/ml/mb = midRight/midLeft/midBottom in TS.
+#
+# The generators go through triangle() / misija() / star_outer(): those read the
+# precomputed numerology_table.bin (build_numerology_table.py) when it exists and
+# fall back to the functions below for dates outside it.
+#
+# Parity check against a running Next app (every route answers ?format=json):
+#   python numerology.py --api http://localhost:3000 [--from 1900 --to 2100 --step 7]
+# The TS answers are kept in tests/numerology_ts.json, which tests/test_numerology_parity.py
+# checks without a server. Regenerate it after changing the TS math, with the app started as
+# NUMEROLOGY_TABLE=/nonexistent (so the routes compute instead of reading the table built here):
+#   python numerology.py --api http://localhost:3000 --step 97 --write tests/numerology_ts.json
+
+import os, re, sys, json
+from collections import OrderedDict
+import numerology_table
+
+
+# =========================
+# BASICS
+# =========================
+def digit_sum(n: int) -> int:
+    return sum(int(ch) for ch in str(n))
+
+def reduce22(n: int) -> int:
+    # сводим к числу ≤22, суммируя цифры
+    while n > 22:
+        n = digit_sum(n)
+    return n
+
+def year_reduced(y: int) -> int:
+    return reduce22(digit_sum(y))
+
+def parse_date(date: str):
+    """DD.MM.YYYY → (d, m, y), like `dateStr.split(".").map(Number)` in the triangles."""
+    d, m, y = map(int, date.strip().split("."))
+    return d, m, y
+
+def parse_birth(date: str):
+    """starMath.ts parseBirth: YYYY-MM-DD, DD.MM.YYYY, DD/MM/YYYY, YYYY.MM.DD..."""
+    s = date.strip()
+    if len(s) == 10 and s[4] == "-" and s[7] == "-":
+        y, m, d = map(int, s.split("-"))
+        return d, m, y
+    a, b, c = map(int, s.replace("-", ".").replace("/", ".").split("."))
+    if a > 31:
+        return c, b, a
+    return a, b, c
+
+def _tri(top, right, left, mr, ml, mb):
+    return OrderedDict(top=top, right=right, left=left, mr=mr, ml=ml, mb=mb)
+
+
+# =========================
+# TRIANGLES (lib/triangles/*.ts)
+# =========================
+def personiba_numbers(d: int, m: int, y: int):
+    """trianglePersoniba.ts: month is NOT reduced."""
+    d1 = reduce22(d)
+    yR = year_reduced(y)
+    top = d1
+    right = reduce22(d1 + m)
+    a4 = reduce22(d1 + m + yR)
+    a5 = reduce22(d1 + m + yR + a4)
+    left = reduce22(d1 + a5)
+    return _tri(top, right, left, reduce22(top + right), reduce22(top + left), reduce22(right + left))
+
+def berns_numbers(d: int, m: int, y: int):
+    """trianglePersonibaBerns.ts: bottomRight uses the raw day (d + m)."""
+    top = reduce22(d)
+    right = reduce22(d + m)
+    a1, a2, a3 = reduce22(d), reduce22(m), year_reduced(y)
+    a4 = reduce22(a1 + a2 + a3)
+    a5 = reduce22(a1 + a2 + a3 + a4)
+    left = reduce22(a1 + a5)
+    return _tri(top, right, left, reduce22(top + right), reduce22(top + left), reduce22(right + left))
+
+def dzimta_numbers(d: int, m: int, y: int):
+    """triangleDzimta.ts"""
+    d1, mR, yR = reduce22(d), reduce22(m), year_reduced(y)
+    top = mR
+    right = reduce22(mR + yR)
+    left = reduce22(d1 + mR)
+    return _tri(top, right, left, reduce22(top + right), reduce22(top + left), reduce22(right + left))
+
+def finanses_numbers(d: int, m: int, y: int):
+    """triangleFinanses.ts"""
+    d1, mR, yR = reduce22(d), reduce22(m), year_reduced(y)
+    inner = reduce22(d1 + mR + yR)
+    top = yR
+    right = reduce22(yR + inner)
+    left = reduce22(yR + mR)
+    return _tri(top, right, left, reduce22(yR + right), reduce22(yR + left), reduce22(right + left))
+
+def attiecibas_numbers(d: int, m: int, y: int):
+    """triangleAttiecibas.ts / triangleAttiecibasSaderiba.ts (same math)."""
+    d1 = reduce22(d)
+    y_sum = digit_sum(y)
+    yR = reduce22(y_sum)
+    top = reduce22(d1 + m + yR)
+    combo = reduce22(d + m + y_sum + top)
+    right = reduce22(top + combo)
+    left = reduce22(top + yR)
+    return _tri(top, right, left, reduce22(top + right), reduce22(top + left), reduce22(right + left))
+
+def veseliba_numbers(d: int, m: int, y: int):
+    """triangleVeseliba.ts"""
+    d1, mR, yR = reduce22(d), reduce22(m), year_reduced(y)
+    base = reduce22(d1 + mR + yR)
+    top = reduce22(d1 + mR + yR + base)
+    right = reduce22(top + d1)
+    left = reduce22(top + base)
+    return _tri(top, right, left, reduce22(top + right), reduce22(top + left), reduce22(right + left))
+
+def misija_numbers(d: int, m: int, y: int):
+    """numbersMisija.ts → (first, second, third)"""
+    n1, n2, n3 = reduce22(d), m, year_reduced(y)
+    n4 = reduce22(n1 + n2 + n3)
+    n5 = reduce22(n1 + n2 + n3 + n4)
+    n6 = reduce22(n1 + n2 + n3 + n4 + n5)
+    n7, n8, n9, n10, n11 = (reduce22(n1 + n2), reduce22(n2 + n3), reduce22(n3 + n4),
+                            reduce22(n4 + n5), reduce22(n5 + n1))
+    first = n6
+    second = reduce22(n7 + n8 + n9 + n10 + n11)
+    return first, second, reduce22(first + second)
+
+# route name → calc, for the parity check and anything keyed by API path
+TRIANGLES = {
+    "personiba": personiba_numbers,
+    "berns": berns_numbers,
+    "dzimta": dzimta_numbers,
+    "finanses": finanses_numbers,
+    "attiecibas": attiecibas_numbers,
+    "saderiba": attiecibas_numbers,
+    "veseliba": veseliba_numbers,
+}
+
+
+# =========================
+# STAR (lib/starMath.ts, lib/star.ts)
+# =========================
+def star_numbers(date: str) -> dict:
+    """starMath.ts calcStarNumbers — what /api/star, /star/berns, /star/saderiba draw."""
+    d, m, y = parse_birth(date)
+    n1 = reduce22(d) if d > 22 else d
+    n2 = m
+    n3 = year_reduced(y)
+    n4 = reduce22(n1 + n2 + n3)
+    n5 = reduce22(n1 + n2 + n3 + n4)
+
+    n7 = reduce22(n1 + n2)
+    n9 = reduce22(n2 + n3)
+    n6 = reduce22(n1 + n7)
+    n8 = reduce22(n7 + n9)
+    n10 = reduce22(n9 + n3)
+    n11 = reduce22(n1 + n2 + n3 + n4 + n5)
+
+    n20 = reduce22(n1 + n5)
+    n23 = reduce22(n4 + n5)
+    n26 = reduce22(n3 + n4)
+
+    return {
+        "outer": {"left1": n1, "top9": n2, "right6": n3, "br16": n4, "bl5": n5},
+        "chakras": [n6, n7, n8, n9, n10],
+        "center": n11,
+        "all": {
+            12: reduce22(n7 + n2),
+            13: reduce22(n2 + n9),
+            15: reduce22(n9 + n26),
+            16: reduce22(n23 + n26),
+            17: reduce22(n20 + n23),
+            18: reduce22(n7 + n20),
+            19: reduce22(n1 + n20),
+            20: n20,
+            21: reduce22(n5 + n20),
+            22: reduce22(n5 + n23),
+            23: n23,
+            24: reduce22(n4 + n23),
+            25: reduce22(n4 + n26),
+            26: n26,
+            27: reduce22(n3 + n26),
+        },
+    }
+
+def star_calc(date: str) -> dict:
+    """star.ts calcStar — positions 1..26 (strict DD.MM.YYYY)."""
+    if not re.fullmatch(r"\d{2}\.\d{2}\.\d{4}", date.strip()):
+        raise ValueError("Nepareizs datuma formāts. Izmanto dd.mm.gggg")
+    d, m, y = parse_date(date)
+    if not 1 <= m <= 12:
+        raise ValueError("Nepareizs mēnesis")
+    if not 1 <= d <= 31:
+        raise ValueError("Nepareiza diena")
+
+    def sr(*vals):
+        return reduce22(sum(vals))
+
+    n = {1: d if d <= 22 else reduce22(d), 2: m, 3: year_reduced(y)}
+    n[4] = sr(n[1], n[2], n[3])
+    n[5] = sr(n[1], n[2], n[3], n[4])
+    n[6] = sr(n[1], n[2], n[3], n[4], n[5])
+    n[7], n[8], n[9], n[10], n[11] = sr(n[1], n[2]), sr(n[2], n[3]), sr(n[3], n[4]), sr(n[4], n[5]), sr(n[5], n[1])
+    for k, (a, b) in enumerate([(1, 7), (1, 11), (7, 11), (7, 2), (8, 2), (7, 8), (3, 8), (3, 9),
+                                (8, 9), (4, 9), (4, 10), (9, 10), (5, 10), (5, 11), (11, 10)], start=12):
+        n[k] = sr(n[a], n[b])
+    return n
+
+def saderiba_sum(date_a: str, date_b: str) -> dict:
+    """/api/star/saderibasum?format=json — raw (unreduced) sums of both outer stars."""
+    a, b = star_outer(date_a), star_outer(date_b)
+    return {
+        "top": a["top9"] + b["top9"],
+        "ml": a["left1"] + b["left1"],
+        "mr": a["right6"] + b["right6"],
+        "br": a["br16"] + b["br16"],
+        "bl": a["bl5"] + b["bl5"],
+    }
+
+
+# =========================
+# LOOKUPS (precomputed table first)
+# =========================
+def triangle(name: str, d: int, m: int, y: int):
+    t = numerology_table.table()
+    nums = t.triangle(name, d, m, y) if t else None
+    return nums if nums is not None else TRIANGLES[name](d, m, y)
+
+def misija(d: int, m: int, y: int):
+    t = numerology_table.table()
+    nums = t.misija(d, m, y) if t else None
+    return nums if nums is not None else misija_numbers(d, m, y)
+
+def star_outer(date: str) -> dict:
+    t = numerology_table.table()
+    nums = t.star_outer(*parse_birth(date)) if t else None
+    return nums if nums is not None else star_numbers(date)["outer"]
+
+
+# =========================
+# PARITY CHECK (against the TS routes)
+# =========================
+TS_KEYS = {"top": "top", "right": "bottomRight", "left": "bottomLeft",
+           "mr": "midRight", "ml": "midLeft", "mb": "midBottom"}
+
+def _star_json(nums: dict) -> dict:
+    # JSON object keys are strings on the TS side
+    return {**nums, "all": {str(k): v for k, v in nums["all"].items()}}
+
+PARITY_PARTNER = "29.12.1987"
+PARITY_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "numerology_ts.json")
+
+def parity_cases(date: str, partner: str):
+    """(name, path, expected JSON) for every numbers endpoint of one date."""
+    d, m, y = parse_date(date)
+    for name, fn in TRIANGLES.items():
+        nums = fn(d, m, y)
+        yield name, f"/api/triangle/{name}?date={date}&format=json", {TS_KEYS[k]: v for k, v in nums.items()}
+    first, second, third = misija_numbers(d, m, y)
+    yield "misija", f"/api/triangle/misija?date={date}&format=json", {"first": first, "second": second, "third": third}
+    yield "star", f"/api/star?date={date}&format=json", _star_json(star_numbers(date))
+    yield "saderibasum", f"/api/star/saderibasum?dateA={date}&dateB={partner}&format=json", saderiba_sum(date, partner)
+
+def load_fixture(path: str = PARITY_FIXTURE) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def write_fixture(path: str, answers: dict, partner: str, args: str):
+    """answers: {date: {case name: TS JSON}} → the fixture, one date per line."""
+    lines = [json.dumps(date) + ": " + json.dumps(cases, separators=(",", ":")) for date, cases in answers.items()]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"source": "lib/starMath.ts + lib/triangles/*.ts via the ?format=json routes",\n')
+        f.write(f' "regenerate": {json.dumps(f"python numerology.py --api APP {args} --write FIXTURE")},\n')
+        f.write(f' "partner": {json.dumps(partner)},\n')
+        f.write(' "dates": {\n' + ",\n".join(lines) + "\n}}\n")
+
+def check_parity(api_base: str, year_from: int, year_to: int, step: int, write: str = None) -> int:
+    """Compare with the running app; `write`: also save its answers as the test fixture."""
+    from datetime import date as _date, timedelta
+    from report_http import http_get
+
+    day, end = _date(year_from, 1, 1), _date(year_to, 12, 31)
+    checked, failed = 0, 0
+    answers = {}
+    while day <= end:
+        ds = day.strftime("%d.%m.%Y")
+        for name, path, expected in parity_cases(ds, PARITY_PARTNER):
+            got = http_get(api_base + path).json()
+            answers.setdefault(ds, {})[name] = got
+            checked += 1
+            if got != expected:
+                failed += 1
+                print(f"❌ {path}\n   ts: {got}\n   py: {expected}")
+        day += timedelta(days=step)
+    print(f"{'✅' if not failed else '❌'} parity: {checked - failed}/{checked} match")
+    if write:
+        write_fixture(write, answers, PARITY_PARTNER, f"--from {year_from} --to {year_to} --step {step}")
+        print(f"💾 {len(answers)} dates → {write}")
+    return failed
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Compare numerology.py with the TS routes")
+    ap.add_argument("--api", default="http://localhost:3000")
+    ap.add_argument("--from", dest="year_from", type=int, default=1900)
+    ap.add_argument("--to", dest="year_to", type=int, default=2100)
+    ap.add_argument("--step", type=int, default=7, help="days between checked dates")
+    ap.add_argument("--write", metavar="FIXTURE", help="save the TS answers (e.g. tests/numerology_ts.json)")
+    opts = ap.parse_args()
+    sys.exit(1 if check_parity(opts.api, opts.year_from, opts.year_to, opts.step, opts.write) else 0)
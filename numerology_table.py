@@ -0,0 +1,135 @@
+# numerology_table.py
+# Reader for numerology_table.bin — every number of every birthdate 1900..2100,
+# precomputed by build_numerology_table.py. The file is memory-mapped, so opening it
+# is instant and forked worker processes share the same pages.
+#
+# File layout (little-endian):
+#   0   8s   magic b"NUMTAB01"
+#   8   H    first year
+#   10  H    last year
+#   12  I    rows (one per calendar day, first_year-01-01 = row 0)
+#   16  H    row size in bytes (one uint8 per column)
+#   18  H    length of the column-name block
+#   20  ...  column names, utf-8, "\n"-separated
+#   DATA_ALIGN-aligned: rows × row size uint8
+#
+# lib/numerologyTable.ts reads the same file for the Next routes.
+
+import os, mmap, struct, threading
+from collections import OrderedDict
+from datetime import date
+
+TABLE_PATH = os.getenv("NUMEROLOGY_TABLE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "numerology_table.bin"))
+
+MAGIC = b"NUMTAB01"
+HEADER = struct.Struct("<8sHHIHH")
+DATA_ALIGN = 16
+
+TRIANGLE_KEYS = ("top", "right", "left", "mr", "ml", "mb")
+# saderiba uses the attiecibas math, so it is not stored twice
+TRIANGLE_NAMES = ("personiba", "berns", "dzimta", "finanses", "attiecibas", "veseliba")
+STAR_OUTER = ("left1", "top9", "right6", "br16", "bl5")
+STAR_ALL = (12, 13, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27)
+
+# Column order of a row. Changing it means rebuilding the table (the names are in the header).
+COLUMNS = (
+    [f"calc{i}" for i in range(1, 27)]                           # star.ts calcStar 1..26
+    + [f"star_{k}" for k in STAR_OUTER]                           # starMath.ts outer
+    + [f"star_ch{i}" for i in range(6, 11)]                       #   chakras 6..10
+    + ["star_center"]                                             #   center (11)
+    + [f"star_{i}" for i in STAR_ALL]                             #   all 12..27
+    + [f"{t}_{k}" for t in TRIANGLE_NAMES for k in TRIANGLE_KEYS] # lib/triangles/*
+    + ["misija_first", "misija_second", "misija_third"]           # numbersMisija.ts
+)
+
+
+def data_offset(names_len: int) -> int:
+    end = HEADER.size + names_len
+    return (end + DATA_ALIGN - 1) // DATA_ALIGN * DATA_ALIGN
+
+
+class NumerologyTable:
+    def __init__(self, path: str = TABLE_PATH):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.first_year, self.last_year, self.rows, self.row_size, names_len = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a numerology table")
+        names = bytes(self._mm[HEADER.size:HEADER.size + names_len]).decode().split("\n")
+        self.col = {name: i for i, name in enumerate(names)}
+        self._offset = data_offset(names_len)
+        self._epoch = date(self.first_year, 1, 1).toordinal()
+
+    # ---------- index ----------
+    def day_number(self, d: int, m: int, y: int):
+        """Row of a date, or None if it's not a real date inside the table."""
+        if not self.first_year <= y <= self.last_year:
+            return None
+        try:
+            return date(y, m, d).toordinal() - self._epoch
+        except ValueError:
+            return None
+
+    def row(self, d: int, m: int, y: int):
+        """Raw uint8 row for a date (index with self.col[name]), or None."""
+        n = self.day_number(d, m, y)
+        if n is None:
+            return None
+        start = self._offset + n * self.row_size
+        return self._mm[start:start + self.row_size]
+
+    # ---------- typed lookups ----------
+    def triangle(self, name: str, d: int, m: int, y: int):
+        r = self.row(d, m, y)
+        if r is None:
+            return None
+        if name == "saderiba":
+            name = "attiecibas"
+        return OrderedDict((k, r[self.col[f"{name}_{k}"]]) for k in TRIANGLE_KEYS)
+
+    def misija(self, d: int, m: int, y: int):
+        r = self.row(d, m, y)
+        if r is None:
+            return None
+        return r[self.col["misija_first"]], r[self.col["misija_second"]], r[self.col["misija_third"]]
+
+    def star_outer(self, d: int, m: int, y: int):
+        r = self.row(d, m, y)
+        if r is None:
+            return None
+        return {k: r[self.col[f"star_{k}"]] for k in STAR_OUTER}
+
+    # ---------- bulk ----------
+    def array(self):
+        """Whole table as a (rows, columns) uint8 NumPy view over the mmap — for analytics."""
+        import numpy as np
+        return np.frombuffer(self._mm, dtype=np.uint8, count=self.rows * self.row_size,
+                             offset=self._offset).reshape(self.rows, self.row_size)
+
+
+_table = None
+_table_lock = threading.Lock()
+
+def table():
+    """Process-wide table, or None if numerology_table.bin hasn't been built."""
+    global _table
+    with _table_lock:
+        if _table is None and os.path.exists(TABLE_PATH):
+            try:
+                _table = NumerologyTable(TABLE_PATH)
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Numerology table unusable, computing numbers instead: {e}")
+                _table = False
+    return _table or None
+
+
+if __name__ == "__main__":
+    # python numerology_table.py [DD.MM.YYYY]  → table info, or one row
+    import sys, json
+    t = NumerologyTable()
+    if len(sys.argv) > 1:
+        d, m, y = map(int, sys.argv[1].split("."))
+        r = t.row(d, m, y)
+        print(json.dumps({name: r[i] for name, i in t.col.items()} if r else None, indent=2))
+    else:
+        print(f"{TABLE_PATH}: {t.first_year}..{t.last_year}, {t.rows} rows × {t.row_size} bytes")
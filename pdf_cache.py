@@ -0,0 +1,243 @@
+# pdf_cache.py
+# Finished PDFs (every report is a pure function of its inputs and the slides; gada's month
+# variants are seeded), so a re-order, a support re-send or a test purchase skips rendering
+# and goes straight to email.
+#
+# Key: sha256 of (report, normalized inputs, manifest version). The version hashes
+#   - the resolved plan: every page with its asset URLs and params (numerology + manifest;
+#     gada's slide URLs come from its image tables, so a table edit changes the plan too)
+#   - the ETag of every storage slide in it, from the storage index listing (storage_index.py)
+#   - the generator code (make_*_pdf.py, report_common.py, report_plan.py), the reportlab
+#     version and settings (RL_invariant, REPORT_STREAMING) and PDF_CACHE_VERSION (bump it
+#     when the render API's stars / triangles change: those are only known by URL)
+# A slide edited in the bucket gets a new ETag, so a new key; the old PDF ages out.
+# If any slide's ETag is unknown (listing failed, STORAGE_INDEX=0) the report is rendered
+# and not stored.
+#
+# PDFs live in ASSET_CACHE_DIR/pdfs with an SQLite index next to the asset cache. Total size
+# is capped (PDF_CACHE_MAX_MB), least recently used go first. PDF_CACHE=0 turns it off.
+# On a miss, one process renders a key at a time (flock on a .lock file next to the PDF):
+# the same order for two emails, or a batch run next to the worker, waits and reads it.
+# Lock files are empty and are never deleted (eviction only removes the PDF).
+#
+# python3 pdf_cache.py  → print cache stats
+
+import os, glob, json, time, fcntl, sqlite3, hashlib, threading
+from contextlib import contextmanager
+from datetime import datetime
+import reportlab
+from reportlab import rl_config
+from asset_cache import CACHE_DIR
+from report_http import STORAGE_PREFIX, STREAMING
+import storage_index
+import report_events
+
+MAX_BYTES = int(float(os.getenv("PDF_CACHE_MAX_MB", "512")) * 1024 * 1024)
+ENABLED = os.getenv("PDF_CACHE", "1") != "0"
+VERSION = os.getenv("PDF_CACHE_VERSION", "")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CODE_FILES = ("make_*_pdf.py", "report_common.py", "report_plan.py")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pdfs (
+    key TEXT PRIMARY KEY,
+    report TEXT NOT NULL,
+    inputs TEXT NOT NULL,   -- JSON list, normalized
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS pdfs_lru ON pdfs(last_used);
+"""
+
+
+# =========================
+# KEY
+# =========================
+_code_version = None
+
+def code_version() -> str:
+    """Hash of the generator sources and reportlab version / settings (once per process)."""
+    global _code_version
+    if _code_version is None:
+        h = hashlib.sha256(f"{reportlab.Version} invariant={rl_config.invariant} streaming={STREAMING} {VERSION}".encode())
+        for path in sorted(p for pattern in CODE_FILES for p in glob.glob(os.path.join(HERE, pattern))):
+            with open(path, "rb") as f:
+                h.update(os.path.basename(path).encode() + b"\0" + f.read())
+        _code_version = h.hexdigest()
+    return _code_version
+
+
+def manifest_version(report_plan):
+    """Version of everything the plan draws, or None when a slide's ETag isn't known."""
+    storage = [url for url in report_plan.assets if STORAGE_PREFIX in url]
+    etags = storage_index.versions(storage) if storage else {}
+    if any(not etags.get(url) for url in storage):
+        return None
+    h = hashlib.sha256(code_version().encode())
+    h.update(json.dumps([report_plan.ops, etags], sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def normalize(value) -> str:
+    """Dates as DD.MM.YYYY (1.2.1990 → 01.02.1990), everything else stripped."""
+    value = str(value).strip()
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").strftime("%d.%m.%Y")
+    except ValueError:
+        return value
+
+
+def cache_key(report: str, inputs: list, version: str) -> str:
+    return hashlib.sha256(json.dumps([report, inputs, version]).encode()).hexdigest()
+
+
+# =========================
+# CACHE
+# =========================
+class PdfCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "pdfs"), exist_ok=True)
+        with self._db() as db:
+            db.executescript(SCHEMA)
+
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(os.path.join(self.root, "pdf_cache.sqlite"), timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def _path(self, key: str, ext: str = ".pdf") -> str:
+        return os.path.join(self.root, "pdfs", key[:2], key + ext)
+
+    @contextmanager
+    def rendering(self, key: str):
+        """Exclusive across processes for this key while it is rendered and stored."""
+        path = self._path(key, ".lock")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def get(self, key: str):
+        """The PDF bytes, or None."""
+        if not self._db().execute("SELECT 1 FROM pdfs WHERE key = ?", (key,)).fetchone():
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                pdf = f.read()
+        except FileNotFoundError:
+            with self._db() as db:
+                db.execute("DELETE FROM pdfs WHERE key = ?", (key,))
+            return None
+        with self._db() as db:
+            db.execute("UPDATE pdfs SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+        return pdf
+
+    def put(self, key: str, report: str, inputs: list, pdf: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(pdf)
+        os.replace(tmp, path)
+        now = time.time()
+        with self._db() as db:
+            db.execute(
+                "INSERT INTO pdfs(key, report, inputs, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET size = excluded.size, last_used = excluded.last_used",
+                (key, report, json.dumps(inputs, ensure_ascii=False), len(pdf), now, now),
+            )
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used PDFs until under max_bytes."""
+        db = self._db()
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM pdfs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        with db:
+            for key, size in db.execute("SELECT key, size FROM pdfs ORDER BY last_used").fetchall():
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM pdfs WHERE key = ?", (key,))
+                # the .lock stays: a process may hold or wait on it, and a new file at that
+                # path would let a second render of the key in at the same time
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def stats(self) -> dict:
+        db = self._db()
+        pdfs, size, hits = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(hits), 0) FROM pdfs"
+        ).fetchone()
+        by_report = dict(db.execute("SELECT report, COUNT(*) FROM pdfs GROUP BY report").fetchall())
+        return {"pdfs": pdfs, "bytes": size, "hits": hits, "max_bytes": self.max_bytes, "reports": by_report}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def pdf_cache():
+    """Process-wide cache, or None when PDF_CACHE=0."""
+    global _cache
+    if not ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PdfCache()
+    return _cache
+
+
+def cached(report_plan, render, report: str, *inputs) -> bytes:
+    """The PDF for this plan from the cache, or render() it and store it.
+
+    A render that left pages out (report_plan.dropped) is returned but not stored.
+    """
+    cache = pdf_cache()
+    key = None
+    with report_events.stage("pdf_cache", cache="off") as ev:
+        if cache:
+            version = manifest_version(report_plan)
+            ev["cache"] = "unversioned"
+            if version:
+                inputs = [normalize(v) for v in inputs]
+                key = cache_key(report, inputs, version)
+                pdf = cache.get(key)
+                ev["cache"] = "miss" if pdf is None else "hit"
+    if key and pdf is not None:
+        print(f"♻️ PDF from cache: {len(pdf) // 1024} KB")
+        return pdf
+    if not key:
+        return render()
+
+    with cache.rendering(key):
+        pdf = cache.get(key)  # rendered by another process while this one waited
+        if pdf is not None:
+            print(f"♻️ PDF from cache (rendered by a concurrent job): {len(pdf) // 1024} KB")
+            return pdf
+        pdf = render()
+        if report_plan.dropped:
+            # the key stands for every page of the plan; this PDF is short of some
+            print(f"⚠️ PDF not cached: {len(report_plan.dropped)} slide(s) not found while rendering")
+        else:
+            cache.put(key, report, inputs, pdf)
+    return pdf
+
+
+if __name__ == "__main__":
+    # python pdf_cache.py  → print cache stats
+    print(json.dumps(PdfCache().stats(), indent=2))
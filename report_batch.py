@@ -0,0 +1,143 @@
+# report_batch.py
+# Batch report generation: a JSONL file of orders → a process pool → one JSONL result per order.
+# For re-sending a backlog after an outage, or regenerating PDFs after slides change.
+#
+# Usage: python3 report_batch.py orders.jsonl [--procs N] [--out results.jsonl]
+#                                [--pdf-dir DIR] [--no-email]
+#
+# Input, one object per line (same fields as the Stripe metadata):
+#   {"report": "personiba", "date": "DD.MM.YYYY", "email": "..."}
+#   {"report": "saderiba", "date": "...", "partner": "DD.MM.YYYY", "email": "..."}
+#   {"report": "gada", "date": "...", "year": 2026, "email": "..."}       (+ "seed": another month-variant pick)
+# Output, one object per line in completion order ("line" points back to the input):
+#   {"line": 3, "report": "gada", "ok": true, "pdf": "GADA_...pdf", "bytes": 81234, "ms": 812,
+#    "peak_rss_mb": 61.4, "error": null}
+#   (failed orders also carry the tail of the generator's output)
+#
+# The parent imports everything once and forks the pool (like report_worker.py), so each
+# process starts warm; slides come from the shared on-disk asset cache (asset_cache.py).
+
+import os, sys, json, time, argparse
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import report_jobs
+
+_pdf_dir = None
+
+
+def parse_order(line: str) -> tuple:
+    """JSONL line → (report, argv). Raises ValueError on a bad order."""
+    order = json.loads(line)
+    report = order.get("report")
+    if report not in report_jobs.REPORT_MODULES:
+        raise ValueError(f"unknown report {report!r}")
+    if not order.get("date") or not order.get("email"):
+        raise ValueError("date and email are required")
+    if report == "saderiba" and not order.get("partner"):
+        raise ValueError("saderiba needs partner")
+    if report == "gada" and not order.get("year"):
+        raise ValueError("gada needs year")
+    args = report_jobs.report_args(
+        report, order["date"], order.get("partner", ""), order.get("year", ""), order["email"],
+        order.get("seed", ""),
+    )
+    return report, args
+
+
+def run_order(report: str, args: list) -> dict:
+    """Pool task: run one report, optionally keep the PDF; stdout stays in the child."""
+    result = report_jobs.run_report(report, args, want_pdf=_pdf_dir is not None)
+    data = result.pop("pdf_data", None)
+    if data and _pdf_dir:
+        path = os.path.join(_pdf_dir, result["pdf"])
+        tmp = f"{path}.{os.getpid()}.tmp"  # two orders for the same file may finish at once
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        result["pdf"] = path
+    result.pop("http", None)
+    return result
+
+
+def init_child(pdf_dir):
+    global _pdf_dir
+    _pdf_dir = pdf_dir
+    with redirect_stdout(sys.stderr):
+        report_jobs.warm()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Generate reports from a JSONL file of orders")
+    ap.add_argument("orders", help="JSONL file, or - for stdin")
+    ap.add_argument("--procs", type=int, default=os.cpu_count() or 2)
+    ap.add_argument("--out", help="results JSONL (default: stdout)")
+    ap.add_argument("--pdf-dir", help="also write every PDF here")
+    ap.add_argument("--no-email", action="store_true", help="build PDFs only, do not send emails")
+    opts = ap.parse_args(argv)
+
+    if opts.no_email:
+        os.environ["REPORT_SEND_EMAIL"] = "0"  # read by send_pdf_email in the children
+    if opts.pdf_dir:
+        os.makedirs(opts.pdf_dir, exist_ok=True)
+
+    src = sys.stdin if opts.orders == "-" else open(opts.orders, encoding="utf-8")
+    out = open(opts.out, "w", encoding="utf-8") if opts.out else sys.stdout
+
+    def emit(row: dict):
+        out.write(json.dumps(row, ensure_ascii=False) + "\n")
+        out.flush()
+
+    t0 = time.perf_counter()
+    with redirect_stdout(sys.stderr):  # stdout may be the results stream
+        report_jobs.warm()  # children are forked from here, so they start warm
+    print(f"🔥 Warm in {time.perf_counter() - t0:.2f}s, {opts.procs} processes", file=sys.stderr)
+
+    ok = failed = 0
+    with src, ProcessPoolExecutor(max_workers=opts.procs, initializer=init_child, initargs=(opts.pdf_dir,)) as pool:
+        futures = {}
+        for n, line in enumerate(src, start=1):
+            if not line.strip():
+                continue
+            try:
+                report, args = parse_order(line)
+            except Exception as e:
+                failed += 1
+                emit({"line": n, "ok": False, "error": f"bad order: {e}"})
+                continue
+            futures[pool.submit(run_order, report, args)] = (n, report)
+
+        for fut in as_completed(futures):
+            n, report = futures[fut]
+            try:
+                result = fut.result()
+            except Exception as e:  # a child died
+                result = {"ok": False, "error": repr(e), "ms": 0}
+            ok += result["ok"]
+            failed += not result["ok"]
+            emit({
+                "line": n,
+                "report": report,
+                "ok": result["ok"],
+                "pdf": result.get("pdf"),
+                "bytes": result.get("bytes", 0),
+                "ms": result.get("ms", 0),
+                "peak_rss_mb": result.get("peak_rss_mb"),
+                "error": result.get("error"),
+                **({} if result["ok"] else {"output": result.get("output", "")[-2000:]}),
+            })
+
+    wall = time.perf_counter() - t0
+    total = ok + failed
+    print(
+        f"✅ {ok} ok, ❌ {failed} failed, {total} orders in {wall:.1f}s"
+        f" ({total / wall if wall else 0:.2f}/s, {opts.procs} processes)",
+        file=sys.stderr,
+    )
+    if out is not sys.stdout:
+        out.close()
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
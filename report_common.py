@@ -0,0 +1,250 @@
+# report_common.py
+# Shared setup for the make_*_pdf.py generators: env, font, Supabase client, SendGrid.
+# Everything here is loaded once per process, so a long-lived worker pays for it once.
+# The font, the clients and their packages (supabase is half a second of imports) load on
+# first use, not on import: a CLI run that hits the PDF cache, or never queries a table,
+# doesn't pay for them. report_jobs.warm() loads them up front in the worker.
+# PDFs are built in memory (bytes); only the CLI entry point writes them out (write_pdf).
+# REPORT_STREAMING=1 (bounded memory): image streams wait in a temp file until save, and
+# are stored binary instead of ASCII85 (a fifth smaller, in memory and in the PDF).
+
+import os, time, base64, tempfile
+import report_events
+from report_http import STREAMING
+from dotenv import load_dotenv
+from reportlab import rl_config
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase import pdfdoc
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+# =========================
+# ENV
+# =========================
+load_dotenv(".env.local")
+SUPABASE_URL = os.getenv("SUPABASE_URL") or os.getenv("NEXT_PUBLIC_SUPABASE_URL")
+SUPABASE_KEY = (
+    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    or os.getenv("SUPABASE_KEY")
+    or os.getenv("NEXT_PUBLIC_SUPABASE_ANON_KEY")
+)
+
+SENDGRID_FROM = os.getenv("SENDGRID_FROM", "info@parnumerologiju.lv")
+SENDGRID_FROM_NAME = os.getenv("SENDGRID_FROM_NAME", "Par Numeroloģiju")
+SENDGRID_REPLY_TO = os.getenv("SENDGRID_REPLY_TO", "info@parnumerologiju.lv")
+
+# CLI output directory; REPORT_PDF_FD (an inherited pipe, see lib/reportWorker.ts) wins over it
+PDF_DIR = os.getenv("REPORT_PDF_DIR", "/tmp")
+
+if STREAMING:
+    rl_config.useA85 = 0
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DejaVuSans.ttf")
+
+_sb = None
+_sg = None
+_mail_queue = None  # set in report_worker.py (use_mail_queue)
+
+
+# =========================
+# FONT & CLIENTS (cached per process)
+# =========================
+def register_font():
+    """Register DejaVu (Latvian letters) once; TTF parsing is the slow part."""
+    if "DejaVu" in pdfmetrics.getRegisteredFontNames():
+        return
+    pdfmetrics.registerFont(TTFont("DejaVu", FONT_PATH))
+
+def supabase_client():
+    """supabase.Client, created (and the package imported) on first call."""
+    global _sb
+    if _sb is None:
+        if not SUPABASE_URL or not SUPABASE_KEY:
+            raise SystemExit("❌ SUPABASE_URL / KEY are missing in .env.local")
+        from supabase import create_client
+        _sb = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _sb
+
+def sendgrid_client():
+    """SendGridAPIClient for the current SENDGRID_API_KEY, created on first call."""
+    global _sg
+    key = os.getenv("SENDGRID_API_KEY")
+    if not key:
+        raise SystemExit("❌ Missing SENDGRID_API_KEY environment variable")
+    if _sg is None or _sg.api_key != key:
+        from sendgrid import SendGridAPIClient
+        print("DEBUG: SENDGRID_KEY prefix:", key[:10])
+        _sg = SendGridAPIClient(key)
+    return _sg
+
+
+# =========================
+# CANVAS (timed drawImage / save)
+# =========================
+class EventCanvas(canvas.Canvas):
+    """reportlab Canvas that reports every drawImage and the final save as timing events.
+
+    The first canvas of a process registers the DejaVu font (Latvian letters).
+
+    Each ImageReader is drawn once in the generators, so its decoded pixels (a full-HD slide
+    is 6 MB of RGB, kept only to name the image object) are dropped right after drawImage
+    instead of waiting in reference cycles for a full gc. The PDF is byte-for-byte the same.
+    """
+
+    _spool = None
+
+    def __init__(self, *args, **kwargs):
+        register_font()
+        super().__init__(*args, **kwargs)
+
+    def drawImage(self, image, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return super().drawImage(image, *args, **kwargs)
+        finally:
+            report_events.emit("draw", report_events.since(t0), page=self.getPageNumber())
+            _release(image)
+            if STREAMING:
+                self._spool_images()
+
+    def _spool_images(self):
+        for obj in list(self._doc.idToObject.values()):
+            if type(obj) is pdfdoc.PDFImageXObject:  # new since the last drawImage (+ its soft mask)
+                if self._spool is None:
+                    self._spool = tempfile.TemporaryFile(prefix="astro-pdf-")
+                _SpooledImage.move(obj, self._spool)
+
+    def save(self):
+        try:
+            with report_events.stage("save", pages=self.getPageNumber() - 1) as ev:
+                super().save()
+                ev["peak_rss_mb"] = report_events.peak_rss_mb()
+        finally:
+            if self._spool is not None:
+                self._spool.close()
+
+
+class _SpooledImage(pdfdoc.PDFImageXObject):
+    """Image XObject whose stream is read back from the canvas spool file when the PDF is formatted."""
+
+    @classmethod
+    def move(cls, obj, spool):
+        data = obj.__dict__.pop("streamContent")
+        obj.__class__ = cls
+        obj._text = isinstance(data, str)
+        obj._spool, obj._offset = spool, spool.seek(0, os.SEEK_END)
+        obj._length = spool.write(data.encode("latin1") if obj._text else data)
+
+    @property
+    def streamContent(self):
+        self._spool.seek(self._offset)
+        data = self._spool.read(self._length)
+        return data.decode("latin1") if self._text else data
+
+
+def _release(reader):
+    for r in (reader, getattr(reader, "_dataA", None)):
+        if isinstance(r, ImageReader):
+            r._data = None
+            if r._image is not None:
+                r._image.close()
+
+
+# =========================
+# EMAIL
+# =========================
+def use_mail_queue(queue):
+    """report_worker.py: from now on (and in processes forked after this) emails go to this mail_queue.MailQueue."""
+    global _mail_queue
+    _mail_queue = queue
+
+
+def send_pdf_email(recipient_email: str, pdf: bytes, filename: str, subject: str, html_content: str):
+    """
+    Email the PDF bytes as `filename`. In the worker the message is queued (mail_queue.py) and
+    sent in the background, so the PDF is returned without waiting for SendGrid; otherwise it
+    is sent here. Errors are printed, not raised (Node reads stdout).
+    """
+    if os.getenv("REPORT_SEND_EMAIL", "1") == "0":
+        print(f"📧 Email to {recipient_email} skipped (REPORT_SEND_EMAIL=0)")
+        return
+    if _mail_queue is not None:
+        try:
+            mail_id = _mail_queue.enqueue(recipient_email, pdf, filename, subject, html_content)
+            print(f"📧 Email to {recipient_email} queued (mail {mail_id})")
+            return
+        except Exception as e:
+            print(f"⚠️ Mail queue unavailable ({e!r}), sending now")
+    deliver_pdf_email(recipient_email, pdf, filename, subject, html_content)
+
+
+def deliver_pdf_email(recipient_email: str, pdf: bytes, filename: str, subject: str, html_content: str) -> tuple:
+    """Send via SendGrid now. Returns (HTTP status or None, error or None)."""
+    print(f"📧 Sending email via SendGrid to: {recipient_email}")
+    sg = sendgrid_client()
+    from sendgrid.helpers.mail import (
+        Mail, Email, To, Attachment,
+        FileContent, FileName, FileType, Disposition
+    )
+
+    encoded_pdf = base64.b64encode(pdf).decode()
+
+    attachment = Attachment(
+        FileContent(encoded_pdf),
+        FileName(filename),
+        FileType("application/pdf"),
+        Disposition("attachment")
+    )
+
+    message = Mail(
+        from_email=Email(SENDGRID_FROM, SENDGRID_FROM_NAME),
+        to_emails=To(recipient_email),
+        subject=subject,
+        html_content=html_content,
+    )
+    message.reply_to = Email(SENDGRID_REPLY_TO)
+    message.attachment = attachment
+
+    t0 = time.perf_counter()
+    try:
+        response = sg.send(message)
+        report_events.emit("email", report_events.since(t0), status=response.status_code)
+        print(f"📧 SendGrid status: {response.status_code}")
+        try:
+            print(f"📧 SendGrid response body: {response.body}")
+        except Exception:
+            pass
+        print("📧 Email sent via SendGrid (no exception)")
+        return response.status_code, None
+    except Exception as e:
+        # печатаем ошибку в stdout, чтобы её увидел Node
+        status = getattr(e, "status_code", None)
+        report_events.emit("email", report_events.since(t0), status=status, error=True)
+        print("❌ SendGrid error:", repr(e))
+        return status, repr(e)
+
+
+# =========================
+# CLI OUTPUT
+# =========================
+def write_pdf(filename: str, pdf: bytes) -> str:
+    """
+    `python make_*_pdf.py ...` output: the bytes go to the REPORT_PDF_FD pipe when Node spawned us
+    (no temp file), otherwise to PDF_DIR/filename as before. Written via rename, so two orders
+    for the same birthdate never read each other's half-written file.
+    """
+    fd = os.getenv("REPORT_PDF_FD")
+    if fd:
+        with os.fdopen(int(fd), "wb") as f:
+            f.write(pdf)
+        print(f"✅ PDF sent to fd {fd}: {filename} ({len(pdf) // 1024} KB)")
+        return filename
+
+    path = os.path.join(PDF_DIR, filename)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, path)
+    print(f"✅ PDF saved: {path}")
+    return path
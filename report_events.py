@@ -0,0 +1,83 @@
+# report_events.py
+# Machine-readable timing events from the generators, next to the usual emoji prints.
+# One stdout line per event, EVENT_PREFIX + JSON:
+#   📊 {"stage": "fetch", "ms": 41.2, "url": "...", "bytes": 312345, "cache": "miss"}
+# lib/reportEvents.ts picks these lines out of the captured output and keeps per-stage
+# latency histograms (GET /api/report_stats). REPORT_EVENTS=0 turns them off.
+#
+# Stages:
+#   startup     imports + module setup of a CLI run (not emitted in the pre-warmed worker)
+#   numerology  numbers → page plan
+#   pdf_cache   finished-PDF cache lookup (pdf_cache.py): cache (hit | miss | unversioned | off)
+#   db          Supabase table queries
+#   index       storage existence index lookup (storage_index.py): folders
+#   fetch       one asset download: url, bytes, cache (hit | revalidated | miss | api | error)
+#   wait        time the drawing loop blocked on a download that wasn't ready yet
+#   draw        one drawImage: page
+#   save        c.save(): pages, peak_rss_mb (peak resident memory of the process so far)
+#   email       SendGrid send: status
+#
+# Import this module first in a generator, so `startup` covers the other imports.
+
+import os, sys, json, time, threading
+from contextlib import contextmanager
+
+EVENT_PREFIX = "📊 "
+ENABLED = os.getenv("REPORT_EVENTS", "1") != "0"
+
+_t0 = time.perf_counter()
+_lock = threading.Lock()
+
+
+def since(t0: float) -> float:
+    """Milliseconds since a perf_counter() value."""
+    return (time.perf_counter() - t0) * 1000
+
+
+def emit(stage: str, ms: float, **fields):
+    if not ENABLED:
+        return
+    line = EVENT_PREFIX + json.dumps({"stage": stage, "ms": round(ms, 2), **fields}, ensure_ascii=False)
+    with _lock:  # fetch threads emit too; one write per line keeps lines whole
+        sys.stdout.write(line + "\n")
+
+
+@contextmanager
+def stage(name: str, **fields):
+    """Time a block; fields added to the yielded dict inside the block go into the event."""
+    t0 = time.perf_counter()
+    extra = dict(fields)
+    try:
+        yield extra
+    except BaseException:
+        extra["error"] = True
+        raise
+    finally:
+        emit(name, since(t0), **extra)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process (since the last reset_peak_rss) in MB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    import resource  # not Linux: lifetime peak, in KB (bytes on macOS, close enough to see a trend)
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def reset_peak_rss():
+    """Start peak_rss_mb over from the current RSS (Linux), so a long-lived worker measures one job."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def startup():
+    """CLI entry: everything since this module was imported (imports, font, clients)."""
+    emit("startup", since(_t0))
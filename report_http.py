@@ -0,0 +1,215 @@
+# report_http.py
+# HTTP helpers for the PDF generators: one pooled keep-alive session per process,
+# GET (storage slides go through the on-disk asset cache) and a concurrent prefetch stage.
+# All downloads of a report start at once (bounded by FETCH_WORKERS), pages are
+# still drawn in their original order by asking for each URL when it's needed.
+# REPORT_STREAMING=1 (bounded memory) keeps at most PREFETCH_WINDOW slides downloaded
+# ahead of the page being drawn instead.
+
+import os, time, threading, requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from asset_cache import asset_cache
+import report_events
+
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+STREAMING = os.getenv("REPORT_STREAMING", "0") == "1"
+PREFETCH_WINDOW = int(os.getenv("PREFETCH_WINDOW", str(FETCH_WORKERS))) if STREAMING else None
+
+# Connection pool: per-host keep-alive connections, shared by all fetch threads
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "8"))
+POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", str(max(FETCH_WORKERS, 4))))
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+
+# static slides in the public bucket; API renders are per-date and not cached here
+STORAGE_PREFIX = "/storage/v1/object/public/"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+
+# =========================
+# SESSION
+# =========================
+def session() -> requests.Session:
+    """Process-wide pooled session (rebuilt after fork, sockets can't be shared)."""
+    global _session, _session_pid
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            retry = Retry(total=2, connect=2, backoff_factor=0.3,
+                          status_forcelist=(502, 503, 504), allowed_methods=("GET", "HEAD"))
+            adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_PER_HOST,
+                                  pool_block=True, max_retries=retry)
+            s = requests.Session()
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session, _session_pid = s, os.getpid()
+    return _session
+
+def http_get(url: str, headers=None, timeout=None) -> requests.Response:
+    return session().get(url, headers=headers, timeout=timeout or (CONNECT_TIMEOUT, READ_TIMEOUT))
+
+def session_stats() -> dict:
+    """Per-host requests vs. new connections; reuse = share of requests on a kept-alive socket."""
+    stats = {}
+    if _session is None or _session_pid != os.getpid():
+        return stats
+    for adapter in {id(a): a for a in _session.adapters.values()}.values():
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host = f"{pool.scheme}://{pool.host}:{pool.port}"
+            reqs, conns = pool.num_requests, pool.num_connections
+            stats[host] = {
+                "requests": reqs,
+                "connections": conns,
+                "reuse": round(1 - conns / reqs, 3) if reqs else 0.0,
+            }
+    return stats
+
+
+# =========================
+# GET
+# =========================
+def get(url: str) -> bytes:
+    t0 = time.perf_counter()
+    try:
+        data, cache_state = _fetch(url)
+    except Exception:
+        report_events.emit("fetch", report_events.since(t0), url=url, bytes=0, cache="error")
+        raise
+    report_events.emit("fetch", report_events.since(t0), url=url, bytes=len(data), cache=cache_state)
+    return data
+
+class NotFound(RuntimeError):
+    """The object isn't there: 404, or the 400 Storage answers for a missing key."""
+
+
+def _check(url: str, r):
+    if r.status_code in (400, 404):
+        raise NotFound(f"GET failed: {url} -> {r.status_code}")
+    if r.status_code != 200:
+        raise RuntimeError(f"GET failed: {url} -> {r.status_code}")
+
+def _fetch(url: str) -> tuple:
+    """(bytes, cache state) — state is api (not cached), hit, revalidated or miss."""
+    cache = asset_cache() if STORAGE_PREFIX in url else None
+    if cache is None:
+        r = http_get(url)
+        _check(url, r)
+        return r.content, "api"
+
+    entry = cache.lookup(url)
+    try:
+        if cache.is_fresh(entry):
+            return cache.read(url, entry), "hit"
+
+        # stale or unknown: conditional GET, so bucket edits still come through
+        headers = {"If-None-Match": entry[1]} if entry and entry[1] else {}
+        r = http_get(url, headers=headers)
+        if r.status_code == 304 and entry:
+            cache.revalidated(url)
+            return cache.read(url, entry), "revalidated"
+    except FileNotFoundError:
+        # blob evicted by another process in between
+        r = http_get(url)
+    _check(url, r)
+    cache.store(url, r.content, r.headers.get("ETag"))
+    return r.content, "miss"
+
+def try_get(url: str):
+    """GET for optional slides: None when the slide doesn't exist.
+
+    Only a not-found answer is a missing slide; a timeout, a reset or a 5xx raises
+    like get(), so a flaky bucket can't silently drop a page from a report.
+    """
+    try:
+        return get(url)
+    except NotFound:
+        print(f"⚠️  Skip missing: {url}")
+        return None
+
+# =========================
+# PREFETCH
+# =========================
+def _pool() -> ThreadPoolExecutor:
+    # created lazily, so forked worker processes each get their own threads
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+    return _executor
+
+
+class Prefetch:
+    """Downloads every URL in the background; `assets(url)` blocks until that one is ready.
+
+    Duplicate URLs are fetched once. URLs listed in `optional` yield None when not found.
+    With a window, only that many URLs are downloading or waiting unused at a time, the
+    next ones start as the drawing loop takes them (in the order they were added).
+    """
+
+    def __init__(self, urls=(), optional=(), window=None):
+        self._futures = {}
+        self._pending = {}  # url → fetch function, not started yet (window)
+        self._window = window
+        self._ahead = set()  # started, not asked for yet
+        self.add(urls, optional)
+
+    def add(self, urls=(), optional=()):
+        skippable = set(optional)
+        for url in list(urls) + list(optional):
+            if url not in self._futures and url not in self._pending:
+                self._pending[url] = try_get if url in skippable else get
+        self._start()
+        return self
+
+    def _start(self):
+        while self._pending and (self._window is None or len(self._ahead) < self._window):
+            url = next(iter(self._pending))
+            self._futures[url] = _pool().submit(self._pending.pop(url), url)
+            self._ahead.add(url)
+
+    def __call__(self, url: str):
+        fut = self._futures.get(url)
+        if fut is None:
+            # behind the window, or not planned up front — fetch it now
+            fut = self._futures[url] = _pool().submit(self._pending.pop(url, get), url)
+        if url in self._ahead:
+            self._ahead.discard(url)
+            self._start()
+        if fut.done():
+            return fut.result()
+        t0 = time.perf_counter()
+        try:
+            return fut.result()
+        finally:
+            report_events.emit("wait", report_events.since(t0), url=url)
+
+    def release(self, url: str):
+        """Drop a downloaded slide that no later page needs (asking again fetches it again)."""
+        self._futures.pop(url, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        # a failed report shouldn't keep downloading the rest of its slides
+        for fut in self._futures.values():
+            fut.cancel()
+        self._futures.clear()
+        self._pending.clear()
+        self._ahead.clear()
+        return False
+
+
+def prefetch(urls=(), optional=(), window=PREFETCH_WINDOW) -> Prefetch:
+    return Prefetch(urls, optional, window)
@@ -0,0 +1,99 @@
+# report_jobs.py
+# Report type → generator module, and an in-process runner used by report_worker.py.
+# Mirrors the scriptMap / args switch in app/api/stripe_webhook/route.ts.
+
+import io, sys, time, importlib, traceback
+from contextlib import redirect_stdout
+import report_http
+import report_events
+import numerology_table
+
+REPORT_MODULES = {
+    "personiba": "make_personiba_pdf",
+    "finanses": "make_finanses_pdf",
+    "berns": "make_berns_pdf",
+    "saderiba": "make_saderiba_pdf",
+    "gada": "make_forecast_pdf_full",
+}
+
+
+def report_args(report: str, date: str, partner: str = "", year: str = "", email: str = "", seed: str = "") -> list:
+    """Build the generator argv for a report (same order as the CLI)."""
+    if report == "gada":
+        # make_forecast_pdf_full.py DD.MM.YYYY YEAR EMAIL [SEED]
+        return [date, str(year), email] + ([str(seed)] if seed else [])
+    if report == "saderiba":
+        # make_saderiba_pdf.py DATE1 DATE2 EMAIL
+        return [date, partner, email]
+    # personiba / finanses / berns: DATE EMAIL
+    return [date, email]
+
+
+def plan_args(report: str, args: list) -> list:
+    """report_args without the email: what the generator's plan_pages() takes."""
+    at = 2 if report in ("gada", "saderiba") else 1
+    return args[:at] + args[at + 1:]
+
+
+def warm():
+    """Import every generator once, then load what a CLI run loads lazily: font, sendgrid, supabase."""
+    for name in REPORT_MODULES.values():
+        importlib.import_module(name)
+    importlib.import_module("report_common").register_font()
+    importlib.import_module("sendgrid.helpers.mail")  # send_pdf_email imports it on first send
+    # mmap the numerology table before the pool forks, so the children share its pages
+    numerology_table.table()
+    # forecast image tables too (and the supabase client): every child starts with them loaded (TTL applies from here)
+    try:
+        importlib.import_module("make_forecast_pdf_full").forecast_tables()
+    except Exception as e:
+        print(f"⚠️ Forecast tables not preloaded: {e!r}", flush=True)
+
+
+def run_report(report: str, args: list, want_pdf: bool = False) -> dict:
+    """
+    Run one report in this process; stdout is captured and returned as `output`.
+    The PDF only exists in memory: `pdf` is its file name, `pdf_data` its bytes (when want_pdf).
+    `peak_rss_mb` is this process's peak memory during the run (what a pool process needs for it).
+    """
+    module_name = REPORT_MODULES.get(report)
+    if not module_name:
+        return {"ok": False, "error": f"Unknown report type: {report}", "output": "", "ms": 0}
+
+    buf = io.StringIO()
+    report_events.reset_peak_rss()
+    t0 = time.perf_counter()
+    pdf, data, error = None, None, None
+    with redirect_stdout(buf):
+        try:
+            module = importlib.import_module(module_name)
+            pdf, data = module.main(list(args))
+        except SystemExit as e:
+            error = f"exit: {e.code}"
+        except Exception as e:
+            traceback.print_exc(file=buf)
+            error = repr(e)
+
+    return {
+        "ok": error is None,
+        "pdf": pdf,
+        "bytes": len(data) if data else 0,
+        "pdf_data": data if want_pdf else None,
+        "error": error,
+        "output": buf.getvalue(),
+        "ms": round((time.perf_counter() - t0) * 1000),
+        "http": report_http.session_stats(),
+        "peak_rss_mb": report_events.peak_rss_mb(),
+    }
+
+
+if __name__ == "__main__":
+    # python report_jobs.py REPORT ARGS...  (one-off run through the same code path as the worker)
+    if len(sys.argv) < 2:
+        print("❌ Usage: python report_jobs.py personiba|finanses|berns|saderiba|gada ARGS...")
+        sys.exit(1)
+    result = run_report(sys.argv[1], sys.argv[2:])
+    result.pop("pdf_data")
+    print(result.pop("output"), end="")
+    print(result)
+    sys.exit(0 if result["ok"] else 1)
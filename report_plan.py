@@ -0,0 +1,216 @@
+# report_plan.py
+# Declarative slide manifests for the PDF generators.
+#
+# A report type is a MANIFEST (a list of steps) plus a numbers() function with its
+# numerology. plan() resolves both for one order into a Plan: the draw operations in
+# page order and the de-duplicated list of asset URLs they need. render() hands the
+# whole list to report_http.prefetch before the first page is drawn, so every download
+# starts at t=0 and a URL used on several pages is fetched once. A slide's bytes are let
+# go after the last page that uses it; with REPORT_STREAMING=1 only PREFETCH_WINDOW
+# slides are downloaded ahead, so memory doesn't grow with the page count.
+#
+# Steps:
+#   page(draw, *assets, optional=False, **params)
+#       one draw operation: DRAWERS[draw](c, *images, **params)
+#   each(key, *steps, skip=())
+#       the steps once for every value in numbers[key], as {n};
+#       a dict value is merged into the template fields instead.
+#       skip: the values whose slides were never made (known gaps)
+#
+# Asset URLs and string params are str.format templates over the plan fields:
+#   {store} {api} {date} {partner}, everything numbers() returned, and {n} inside each().
+# storage_index.py is asked about optional pages and known gaps before anything is fetched:
+# a slide it doesn't list drops the page. Unknown to the index, a known gap stays out.
+# Every optional page left is fetched with try_get (None on not found only; the listing can
+# be up to STORAGE_INDEX_TTL old), and one that comes back missing is left out at render.
+#
+# Dry run — the resolved plan as JSON, nothing is downloaded or rendered
+# (gada still reads its two image tables, they decide the slides):
+#   python3 make_personiba_pdf.py --plan DD.MM.YYYY      (every generator takes --plan + its dates)
+#   python3 report_plan.py orders.jsonl [--assets]      (report_batch.py orders; --assets: unique URLs only)
+
+import sys, json, argparse
+from contextlib import redirect_stdout
+from report_http import prefetch, STORAGE_PREFIX
+import storage_index
+
+
+# =========================
+# MANIFEST STEPS
+# =========================
+def page(draw: str, *assets: str, optional: bool = False, **params) -> dict:
+    return {"draw": draw, "assets": assets, "optional": optional, "params": params}
+
+def each(key: str, *steps: dict, skip=()) -> dict:
+    return {"each": key, "steps": steps, "skip": tuple(skip)}
+
+
+# =========================
+# PLAN
+# =========================
+class Plan:
+    """Draw operations in page order + every asset URL once, in the order first needed."""
+
+    def __init__(self):
+        self.ops = []      # (draw, urls, params, optional)
+        self.assets = []
+        self.missing = []  # optional slides the storage index says don't exist
+        self.dropped = []  # optional slides render() found missing (not found), their pages left out
+        self._required = set()
+        self._optional = set()
+        self._gaps = set()  # ops from each(skip=): only kept when the index lists their slides
+
+    def add(self, draw: str, urls: list, params: dict, optional: bool = False, gap: bool = False):
+        if gap:
+            self._gaps.add(len(self.ops))
+            optional = True
+        self.ops.append((draw, urls, params, optional))
+        for url in urls:
+            if url not in self._required and url not in self._optional:
+                self.assets.append(url)
+            (self._optional if optional else self._required).add(url)
+
+    @property
+    def optional(self) -> list:
+        """Assets that only optional pages use (a page that requires one wins)."""
+        return [url for url in self.assets if url in self._optional and url not in self._required]
+
+    def resolved(self, listed: dict) -> "Plan":
+        """The plan after asking the storage index (URL → listed) about its optional pages.
+
+        A page with a slide that isn't listed is dropped; unknown to the index, a known gap
+        is dropped too. The pages kept stay optional: a listed slide may have been removed
+        since the listing, and that must drop the page (render → dropped), not fail the report.
+        """
+        kept = Plan()
+        kept.missing = [url for url in self.assets if listed.get(url) is False]
+        for i, (draw, urls, params, optional) in enumerate(self.ops):
+            if optional:
+                known = [listed.get(url) for url in urls]
+                if False in known or (None in known and i in self._gaps):
+                    continue
+            kept.add(draw, urls, params, optional)
+        return kept
+
+    def __len__(self):
+        return len(self.ops)
+
+
+def _fill(value, fields: dict):
+    return value.format(**fields) if isinstance(value, str) else value
+
+def _expand(steps, fields: dict, out: Plan, gap: bool = False):
+    for step in steps:
+        if "each" in step:
+            for n in fields[step["each"]]:
+                _expand(step["steps"], {**fields, **(n if isinstance(n, dict) else {"n": n})}, out,
+                        gap or n in step["skip"])
+        else:
+            urls = [_fill(t, fields) for t in step["assets"]]
+            params = {k: _fill(v, fields) for k, v in step["params"].items()}
+            out.add(step["draw"], urls, params, step["optional"], gap)
+
+def plan(manifest: list, **fields) -> Plan:
+    out = Plan()
+    _expand(manifest, fields, out)
+    return out.resolved(storage_index.listed(out.optional))
+
+
+# =========================
+# RENDER
+# =========================
+def render(c, report_plan: Plan, drawers: dict, assets=None):
+    """Draw every page of the plan; downloads go to `assets` (a running prefetch) or a new one.
+
+    A failed download raises. An optional slide that isn't found leaves its page out and is
+    listed in report_plan.dropped.
+    """
+    last_use = {url: i for i, (_, urls, _, _) in enumerate(report_plan.ops) for url in urls}
+    with (assets or prefetch()) as assets:
+        assets.add(report_plan.assets, optional=report_plan.optional)
+        for i, (draw, urls, params, _) in enumerate(report_plan.ops):
+            images = [assets(url) for url in urls]
+            for url in urls:
+                if last_use[url] == i:
+                    assets.release(url)  # no later page needs these bytes
+            if None in images:
+                report_plan.dropped.extend(url for url, image in zip(urls, images) if image is None)
+                continue  # optional slide missing in the bucket
+            drawers[draw](c, *images, **params)
+
+
+# =========================
+# DRY RUN
+# =========================
+def describe(report_plan: Plan) -> dict:
+    """JSON-ready plan: page layout in order, storage slides and render API calls.
+
+    `pages` counts optional pages too, so it's the most the PDF can have.
+    """
+    layout = []
+    for draw, urls, params, optional in report_plan.ops:
+        entry = {"draw": draw, "assets": urls}
+        if params:
+            entry["params"] = params
+        if optional:
+            entry["optional"] = True
+        layout.append(entry)
+    return {
+        "pages": len(layout),
+        "storage": [url for url in report_plan.assets if STORAGE_PREFIX in url],
+        "api": [url for url in report_plan.assets if STORAGE_PREFIX not in url],
+        "optional": report_plan.optional,
+        "missing": report_plan.missing,
+        "layout": layout,
+    }
+
+def resolve(plan_pages, args: list) -> dict:
+    # numerology prints and timing events go to stderr, stdout stays JSON
+    with redirect_stdout(sys.stderr):
+        try:
+            return describe(plan_pages(*args))
+        except (TypeError, ValueError) as e:
+            raise SystemExit(f"❌ --plan: {e}")
+
+def dry_run(plan_pages, args: list):
+    """Generator --plan: print the plan for these dates as JSON."""
+    json.dump(resolve(plan_pages, args), sys.stdout, ensure_ascii=False, indent=2)
+    print()
+
+
+def main(argv=None):
+    import importlib, report_jobs
+    from report_batch import parse_order
+
+    ap = argparse.ArgumentParser(description="Resolve report plans for a JSONL file of orders (no downloads)")
+    ap.add_argument("orders", help="JSONL file (report_batch.py format), or - for stdin")
+    ap.add_argument("--assets", action="store_true", help="only the unique asset URLs, one per line")
+    opts = ap.parse_args(argv)
+
+    src = sys.stdin if opts.orders == "-" else open(opts.orders, encoding="utf-8")
+    seen, failed = set(), 0
+    with src:
+        for n, line in enumerate(src, start=1):
+            if not line.strip():
+                continue
+            try:
+                report, args = parse_order(line)
+                with redirect_stdout(sys.stderr):  # font / client setup prints on import
+                    module = importlib.import_module(report_jobs.REPORT_MODULES[report])
+                plan = resolve(module.plan_pages, report_jobs.plan_args(report, args))
+            except (Exception, SystemExit) as e:
+                failed += 1
+                print(f"❌ line {n}: {e}", file=sys.stderr)
+                continue
+            if not opts.assets:
+                print(json.dumps({"line": n, "report": report, **plan}, ensure_ascii=False))
+                continue
+            for url in plan["storage"] + plan["api"]:
+                if url not in seen:
+                    seen.add(url)
+                    print(url)
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# report_worker.py
+# Long-lived, pre-warmed report worker.
+# Python, reportlab, supabase, sendgrid and the DejaVu font are loaded once, then a
+# pool of forked processes renders reports for the Next routes over a Unix socket.
+#
+# Usage: python3 report_worker.py [--socket PATH] [--procs N]
+#
+# Protocol (one request per connection, newline-terminated JSON both ways):
+#   -> {"report": "personiba", "args": ["DD.MM.YYYY", "email"], "pdf": true}
+#   <- {"ok": true, "pdf": "PERSONIBAS_ANALIZE_....pdf", "bytes": 123456, "output": "...", "ms": 1234}
+#      with "pdf": true the JSON line is followed by exactly `bytes` raw PDF bytes (download mode);
+#      the PDF is never written to disk; "coalesced": true when it joined an identical run in flight
+#   -> {"op": "enqueue", "report": "...", "args": [...], "ref": "evt_..."}   (paid orders, see job_queue.py)
+#   <- {"ok": true, "job": 42}                    ("duplicate": true when that ref was already queued)
+#   -> {"op": "stats"}
+#   <- {"ok": true, "queue": {...}, "mail": {...}, "procs": 4,
+#       "rss_mb": {"personiba": {"last": 52.1, "max": 60.3}}, "coalesced": 3}
+#      rss_mb: peak memory of a pool process per report type, to size --procs against the container
+#      coalesced: runs that joined an identical one in flight instead of rendering
+#      mail: the email delivery queue (mail_queue.py), null with REPORT_EMAIL_ASYNC=0
+#   -> {"op": "events"}   (timing events of queued jobs since the last call, for lib/reportEvents.ts)
+#   <- {"ok": true, "jobs": [{"report": "gada", "ms": 812, "events": "📊 {...}\n..."}]}
+#
+# Email is a separate stage: reports rendered here queue their email (mail_queue.py) and
+# MAIL_THREADS mailer threads send it with retries, so neither a download nor a pool process
+# waits for SendGrid. REPORT_EMAIL_ASYNC=0 sends inline from the pool process, like the CLI.
+
+import os, json, time, threading, socketserver, argparse
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import report_jobs
+import report_common
+from job_queue import JobQueue
+from mail_queue import MailQueue
+from report_events import EVENT_PREFIX
+
+SOCKET_PATH = os.getenv("REPORT_WORKER_SOCKET", "/tmp/astro-report-worker.sock")
+PROCS = int(os.getenv("REPORT_WORKER_PROCS", "0")) or (os.cpu_count() or 2)
+QUEUE_POLL_SECONDS = float(os.getenv("QUEUE_POLL_SECONDS", "5"))
+EVENTS_BUFFER = int(os.getenv("REPORT_EVENTS_BUFFER", "500"))  # queued jobs kept until Node pulls them
+EMAIL_ASYNC = os.getenv("REPORT_EMAIL_ASYNC", "1") != "0"
+MAIL_THREADS = int(os.getenv("MAIL_THREADS", "2"))
+MAIL_POLL_SECONDS = float(os.getenv("MAIL_POLL_SECONDS", "1"))
+
+
+class ReportPool:
+    """Process pool forked from an already-warm parent; rebuilt if a child dies.
+
+    Single-flight: a run with the same report and args as one already in flight (a webhook
+    retry, a double-clicked download, the route and the webhook together) waits for that
+    run and gets its result instead of rendering and emailing a second time.
+    """
+
+    def __init__(self, procs: int):
+        self.procs = procs
+        self.rss = {}  # report → {"last", "max"} peak_rss_mb of its runs
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._inflight = {}  # (report, args) → Future of the running result
+        self._inflight_lock = threading.Lock()
+        self._pool = self._start()
+
+    def _start(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=self.procs, initializer=report_jobs.warm)
+        # with fork, the first submit forks every child at once
+        pool.submit(report_jobs.warm).result()
+        return pool
+
+    def run(self, report: str, args: list, want_pdf: bool = False) -> dict:
+        key = (report, tuple(args))
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = Future()
+        if leader:
+            try:
+                flight.set_result(self._run(report, args))
+            except BaseException as e:
+                flight.set_exception(e)
+                raise
+            finally:
+                with self._inflight_lock:
+                    del self._inflight[key]
+            result = dict(flight.result())
+        else:
+            print(f"🔗 {report} {args}: joined the run in flight", flush=True)
+            self.coalesced += 1
+            result = {**flight.result(), "coalesced": True}
+        if not want_pdf:
+            result["pdf_data"] = None
+        return result
+
+    def _run(self, report: str, args: list) -> dict:
+        # the PDF always comes back (a joining download may want it), each caller keeps it or not
+        pool = self._pool
+        try:
+            result = pool.submit(report_jobs.run_report, report, args, True).result()
+        except BrokenProcessPool:
+            with self._lock:
+                if self._pool is pool:
+                    print("⚠️ Report pool broken, restarting", flush=True)
+                    self._pool = self._start()
+            return {"ok": False, "error": "worker process died", "output": "", "ms": 0}
+        peak = result.get("peak_rss_mb")
+        if peak is not None:
+            rss = self.rss.setdefault(report, {"last": peak, "max": peak})
+            rss["last"], rss["max"] = peak, max(rss["max"], peak)
+        return result
+
+
+class Dispatcher:
+    """Drains the job queue into the pool; one thread per pool process keeps it busy, never more."""
+
+    def __init__(self, queue: JobQueue, pool: ReportPool, threads: int):
+        self.queue = queue
+        self.pool = pool
+        self._cv = threading.Condition()
+        self.events = deque(maxlen=EVENTS_BUFFER)
+        requeued = queue.requeue_running()
+        if requeued:
+            print(f"♻️ Requeued {requeued} job(s) interrupted by the last shutdown", flush=True)
+        for i in range(threads):
+            threading.Thread(target=self._loop, name=f"dispatch-{i}", daemon=True).start()
+
+    def notify(self):
+        with self._cv:
+            self._cv.notify_all()
+
+    def _wait(self):
+        # sleep until notified, the next retry is due, or the poll interval passes
+        next_at = self.queue.next_run_at()
+        timeout = QUEUE_POLL_SECONDS if next_at is None else min(QUEUE_POLL_SECONDS, max(0.05, next_at - time.time()))
+        with self._cv:
+            self._cv.wait(timeout)
+
+    def _loop(self):
+        while True:
+            try:
+                job = self.queue.claim()
+            except Exception as e:
+                print(f"⚠️ Queue claim failed: {e!r}", flush=True)
+                job = None
+            if job is None:
+                self._wait()
+                continue
+
+            tag = f"job {job['id']} {job['report']} (try {job['attempts']}/{job['max_attempts']})"
+            print(f"📥 {tag} waited {time.time() - job['created_at']:.1f}s", flush=True)
+            result = self.pool.run(job["report"], job["args"])
+            print(result.get("output", ""), end="", flush=True)
+            if not result.get("coalesced"):  # a joined run's events are already counted
+                self.events.append({
+                    "report": job["report"],
+                    "ms": result.get("ms"),
+                    "events": "".join(l for l in result.get("output", "").splitlines(True) if l.startswith(EVENT_PREFIX)),
+                })
+            if result["ok"]:
+                self.queue.complete(job, result)
+                print(f"✅ {tag} done in {result['ms']} ms", flush=True)
+            elif self.queue.fail(job, result.get("error") or "failed"):
+                print(f"🔁 {tag} failed: {result.get('error')}, will retry", flush=True)
+            else:
+                print(f"❌ {tag} failed for good: {result.get('error')}", flush=True)
+
+
+class Mailer:
+    """Sends queued report emails (mail_queue.py) with retries, off the render path."""
+
+    def __init__(self, queue: MailQueue, threads: int):
+        self.queue = queue
+        requeued = queue.requeue_sending()
+        if requeued:
+            print(f"♻️ Requeued {requeued} email(s) interrupted by the last shutdown", flush=True)
+        for i in range(threads):
+            threading.Thread(target=self._loop, name=f"mail-{i}", daemon=True).start()
+
+    def _loop(self):
+        while True:
+            try:
+                mail = self.queue.claim()
+            except Exception as e:
+                print(f"⚠️ Mail claim failed: {e!r}", flush=True)
+                mail = None
+            if mail is None:
+                next_at = self.queue.next_run_at()
+                time.sleep(MAIL_POLL_SECONDS if next_at is None else min(MAIL_POLL_SECONDS, max(0.05, next_at - time.time())))
+                continue
+
+            tag = f"mail {mail['id']} to {mail['recipient']} (try {mail['attempts']}/{mail['max_attempts']})"
+            t0 = time.perf_counter()
+            status, error = report_common.deliver_pdf_email(
+                mail["recipient"], mail["pdf"], mail["filename"], mail["subject"], mail["html"]
+            )
+            ms = round((time.perf_counter() - t0) * 1000)
+            if error is None:
+                self.queue.sent(mail, status, ms)
+                print(f"✅ {tag} sent in {ms} ms", flush=True)
+            # 4xx (bad address, rejected content) won't get better; 429, 5xx and network errors may
+            elif self.queue.fail(mail, error, status, retry=status is None or status == 429 or status >= 500):
+                print(f"🔁 {tag} failed: {error}, will retry", flush=True)
+            else:
+                print(f"❌ {tag} failed for good: {error}", flush=True)
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            req = json.loads(line)
+            op = req.get("op", "run")
+            if op == "stats":
+                mail = self.server.mailer.queue.stats() if self.server.mailer else None
+                self._reply({"ok": True, "queue": self.server.queue.stats(), "mail": mail, "procs": self.server.pool.procs,
+                             "rss_mb": self.server.pool.rss, "coalesced": self.server.pool.coalesced})
+                return
+            if op == "events":
+                events = self.server.dispatcher.events
+                jobs = [events.popleft() for _ in range(len(events))]
+                self._reply({"ok": True, "jobs": jobs})
+                return
+            report, args = req["report"], list(req.get("args") or [])
+            if report not in report_jobs.REPORT_MODULES:
+                raise ValueError(f"unknown report {report!r}")
+        except Exception as e:
+            self._reply({"ok": False, "error": f"bad request: {e!r}", "output": "", "ms": 0})
+            return
+
+        if op == "enqueue":
+            job_id, created = self.server.queue.enqueue(report, args, ref=req.get("ref"))
+            if not created:
+                print(f"♻️ {req.get('ref')} already queued as job {job_id}", flush=True)
+                self._reply({"ok": True, "job": job_id, "duplicate": True})
+                return
+            self.server.dispatcher.notify()
+            print(f"📝 Queued job {job_id}: {report} {args}", flush=True)
+            self._reply({"ok": True, "job": job_id})
+            return
+
+        want_pdf = bool(req.get("pdf"))
+        print(f"▶️ {report} {args}", flush=True)
+        result = self.server.pool.run(report, args, want_pdf)
+        print(result.get("output", ""), end="", flush=True)
+        print(f"🐍 {report} finished ok={result['ok']} in {result['ms']} ms", flush=True)
+        self._reply(result, result.pop("pdf_data", None))  # bytes only when asked for
+
+    def _reply(self, payload: dict, data: bytes = None):
+        self.wfile.write((json.dumps(payload, ensure_ascii=False) + "\n").encode())
+        if data:
+            self.wfile.write(data)
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-warmed report worker")
+    ap.add_argument("--socket", default=SOCKET_PATH)
+    ap.add_argument("--procs", type=int, default=PROCS)
+    opts = ap.parse_args()
+
+    t0 = time.perf_counter()
+    report_jobs.warm()  # children are forked from here, so they start warm
+    mail_queue = MailQueue() if EMAIL_ASYNC else None
+    report_common.use_mail_queue(mail_queue)  # before the fork: every pool process queues its emails
+    pool = ReportPool(opts.procs)
+    print(f"🔥 Warm in {time.perf_counter() - t0:.2f}s, {opts.procs} processes", flush=True)
+    queue = JobQueue()
+    dispatcher = Dispatcher(queue, pool, opts.procs)
+    mailer = Mailer(mail_queue, MAIL_THREADS) if mail_queue else None
+
+    if os.path.exists(opts.socket):
+        os.unlink(opts.socket)
+    with Server(opts.socket, Handler) as server:
+        server.pool = pool
+        server.queue = queue
+        server.dispatcher = dispatcher
+        server.mailer = mailer
+        print(f"👂 Listening on {opts.socket}", flush=True)
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(opts.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# storage_index.py
+# Which slides exist in the storage bucket, so the generators don't probe for them with GETs.
+#
+# One Storage list call per folder (POST /storage/v1/object/list/<bucket>), kept for
+# STORAGE_INDEX_TTL seconds in SQLite next to the asset cache, so the worker, batch runs
+# and CLI calls share it. report_plan asks about the slides of optional pages and of the
+# known gaps (each(..., skip=) — frc1, ac1/ac2, mc1/mc2): a slide that isn't listed is
+# dropped from the plan before anything is fetched. A listed one is still fetched as
+# optional (not found → page left out): the listing can be up to TTL seconds stale.
+#
+# A slide is missing, present or unknown. Unknown (listing failed, no key, or an empty
+# folder, which is what a key without list rights gets): an optional page stays in the
+# plan and is probed with GET like before, a known gap is left out as the skip list says.
+# The listing also has each object's ETag; pdf_cache.py uses them as the slides' version.
+#
+# python3 storage_index.py [--refresh] FOLDER...  (e.g. berns/group/9) → print the listing (name: ETag)
+
+import os, sys, json, time, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+from asset_cache import CACHE_DIR
+from report_common import SUPABASE_URL, SUPABASE_KEY
+from report_http import session, STORAGE_PREFIX, CONNECT_TIMEOUT, READ_TIMEOUT
+import report_events
+
+TTL = float(os.getenv("STORAGE_INDEX_TTL", "900"))
+ENABLED = os.getenv("STORAGE_INDEX", "1") != "0"
+LIST_PAGE = 1000
+LIST_WORKERS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    folder TEXT PRIMARY KEY,  -- bucket/path, no trailing slash
+    names TEXT NOT NULL,      -- JSON {object name: ETag}
+    listed_at REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def _db() -> sqlite3.Connection:
+    db = getattr(_local, "db", None)
+    if db is None or _local.pid != os.getpid():
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        db = sqlite3.connect(os.path.join(CACHE_DIR, "storage_index.sqlite"), timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+        _local.db, _local.pid = db, os.getpid()
+    return db
+
+
+def split_url(url: str):
+    """Public storage URL → (folder, name), e.g. ("astro-forecasts/berns/group/9", "c9_3.jpg")."""
+    public = f"{SUPABASE_URL}{STORAGE_PREFIX}" if SUPABASE_URL else None
+    if not public or not url.startswith(public):
+        return None, None
+    folder, _, name = url[len(public):].partition("?")[0].rpartition("/")
+    return folder, name
+
+
+# =========================
+# LISTING
+# =========================
+def list_folder(folder: str) -> dict:
+    """Every object in one folder (not recursive), straight from Storage: name → ETag."""
+    bucket, _, prefix = folder.partition("/")
+    headers = {"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY}
+    names = {}
+    while True:
+        r = session().post(
+            f"{SUPABASE_URL}/storage/v1/object/list/{bucket}",
+            json={"prefix": prefix, "limit": LIST_PAGE, "offset": len(names),
+                  "sortBy": {"column": "name", "order": "asc"}},
+            headers=headers, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+        )
+        if r.status_code != 200:
+            raise RuntimeError(f"list failed: {folder} -> {r.status_code}")
+        page = r.json()
+        for item in page:
+            meta = item.get("metadata") or {}
+            names[item["name"]] = meta.get("eTag") or item.get("updated_at")
+        if len(page) < LIST_PAGE:
+            return names
+
+def _listed(folder: str, refresh: bool = False):
+    """{name: ETag} of folder from the index, listing it again when older than TTL; None if unknown."""
+    row = _db().execute("SELECT names, listed_at FROM folders WHERE folder = ?", (folder,)).fetchone()
+    names = json.loads(row[0]) if row else {}
+    if isinstance(names, list):  # written before ETags were kept
+        names = dict.fromkeys(names)
+    if row and not refresh and time.time() - row[1] < TTL:
+        return names or None
+    try:
+        names = list_folder(folder)
+    except Exception as e:
+        print(f"⚠️ Storage index: {e}")
+        if row:
+            return names or None  # a stale listing beats probing
+        names = {}  # unknown for TTL too, instead of asking again on every report
+    with _db() as db:
+        db.execute(
+            "INSERT INTO folders(folder, names, listed_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(folder) DO UPDATE SET names = excluded.names, listed_at = excluded.listed_at",
+            (folder, json.dumps(names), time.time()),
+        )
+    return names or None
+
+
+# =========================
+# LOOKUPS
+# =========================
+def _lookup(urls) -> list:
+    """(url, name, listing of its folder or None) for every storage URL among urls."""
+    if not ENABLED or not SUPABASE_URL or not SUPABASE_KEY:
+        return []
+    by_folder = {}
+    for url in urls:
+        folder, name = split_url(url)
+        if folder:
+            by_folder.setdefault(folder, []).append((url, name))
+    if not by_folder:
+        return []
+
+    with report_events.stage("index", folders=len(by_folder)):
+        with ThreadPoolExecutor(max_workers=LIST_WORKERS) as pool:
+            listings = dict(zip(by_folder, pool.map(_listed, by_folder)))
+    return [(url, name, listings[folder]) for folder, entries in by_folder.items() for url, name in entries]
+
+
+def listed(urls) -> dict:
+    """Storage URL → whether the index lists it; URLs it can't answer for are left out."""
+    return {url: name in names for url, name, names in _lookup(urls) if names is not None}
+
+
+def versions(urls) -> dict:
+    """Storage URL → ETag from the index; None when the slide or its folder is unknown."""
+    return {url: names.get(name) if names else None for url, name, names in _lookup(urls)}
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    refresh = "--refresh" in args
+    for folder in (a.strip("/") for a in args if a != "--refresh"):
+        if not folder.startswith("astro-forecasts/"):
+            folder = f"astro-forecasts/{folder}"
+        names = _listed(folder, refresh=refresh)
+        print(json.dumps({"folder": folder, "objects": dict(sorted(names.items())) if names else None}, ensure_ascii=False))
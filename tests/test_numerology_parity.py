@@ -0,0 +1,43 @@
+# tests/test_numerology_parity.py
+# numerology.py against the TS answers in numerology_ts.json (no Next server needed).
+# The fixture comes from `python numerology.py --api ... --write`, see numerology.py.
+
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import numerology
+
+FIXTURE = numerology.load_fixture()
+PY_KEYS = {ts: py for py, ts in numerology.TS_KEYS.items()}
+
+
+def test_fixture_covers_every_case():
+    names = [name for name, _, _ in numerology.parity_cases("10.08.1990", FIXTURE["partner"])]
+    assert FIXTURE["dates"]
+    for date, answers in FIXTURE["dates"].items():
+        assert sorted(answers) == sorted(names), date
+
+
+def test_calc_matches_ts():
+    mismatches = []
+    for date, answers in FIXTURE["dates"].items():
+        for name, path, expected in numerology.parity_cases(date, FIXTURE["partner"]):
+            if answers[name] != expected:
+                mismatches.append(f"{path}\n   ts: {answers[name]}\n   py: {expected}")
+    assert not mismatches, f"{len(mismatches)} mismatches, first:\n" + "\n".join(mismatches[:5])
+
+
+def test_table_lookups_match_ts():
+    # what the generators read: numerology_table.bin first, the functions outside it
+    mismatches = []
+    for date, answers in FIXTURE["dates"].items():
+        d, m, y = numerology.parse_date(date)
+        for name in numerology.TRIANGLES:
+            want = {PY_KEYS[k]: v for k, v in answers[name].items()}
+            if dict(numerology.triangle(name, d, m, y)) != want:
+                mismatches.append((date, name))
+        if list(numerology.misija(d, m, y)) != [answers["misija"][k] for k in ("first", "second", "third")]:
+            mismatches.append((date, "misija"))
+        if numerology.star_outer(date) != answers["star"]["outer"]:
+            mismatches.append((date, "star"))
+    assert not mismatches, f"{len(mismatches)} mismatches, first: {mismatches[:5]}"